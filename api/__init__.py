@@ -1,20 +1,122 @@
-"""
-API server for WoWTCG Tracker
-"""
-
-from dotenv import load_dotenv
-from fastapi import FastAPI
-
-load_dotenv()
-app = FastAPI(title="WoWTCG Tracker API",
-  description="API for WoWTCG Tracker")
-
-
-@app.get("/")
-async def get_root() -> dict:
-  """
-    Root of the API
-
-    Root is set to return "Hello world!"
-    """
-  return "Hello world!"
+"""
+API server for WoWTCG Tracker
+"""
+
+import logging
+import os
+from typing import Sequence
+
+from dotenv import load_dotenv
+from fastapi import FastAPI
+from prisma import Prisma
+
+from api import database
+from api.admission import AdmissionMiddleware, Overloaded, admission
+from api.admission import handle_overloaded
+from api.analytics import DeckAnalytics
+from api.catalog import CatalogCache
+from api.completion import CompletionIndex
+from api.facets import FacetIndex
+from api.legality import LegalityIndex
+from api.metrics import MetricsMiddleware
+from api.replicas import ReplicaMiddleware, replica_router
+from api.responses import ResponseCache
+from api.routers import catalog, collections, decks, search, trades
+from api.routers import metrics as metrics_routes
+from api.search import SearchIndex
+from api.trades import TradeIndex
+from api.views import view_cache
+from api.write_buffer import QuantityBuffer
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+app = FastAPI(title="WoWTCG Tracker API",
+  description="API for WoWTCG Tracker")
+app.include_router(catalog.router)
+app.include_router(search.router)
+app.include_router(collections.router)
+app.include_router(decks.router)
+app.include_router(trades.router)
+app.include_router(metrics_routes.router)
+app.add_middleware(AdmissionMiddleware)
+app.add_middleware(ReplicaMiddleware)
+app.add_middleware(MetricsMiddleware)
+app.add_exception_handler(Overloaded, handle_overloaded)
+
+
+@app.on_event("startup")
+async def on_startup() -> None:
+  """Opens database clients shared by all requests and loads catalog"""
+  db = database.create_client()
+  await db.connect()
+  replicas = []
+  for url in database.get_replica_urls():
+    replica = database.create_client(url)
+    try:
+      await replica.connect()
+    except Exception:  # pylint: disable=broad-except
+      logger.exception("Read replica is not available, reading primary")
+      continue
+    replicas.append(replica)
+  await start(db, replicas)
+
+
+async def start(db: Prisma, replicas: Sequence[Prisma] = ()) -> None:
+  """Serves API from connected database client and loads catalog from it
+
+  Read-only queries run on connected clients of replicas if given.
+  """
+  app.state.db = db
+  app.state.replicas = list(replicas)
+  replica_router.set_replicas(app.state.replicas)
+  admission.configure(database.get_pool_size())
+  app.state.catalog_cache = CatalogCache(
+      snapshot_path=os.getenv("CATALOG_SNAPSHOT"))
+  app.state.search_index = SearchIndex()
+  app.state.catalog_cache.add_listener(app.state.search_index.update)
+  app.state.facet_index = FacetIndex()
+  app.state.catalog_cache.add_listener(app.state.facet_index.update)
+  app.state.legality_index = LegalityIndex()
+  app.state.catalog_cache.add_listener(app.state.legality_index.update)
+  app.state.deck_analytics = DeckAnalytics()
+  app.state.catalog_cache.add_listener(app.state.deck_analytics.update)
+  app.state.completion_index = CompletionIndex()
+  app.state.catalog_cache.add_listener(app.state.completion_index.update)
+  app.state.response_cache = ResponseCache()
+  app.state.catalog_cache.add_listener(app.state.response_cache.update)
+  app.state.trade_index = TradeIndex()
+  app.state.catalog_cache.add_listener(app.state.trade_index.update)
+  view_cache.configure()
+  app.state.catalog_cache.add_listener(view_cache.update)
+  app.state.collection_quantities = QuantityBuffer(
+      db,
+      "collection_has_card_print",
+      listeners=[
+          app.state.completion_index.apply_deltas,
+          app.state.trade_index.add_quantities
+      ])
+  app.state.collection_quantities.start()
+  app.state.deck_quantities = QuantityBuffer(db, "deck_has_card_print")
+  app.state.deck_quantities.start()
+  await app.state.catalog_cache.reload(app.state.db)
+
+
+@app.on_event("shutdown")
+async def on_shutdown() -> None:
+  """Writes pending quantity changes and closes database clients"""
+  await app.state.collection_quantities.close()
+  await app.state.deck_quantities.close()
+  for db in [app.state.db] + app.state.replicas:
+    if db.is_connected():
+      await db.disconnect()
+
+
+@app.get("/")
+async def get_root() -> dict:
+  """
+    Root of the API
+
+    Root is set to return "Hello world!"
+    """
+  return "Hello world!"
@@ -0,0 +1,268 @@
+"""
+Admission control of database operations
+
+At most DATABASE_MAX_CONCURRENCY (pool size by default) operations of
+api/database.py run at once, others wait in queue ordered by priority
+of their request: catalog loads first, then interactive requests, then
+bulk imports and exports. Once ADMISSION_QUEUE_SIZE operations are
+waiting, new requests are rejected right away with 503 and Retry-After,
+and so are requests still waiting after ADMISSION_TIMEOUT seconds.
+Only the first operation of a request can be rejected, requests which
+already touched database and work outside requests (catalog reload,
+quantity flushes, fill script) always wait for their turn, so nothing
+is left half written.
+"""
+
+import asyncio
+import collections
+import contextlib
+import contextvars
+import enum
+import functools
+import os
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict
+from typing import NamedTuple, Optional, TypeVar
+
+from fastapi import Request
+from fastapi.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from api.metrics import metrics
+
+DEFAULT_LIMIT = 10
+DEFAULT_QUEUE_SIZE = 100
+DEFAULT_TIMEOUT = 2.0
+DEFAULT_RETRY_AFTER = 1
+
+Function = TypeVar("Function", bound=Callable[..., Awaitable[Any]])
+
+
+class Priority(enum.IntEnum):
+  """Priority of database operations, lower goes first"""
+  CATALOG = 0
+  INTERACTIVE = 1
+  BULK = 2
+
+
+class Overloaded(Exception):
+  """Raised when database operation of request is shed"""
+
+  def __init__(self, reason: str, retry_after: int) -> None:
+    super().__init__(f"Database is overloaded ({reason})")
+    self.reason = reason
+    self.retry_after = retry_after
+
+
+class RequestAdmission:
+  """Priority of request and whether it already ran database operation
+
+  Shared by all tasks of request, so changes made in one are seen in
+  others.
+  """
+
+  def __init__(self) -> None:
+    self.priority = Priority.INTERACTIVE
+    self.admitted = False
+
+
+# Admission state of request being handled, None outside requests
+request_admission: "contextvars.ContextVar[Optional[RequestAdmission]]" = (
+    contextvars.ContextVar("request_admission", default=None))
+
+
+class Waiter(NamedTuple):
+  """Operation waiting for free slot"""
+  future: asyncio.Future
+  sheddable: bool
+
+
+metrics.describe("db_admission_in_use", "gauge",
+                 "Database operations running")
+metrics.describe("db_admission_queued", "gauge",
+                 "Database operations waiting by priority")
+metrics.describe("db_admission_wait_seconds", "histogram",
+                 "Time database operations waited by priority")
+metrics.describe("db_admission_rejected_total", "counter",
+                 "Rejected requests by priority and reason")
+
+
+class AdmissionControl:
+  """Slots of concurrent database operations with priority queue
+
+  Free slot is handed over to the first waiter of the best priority when
+  operation finishes. When queue is full, newest sheddable waiter of
+  worse priority is rejected in favour of new operation.
+  """
+
+  def __init__(self,
+               limit: int = DEFAULT_LIMIT,
+               queue_size: int = DEFAULT_QUEUE_SIZE,
+               timeout: float = DEFAULT_TIMEOUT,
+               retry_after: int = DEFAULT_RETRY_AFTER) -> None:
+    self.limit = limit
+    self.queue_size = queue_size
+    self.timeout = timeout
+    self.retry_after = retry_after
+    self.in_use = 0
+    self.queues: Dict[Priority, Deque[Waiter]] = {
+        priority: collections.deque() for priority in Priority
+    }
+    self.rejected: Dict[str, int] = {}
+
+  def configure(self, default_limit: int) -> None:
+    """Reads limits from environment, limit defaults to default_limit"""
+    self.limit = int(
+        os.getenv("DATABASE_MAX_CONCURRENCY", str(default_limit)))
+    self.queue_size = int(
+        os.getenv("ADMISSION_QUEUE_SIZE", str(DEFAULT_QUEUE_SIZE)))
+    self.timeout = float(os.getenv("ADMISSION_TIMEOUT", str(DEFAULT_TIMEOUT)))
+    self.retry_after = int(
+        os.getenv("ADMISSION_RETRY_AFTER", str(DEFAULT_RETRY_AFTER)))
+
+  def get_queued(self) -> int:
+    """Returns number of operations waiting for slot"""
+    return sum(len(queue) for queue in self.queues.values())
+
+  def get_stats(self) -> dict:
+    """Returns slots in use, queue depth by priority and rejections"""
+    return {
+        "limit": self.limit,
+        "in_use": self.in_use,
+        "queued": {
+            priority.name.lower(): len(queue)
+            for priority, queue in self.queues.items()
+        },
+        "rejected": dict(self.rejected),
+    }
+
+  def _update_gauges(self) -> None:
+    metrics.set("db_admission_in_use", (), self.in_use)
+    for priority, queue in self.queues.items():
+      metrics.set("db_admission_queued",
+                  (("priority", priority.name.lower()),), len(queue))
+
+  def _reject(self, priority: Priority, reason: str) -> Overloaded:
+    self.rejected[reason] = self.rejected.get(reason, 0) + 1
+    metrics.add("db_admission_rejected_total",
+                (("priority", priority.name.lower()), ("reason", reason)))
+    return Overloaded(reason, self.retry_after)
+
+  def _evict(self, priority: Priority) -> bool:
+    """Rejects newest sheddable waiter of worse priority than priority"""
+    for worse in reversed(Priority):
+      if worse <= priority:
+        break
+      queue = self.queues[worse]
+      for waiter in reversed(queue):
+        if waiter.sheddable and not waiter.future.done():
+          queue.remove(waiter)
+          waiter.future.set_exception(self._reject(worse, "evicted"))
+          return True
+    return False
+
+  async def acquire(self, priority: Priority, sheddable: bool) -> None:
+    """Waits for free slot, raises Overloaded if sheddable is shed"""
+    if self.in_use < self.limit and not self.get_queued():
+      self.in_use += 1
+      self._update_gauges()
+      return
+    if (sheddable and self.get_queued() >= self.queue_size and
+        not self._evict(priority)):
+      raise self._reject(priority, "queue_full")
+    waiter = Waiter(asyncio.get_event_loop().create_future(), sheddable)
+    self.queues[priority].append(waiter)
+    self._update_gauges()
+    start = time.perf_counter()
+    try:
+      if sheddable:
+        await asyncio.wait_for(waiter.future, self.timeout)
+      else:
+        await waiter.future
+    except asyncio.TimeoutError:
+      raise self._reject(priority, "timeout") from None
+    except asyncio.CancelledError:
+      if (waiter.future.done() and not waiter.future.cancelled() and
+          waiter.future.exception() is None):
+        # Slot was handed over just before cancel
+        self.release()
+      raise
+    finally:
+      with contextlib.suppress(ValueError):
+        self.queues[priority].remove(waiter)
+      self._update_gauges()
+      metrics.observe("db_admission_wait_seconds",
+                      (("priority", priority.name.lower()),),
+                      time.perf_counter() - start)
+
+  def release(self) -> None:
+    """Hands slot over to next waiter or frees it"""
+    for queue in self.queues.values():
+      while queue:
+        waiter = queue.popleft()
+        if not waiter.future.done():
+          waiter.future.set_result(None)
+          self._update_gauges()
+          return
+    self.in_use -= 1
+    self._update_gauges()
+
+  @contextlib.asynccontextmanager
+  async def slot(self,
+                 priority: Optional[Priority] = None) -> AsyncIterator[None]:
+    """Holds slot while block runs
+
+    Priority defaults to priority of current request. Only first
+    operation of request can be shed.
+    """
+    state = request_admission.get()
+    if priority is None:
+      priority = state.priority if state is not None else Priority.INTERACTIVE
+    await self.acquire(priority, state is not None and not state.admitted)
+    if state is not None:
+      state.admitted = True
+    try:
+      yield
+    finally:
+      self.release()
+
+
+admission = AdmissionControl()
+
+
+def admitted(function: Function) -> Function:
+  """Wraps database function to run only in free slot"""
+
+  @functools.wraps(function)
+  async def wrapper(*args: Any, **kwargs: Any) -> Any:
+    async with admission.slot():
+      return await function(*args, **kwargs)
+
+  return wrapper  # type: ignore
+
+
+class AdmissionMiddleware:
+  """ASGI middleware creating admission state of every request"""
+
+  def __init__(self, app: ASGIApp) -> None:
+    self.app = app
+
+  async def __call__(self, scope: Scope, receive: Receive,
+                     send: Send) -> None:
+    if scope["type"] != "http":
+      await self.app(scope, receive, send)
+      return
+    token = request_admission.set(RequestAdmission())
+    try:
+      await self.app(scope, receive, send)
+    finally:
+      request_admission.reset(token)
+
+
+async def handle_overloaded(
+    request: Request,  # pylint: disable=unused-argument
+    exception: Overloaded) -> JSONResponse:
+  """Returns 503 telling client when to retry"""
+  return JSONResponse({"detail": str(exception)},
+                      status_code=503,
+                      headers={"Retry-After": str(exception.retry_after)})
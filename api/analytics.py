@@ -0,0 +1,187 @@
+"""
+Deck analytics: mana curve, category split and class and type
+distribution
+
+Attributes of card prints are kept in arrays indexed by card print id
+holding small integer codes, so histogram of a deck is a sum of
+quantities over codes of its card prints. Many decks are analysed at
+once by summing their quantities per card print first, so cost depends
+on number of distinct card prints, not on number of decks. Results are
+cached by hash of deck content until catalog changes.
+"""
+
+import array
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from prisma import Prisma
+
+from api import database
+from api.catalog import Catalog
+
+# Mana costs above MAX_MANA_BUCKET share one bucket, costs with X have
+# their own bucket and cards without cost are not in curve
+MAX_MANA_BUCKET = 10
+X_BUCKET = "X"
+MANA_BUCKETS = [str(cost) for cost in range(MAX_MANA_BUCKET)
+               ] + [f"{MAX_MANA_BUCKET}+", X_BUCKET]
+NO_CODE = -1
+
+CACHE_SIZE = 1024
+# Seconds for which meta report of public decks is served without
+# reading public decks again
+META_REPORT_TTL = 300
+
+
+def get_mana_bucket(mana_cost: Optional[str]) -> int:
+  """Returns position of mana cost in MANA_BUCKETS or NO_CODE"""
+  if mana_cost is None:
+    return NO_CODE
+  if X_BUCKET in mana_cost:
+    return MANA_BUCKETS.index(X_BUCKET)
+  return min(int(mana_cost), MAX_MANA_BUCKET)
+
+
+def get_content_hash(quantities: Dict[int, int]) -> str:
+  """Returns hash of card prints and their quantities in any order"""
+  content = ",".join(f"{card_print_id}:{quantity}"
+                     for card_print_id, quantity in sorted(quantities.items())
+                     if quantity)
+  return hashlib.sha1(content.encode("ascii")).hexdigest()
+
+
+def sum_quantities(decks: Iterable[Dict[int, int]]) -> Dict[int, int]:
+  """Returns quantities of card prints summed over decks"""
+  total: Dict[int, int] = {}
+  for quantities in decks:
+    for card_print_id, quantity in quantities.items():
+      total[card_print_id] = total.get(card_print_id, 0) + quantity
+  return total
+
+
+class DeckAnalytics:
+  """Arrays of card print attribute codes and cache of deck statistics"""
+
+  def __init__(self) -> None:
+    self.categories: List[str] = []
+    self.classes: List[str] = []
+    self.types: List[str] = []
+    self.mana_buckets = array.array("b")
+    self.category_codes = array.array("b")
+    # Card print id -> codes of classes and of types of its card
+    self.class_codes: List[Tuple[int, ...]] = []
+    self.type_codes: List[Tuple[int, ...]] = []
+    self._cache: "OrderedDict[str, dict]" = OrderedDict()
+    self._meta_report: Optional[Tuple[float, dict]] = None
+
+  def update(self, catalog: Catalog) -> None:
+    """Rebuilds arrays from catalog and clears cache"""
+    categories = sorted(
+        {card["category"] for card in catalog.cards if card["category"]})
+    classes = sorted(
+        {value for card in catalog.cards for value in card["classes"]})
+    types = sorted({value for card in catalog.cards for value in card["types"]})
+    category_index = {value: code for code, value in enumerate(categories)}
+    class_index = {value: code for code, value in enumerate(classes)}
+    type_index = {value: code for code, value in enumerate(types)}
+
+    size = max(catalog.card_print_ids, default=-1) + 1
+    mana_buckets = array.array("b", [NO_CODE]) * size
+    category_codes = array.array("b", [NO_CODE]) * size
+    class_codes: List[Tuple[int, ...]] = [()] * size
+    type_codes: List[Tuple[int, ...]] = [()] * size
+    for card_print in catalog.card_prints:
+      card = catalog.card_by_id[card_print["card_id"]]
+      position = card_print["id"]
+      mana_buckets[position] = get_mana_bucket(card["mana_cost"])
+      category_codes[position] = category_index.get(card["category"], NO_CODE)
+      class_codes[position] = tuple(
+          class_index[value] for value in card["classes"])
+      type_codes[position] = tuple(
+          type_index[value] for value in card["types"])
+
+    self.categories = categories
+    self.classes = classes
+    self.types = types
+    self.mana_buckets = mana_buckets
+    self.category_codes = category_codes
+    self.class_codes = class_codes
+    self.type_codes = type_codes
+    self._cache.clear()
+    self._meta_report = None
+
+  def _compute(self, quantities: Dict[int, int]) -> dict:
+    curve = [0] * len(MANA_BUCKETS)
+    categories = [0] * len(self.categories)
+    classes = [0] * len(self.classes)
+    types = [0] * len(self.types)
+    cards = 0
+    size = len(self.mana_buckets)
+    for card_print_id, quantity in quantities.items():
+      if not 0 <= card_print_id < size or quantity <= 0:
+        continue
+      cards += quantity
+      mana_bucket = self.mana_buckets[card_print_id]
+      if mana_bucket != NO_CODE:
+        curve[mana_bucket] += quantity
+      category = self.category_codes[card_print_id]
+      if category != NO_CODE:
+        categories[category] += quantity
+      for code in self.class_codes[card_print_id]:
+        classes[code] += quantity
+      for code in self.type_codes[card_print_id]:
+        types[code] += quantity
+    return {
+        "cards": cards,
+        "mana_curve": dict(zip(MANA_BUCKETS, curve)),
+        "categories": {
+            value: count
+            for value, count in zip(self.categories, categories)
+            if count
+        },
+        "classes": {
+            value: count
+            for value, count in zip(self.classes, classes)
+            if count
+        },
+        "types": {
+            value: count for value, count in zip(self.types, types) if count
+        },
+    }
+
+  def analyse(self, quantities: Dict[int, int]) -> dict:
+    """Returns statistics of card prints with given quantities
+
+    Results are cached by content hash, least recently used results are
+    dropped once there are CACHE_SIZE of them.
+    """
+    content_hash = get_content_hash(quantities)
+    if content_hash in self._cache:
+      self._cache.move_to_end(content_hash)
+      return self._cache[content_hash]
+    stats = self._compute(quantities)
+    self._cache[content_hash] = stats
+    if len(self._cache) > CACHE_SIZE:
+      self._cache.popitem(last=False)
+    return stats
+
+  def analyse_many(self, decks: Iterable[Dict[int, int]]) -> dict:
+    """Returns statistics of all decks together"""
+    return self.analyse(sum_quantities(decks))
+
+  async def get_meta_report(self, db: Prisma) -> dict:
+    """Returns statistics of all public decks together with their count
+
+    Report is read again only after META_REPORT_TTL seconds.
+    """
+    now = time.monotonic()
+    if self._meta_report is not None and self._meta_report[0] > now:
+      return self._meta_report[1]
+    decks: Dict[int, Dict[int, int]] = {}
+    for row in await database.get_public_decks_card_prints(db):
+      decks.setdefault(row.deck_id, {})[row.card_print_id] = row.quantity
+    report = dict(self.analyse_many(decks.values()), decks=len(decks))
+    self._meta_report = (now + META_REPORT_TTL, report)
+    return report
@@ -0,0 +1,250 @@
+"""
+In-memory catalog of block sets, expansion blocks, expansions, cards and
+card prints
+
+Catalog changes only when db/fill_db.py runs, so API loads it once on
+startup and serves catalog endpoints without touching database. Fill
+script asks running server to reload it through POST /catalog/reload.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+from typing import Callable, Dict, List, Optional
+
+from prisma import Prisma
+
+from api.admission import Priority, admission
+from api.records import CardPrintRecord, CardRecord
+from api.snapshot import Snapshot
+
+logger = logging.getLogger(__name__)
+
+# Card columns stored as comma separated values
+LIST_COLUMNS = ("classes", "types", "legalities")
+
+
+def get_content_hash(row: dict) -> str:
+  """Returns hash of all values of catalog row as stored in content_hash"""
+  content = json.dumps(row, sort_keys=True, ensure_ascii=False)
+  return hashlib.sha1(content.encode("utf-8")).hexdigest()
+
+
+class Catalog:
+  """Read-only catalog indexed by id, by name and by expansion"""
+
+  def __init__(self, block_sets: List[dict], expansion_blocks: List[dict],
+               expansions: List[dict], cards: List[dict],
+               card_prints: List[dict]) -> None:
+    self.block_sets = {row["id"]: row["name"] for row in block_sets}
+    self.expansion_blocks = {row["id"]: row for row in expansion_blocks}
+
+    self.expansions: List[dict] = []
+    for row in sorted(expansions, key=lambda row: row["id"]):
+      expansion_block = self.expansion_blocks[row["expansion_block_id"]]
+      self.expansions.append({
+          "id": row["id"],
+          "name": row["name"],
+          "expansion_block_id": expansion_block["id"],
+          "expansion_block": expansion_block["name"],
+          "block_set_id": expansion_block["block_set_id"],
+          "block_set": self.block_sets[expansion_block["block_set_id"]],
+      })
+    self.expansion_ids = [row["id"] for row in self.expansions]
+    self.expansion_by_id = {row["id"]: row for row in self.expansions}
+    self.expansion_by_name = {row["name"]: row for row in self.expansions}
+
+    self.cards = [
+        CardRecord(row) for row in sorted(cards, key=lambda row: row["id"])
+    ]
+    self.card_ids = [card["id"] for card in self.cards]
+    self.card_by_id = {card["id"]: card for card in self.cards}
+    self.card_by_name = {card["name"]: card for card in self.cards}
+
+    # Card prints of one card mostly share texts, they are kept once
+    texts: Dict[str, str] = {}
+    self.card_prints = [
+        CardPrintRecord(row, texts)
+        for row in sorted(card_prints, key=lambda row: row["id"])
+    ]
+    self.card_print_ids = [row["id"] for row in self.card_prints]
+    self.card_print_by_id = {row["id"]: row for row in self.card_prints}
+    self.card_print_by_number = {
+        (row["expansion_id"], row["id_in_expansion"]): row
+        for row in self.card_prints
+    }
+    self.card_prints_by_card: Dict[int, List[CardPrintRecord]] = {}
+    self.card_prints_by_expansion: Dict[int, List[CardPrintRecord]] = {}
+    for card_print in self.card_prints:
+      self.card_prints_by_card.setdefault(card_print["card_id"],
+                                          []).append(card_print)
+      self.card_prints_by_expansion.setdefault(card_print["expansion_id"],
+                                               []).append(card_print)
+
+  @classmethod
+  async def load(cls,
+                 db: Prisma,
+                 snapshot: Optional[Snapshot] = None) -> "Catalog":
+    """Returns catalog loaded from database
+
+    With snapshot only ids and keys of cards and card prints are read
+    from database and their values are read from snapshot, unless
+    snapshot does not match database. Catalog is read before operations
+    of other requests waiting for database.
+    """
+    async with admission.slot(Priority.CATALOG):
+      if snapshot is not None:
+        catalog = await cls.load_with_snapshot(db, snapshot)
+        if catalog is not None:
+          return catalog
+        logger.warning("Catalog snapshot does not match database, "
+                       "loading whole catalog from database")
+      block_sets, expansion_blocks, expansions, cards, card_prints = (
+          await asyncio.gather(db.blockset.find_many(),
+                               db.expansionblock.find_many(),
+                               db.expansion.find_many(), db.card.find_many(),
+                               db.cardprint.find_many()))
+    return cls(block_sets=[row.dict() for row in block_sets],
+               expansion_blocks=[row.dict() for row in expansion_blocks],
+               expansions=[row.dict() for row in expansions],
+               cards=[row.dict() for row in cards],
+               card_prints=[row.dict() for row in card_prints])
+
+  @classmethod
+  async def load_with_snapshot(cls, db: Prisma,
+                               snapshot: Snapshot) -> Optional["Catalog"]:
+    """Returns catalog with values of cards and card prints from snapshot
+
+    Rows are matched by natural key and every row built from snapshot has
+    to have the same content hash as stored row, otherwise None is
+    returned. Only ids, keys and hashes are read from database.
+    """
+    block_sets, expansion_blocks, expansions, cards, card_prints = (
+        await asyncio.gather(
+            db.query_raw("SELECT id, name FROM block_set"),
+            db.query_raw("SELECT id, name, block_set_id FROM expansion_block"),
+            db.query_raw(
+                "SELECT id, name, expansion_block_id FROM expansion"),
+            db.query_raw("SELECT id, name, content_hash FROM card"),
+            db.query_raw("SELECT id, card_id, expansion_id, id_in_expansion, "
+                         "content_hash FROM card_print")))
+    with snapshot.decoding():
+      return cls.from_snapshot(snapshot, block_sets, expansion_blocks,
+                               expansions, cards, card_prints)
+
+  @classmethod
+  def from_snapshot(cls, snapshot: Snapshot, block_sets: List[dict],
+                    expansion_blocks: List[dict], expansions: List[dict],
+                    cards: List[dict],
+                    card_prints: List[dict]) -> Optional["Catalog"]:
+    """Returns catalog of stored ids and keys with values from snapshot
+
+    Cards and card prints hold only ids, natural keys and content hashes,
+    None is returned if any of them is not in snapshot or differs.
+    """
+    card_positions = snapshot.get_card_positions()
+    card_rows = []
+    for stored in cards:
+      position = card_positions.get(stored["name"])
+      if position is None:
+        return None
+      card = snapshot.get_card(position)
+      row = {
+          "name": stored["name"],
+          "category": card["card_category"],
+          "mana_cost": card["card_mana_cost"],
+          "attack_type": card["card_attack_type"],
+      }
+      for column in LIST_COLUMNS:
+        row[column] = ",".join(card[f"card_{column}"]) or None
+      if get_content_hash(row) != stored["content_hash"]:
+        return None
+      card_rows.append(dict(row, id=stored["id"]))
+
+    card_names = {row["id"]: row["name"] for row in card_rows}
+    expansion_names = {row["id"]: row["name"] for row in expansions}
+    card_print_rows = []
+    for stored in card_prints:
+      position = snapshot.find_card_print(
+          card_positions[card_names[stored["card_id"]]],
+          expansion_names[stored["expansion_id"]], stored["id_in_expansion"])
+      if position is None:
+        return None
+      card_print = snapshot.get_card_print(position)
+      row = {
+          "card_id": stored["card_id"],
+          "expansion_id": stored["expansion_id"],
+          "id_in_expansion": stored["id_in_expansion"],
+          "rarity": card_print["card_print_rarity"],
+          "text_front": card_print["card_print_text_front"],
+          "text_back": card_print["card_print_text_back"],
+      }
+      if get_content_hash(row) != stored["content_hash"]:
+        return None
+      card_print_rows.append(dict(row, id=stored["id"]))
+    return cls(block_sets=block_sets,
+               expansion_blocks=expansion_blocks,
+               expansions=expansions,
+               cards=card_rows,
+               card_prints=card_print_rows)
+
+  def get_card_prints(self,
+                      card_id: Optional[int] = None,
+                      expansion_id: Optional[int] = None
+                     ) -> List[CardPrintRecord]:
+    """Returns card prints, optionally only of one card and/or expansion"""
+    if card_id is not None:
+      card_prints = self.card_prints_by_card.get(card_id, [])
+      if expansion_id is not None:
+        card_prints = [
+            card_print for card_print in card_prints
+            if card_print["expansion_id"] == expansion_id
+        ]
+      return card_prints
+    if expansion_id is not None:
+      return self.card_prints_by_expansion.get(expansion_id, [])
+    return self.card_prints
+
+
+class CatalogCache:
+  """Holds current catalog and swaps it for freshly loaded one on reload
+
+  Listeners are called with every new catalog, so structures built from
+  catalog can be updated with it.
+  """
+
+  def __init__(self,
+               catalog: Optional[Catalog] = None,
+               snapshot_path: Optional[str] = None) -> None:
+    self.catalog = catalog
+    self.snapshot_path = snapshot_path
+    self.listeners: List[Callable[[Catalog], None]] = []
+    self._lock = asyncio.Lock()
+
+  def add_listener(self, listener: Callable[[Catalog], None]) -> None:
+    """Registers listener and calls it with current catalog if loaded"""
+    self.listeners.append(listener)
+    if self.catalog is not None:
+      listener(self.catalog)
+
+  async def reload(self, db: Prisma) -> Catalog:
+    """Loads catalog from database and replaces the served one"""
+    async with self._lock:
+      catalog = await self._load(db)
+      for listener in self.listeners:
+        listener(catalog)
+      self.catalog = catalog
+    return self.catalog
+
+  async def _load(self, db: Prisma) -> Catalog:
+    """Loads catalog, with snapshot if snapshot_path is set"""
+    if self.snapshot_path is None:
+      return await Catalog.load(db)
+    try:
+      snapshot = Snapshot(self.snapshot_path)
+    except (OSError, ValueError) as error:
+      logger.warning("Could not open catalog snapshot: %s", error)
+      return await Catalog.load(db)
+    with snapshot:
+      return await Catalog.load(db, snapshot)
@@ -0,0 +1,220 @@
+"""
+Streaming import and export of collection card prints
+
+Import reads request body line by line and sends card prints to
+database in chunks which add to quantities already in collection, so
+memory usage does not grow with size of the file. Export reads the
+collection page by page with keyset pagination and streams every page
+as soon as it is read.
+
+Rows are CSV with header or newline delimited JSON objects. Card print
+is given either by card_print_id or by expansion (name) and
+id_in_expansion, quantity defaults to 1.
+"""
+
+import codecs
+import csv
+import io
+import json
+from typing import AsyncIterator, Callable, Dict, Iterable, List, Optional
+from typing import Tuple
+
+from prisma import Prisma
+
+from api import database
+from api.catalog import Catalog
+
+CSV = "csv"
+NDJSON = "ndjson"
+MEDIA_TYPES = {CSV: "text/csv", NDJSON: "application/x-ndjson"}
+EXPORT_COLUMNS = ("card_print_id", "expansion", "id_in_expansion", "card",
+                  "quantity")
+
+# Called with collection id and quantities of card prints added to it
+# keyed by card print id
+ImportListener = Callable[[int, Dict[int, int]], None]
+
+CHUNK_SIZE = 1000
+MAX_REPORTED_ERRORS = 100
+
+
+def get_format(content_type: Optional[str]) -> Optional[str]:
+  """Returns format of body with given content type or None if unknown"""
+  media_type = (content_type or "").split(";")[0].strip().lower()
+  if media_type in ("text/csv", "application/csv"):
+    return CSV
+  if media_type in ("application/x-ndjson", "application/jsonl"):
+    return NDJSON
+  return None
+
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+  """Yields decoded lines of streamed body without line endings"""
+  decoder = codecs.getincrementaldecoder("utf-8-sig")()
+  rest = ""
+  async for chunk in chunks:
+    lines = (rest + decoder.decode(chunk)).split("\n")
+    rest = lines.pop()
+    for line in lines:
+      yield line.rstrip("\r")
+  rest += decoder.decode(b"", final=True)
+  if rest:
+    yield rest.rstrip("\r")
+
+
+async def iter_rows(lines: AsyncIterator[str],
+                    file_format: str) -> AsyncIterator[Tuple[int, dict]]:
+  """Yields line number and row of every non empty line
+
+  Lines which can not be parsed are yielded with "error" key.
+  """
+  header: Optional[List[str]] = None
+  number = 0
+  async for line in lines:
+    number += 1
+    if not line.strip():
+      continue
+    if file_format == NDJSON:
+      try:
+        row = json.loads(line)
+      except ValueError:
+        yield number, {"error": "Invalid JSON"}
+        continue
+      yield number, row if isinstance(row, dict) else {"error": "Not an object"}
+      continue
+    values = next(csv.reader([line]))
+    if header is None:
+      header = [value.strip().lower() for value in values]
+      continue
+    yield number, dict(zip(header, values))
+
+
+def get_card_print_id(row: dict, catalog: Catalog) -> int:
+  """Returns id of card print row refers to, raises ValueError if unknown"""
+  if row.get("card_print_id") not in (None, ""):
+    card_print = catalog.card_print_by_id.get(int(row["card_print_id"]))
+  else:
+    expansion = catalog.expansion_by_name.get(row.get("expansion"))
+    if expansion is None:
+      raise ValueError("Unknown expansion")
+    card_print = catalog.card_print_by_number.get(
+        (expansion["id"], int(row.get("id_in_expansion"))))
+  if card_print is None:
+    raise ValueError("Unknown card print")
+  return card_print["id"]
+
+
+def get_quantity(row: dict) -> int:
+  """Returns positive quantity of row, raises ValueError if invalid"""
+  quantity = row.get("quantity")
+  quantity = 1 if quantity in (None, "") else int(quantity)
+  if quantity < 1:
+    raise ValueError("Quantity must be positive")
+  return quantity
+
+
+async def import_card_prints(db: Prisma,
+                             collection_id: int,
+                             chunks: AsyncIterator[bytes],
+                             file_format: str,
+                             catalog: Catalog,
+                             chunk_size: int = CHUNK_SIZE,
+                             listeners: Iterable[ImportListener] = ()) -> dict:
+  """Adds card prints of streamed body to collection
+
+  Quantities of the same card print within a chunk are summed before
+  they are sent, every chunk is one upsert query after which listeners
+  are called. Invalid rows are skipped and reported.
+  """
+  quantities: Dict[int, int] = {}
+  rows = 0
+  imported = 0
+  errors = []
+  error_count = 0
+  async for number, row in iter_rows(iter_lines(chunks), file_format):
+    rows += 1
+    try:
+      if "error" in row:
+        raise ValueError(row["error"])
+      card_print_id = get_card_print_id(row, catalog)
+      quantity = get_quantity(row)
+    except (TypeError, ValueError) as error:
+      error_count += 1
+      if len(errors) < MAX_REPORTED_ERRORS:
+        errors.append({"line": number, "error": str(error)})
+      continue
+    quantities[card_print_id] = quantities.get(card_print_id, 0) + quantity
+    imported += 1
+    if len(quantities) >= chunk_size:
+      await add_quantities(db, collection_id, quantities, listeners)
+      quantities = {}
+  await add_quantities(db, collection_id, quantities, listeners)
+  return {
+      "rows": rows,
+      "imported": imported,
+      "skipped": error_count,
+      "errors": errors,
+  }
+
+
+async def add_quantities(db: Prisma, collection_id: int,
+                         quantities: Dict[int, int],
+                         listeners: Iterable[ImportListener]) -> None:
+  """Adds quantities to collection and tells listeners about it"""
+  if not quantities:
+    return
+  await database.add_collection_card_print_quantities(db, collection_id,
+                                                      quantities)
+  for listener in listeners:
+    listener(collection_id, quantities)
+
+
+def get_export_row(card_print_id: int, quantity: int,
+                   catalog: Catalog) -> dict:
+  """Returns exported row of collection card print"""
+  card_print = catalog.card_print_by_id.get(card_print_id)
+  if card_print is None:
+    return dict(dict.fromkeys(EXPORT_COLUMNS),
+                card_print_id=card_print_id,
+                quantity=quantity)
+  return {
+      "card_print_id": card_print_id,
+      "expansion": catalog.expansion_by_id[card_print["expansion_id"]]["name"],
+      "id_in_expansion": card_print["id_in_expansion"],
+      "card": catalog.card_by_id[card_print["card_id"]]["name"],
+      "quantity": quantity,
+  }
+
+
+def format_rows(rows: List[dict], file_format: str) -> str:
+  """Returns rows serialized in given format"""
+  if file_format == NDJSON:
+    return "".join(json.dumps(row) + "\n" for row in rows)
+  buffer = io.StringIO()
+  writer = csv.DictWriter(buffer, EXPORT_COLUMNS, lineterminator="\n")
+  writer.writerows(rows)
+  return buffer.getvalue()
+
+
+async def export_card_prints(
+    db: Prisma,
+    collection_id: int,
+    file_format: str,
+    catalog: Catalog,
+    chunk_size: int = CHUNK_SIZE) -> AsyncIterator[str]:
+  """Yields collection card prints page by page in given format"""
+  if file_format == CSV:
+    yield ",".join(EXPORT_COLUMNS) + "\n"
+  after = None
+  while True:
+    rows = await database.get_collection_card_prints(
+        db, collection_id, after_card_print_id=after, take=chunk_size)
+    if not rows:
+      return
+    yield format_rows([
+        get_export_row(row.card_print_id, row.quantity, catalog)
+        for row in rows
+    ], file_format)
+    if len(rows) < chunk_size:
+      return
+    after = rows[-1].card_print_id
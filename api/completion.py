@@ -0,0 +1,208 @@
+"""
+Collection completion statistics
+
+For every expansion catalog gives number of card prints of each rarity.
+For every collection index keeps set of owned card prints and number of
+owned card prints of each rarity in every expansion. Counters are
+updated with every write to collection, so statistics of a collection
+are computed from counters in time proportional to number of
+expansions, not to size of collection.
+"""
+
+import asyncio
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from prisma import Prisma
+
+from api import database
+from api.catalog import Catalog
+
+# Order of CardPrintRarity enum
+RARITIES = ("Common", "Uncommon", "Rare", "Epic", "Legendary")
+
+# expansion id -> rarity -> number of card prints
+Counters = Dict[int, Dict[str, int]]
+
+
+def get_rarity_order(rarity: str) -> int:
+  """Returns position of rarity in RARITIES, unknown rarities go last"""
+  return RARITIES.index(rarity) if rarity in RARITIES else len(RARITIES)
+
+
+class CollectionCompletion:
+  """Owned card prints of one collection counted per expansion and rarity"""
+
+  def __init__(self) -> None:
+    self.card_print_ids: Set[int] = set()
+    self.counters: Counters = {}
+
+
+class CompletionIndex:
+  """Completion counters of collections updated on every collection write
+
+  Collections are loaded lazily on first request, writes to collections
+  which are not loaded are ignored since they are read on load.
+  """
+
+  def __init__(self) -> None:
+    self.catalog: Optional[Catalog] = None
+    self.totals: Counters = {}
+    self.collections: Dict[int, CollectionCompletion] = {}
+    # Collection id -> writes (is added, card print ids) done while
+    # collection was loading, they are applied after load in order
+    self._pending: Dict[int, List[Tuple[bool, List[int]]]] = {}
+    self._locks: Dict[int, asyncio.Lock] = {}
+    # Collection id -> number of calls holding or waiting for its lock,
+    # lock is dropped only once nobody uses it, so one load runs at a time
+    self._lock_users: Dict[int, int] = {}
+    # Collections forgotten while loading, their loaded counters may miss
+    # the change so they are not kept
+    self._stale: Set[int] = set()
+
+  def update(self, catalog: Catalog) -> None:
+    """Recounts totals and counters of loaded collections with catalog"""
+    totals: Counters = {}
+    for card_print in catalog.card_prints:
+      rarities = totals.setdefault(card_print["expansion_id"], {})
+      rarities[card_print["rarity"]] = rarities.get(card_print["rarity"],
+                                                    0) + 1
+    self.catalog = catalog
+    self.totals = totals
+    for collection in self.collections.values():
+      card_print_ids = collection.card_print_ids
+      collection.card_print_ids = set()
+      collection.counters = {}
+      self._add(collection, card_print_ids)
+
+  def _add(self, collection: CollectionCompletion,
+           card_print_ids: Iterable[int]) -> None:
+    for card_print_id in card_print_ids:
+      card_print = self.catalog.card_print_by_id.get(card_print_id)
+      if card_print is None or card_print_id in collection.card_print_ids:
+        continue
+      collection.card_print_ids.add(card_print_id)
+      rarities = collection.counters.setdefault(card_print["expansion_id"], {})
+      rarities[card_print["rarity"]] = rarities.get(card_print["rarity"],
+                                                    0) + 1
+
+  def _discard(self, collection: CollectionCompletion,
+               card_print_ids: Iterable[int]) -> None:
+    for card_print_id in card_print_ids:
+      if card_print_id not in collection.card_print_ids:
+        continue
+      collection.card_print_ids.remove(card_print_id)
+      card_print = self.catalog.card_print_by_id[card_print_id]
+      collection.counters[card_print["expansion_id"]][card_print["rarity"]] -= 1
+
+  def add(self, collection_id: int, card_print_ids: Iterable[int]) -> None:
+    """Counts card prints which were added to collection"""
+    if collection_id in self._pending:
+      self._pending[collection_id].append((True, list(card_print_ids)))
+    elif collection_id in self.collections:
+      self._add(self.collections[collection_id], card_print_ids)
+
+  def discard(self, collection_id: int, card_print_ids: Iterable[int]) -> None:
+    """Uncounts card prints which were removed from collection"""
+    if collection_id in self._pending:
+      self._pending[collection_id].append((False, list(card_print_ids)))
+    elif collection_id in self.collections:
+      self._discard(self.collections[collection_id], card_print_ids)
+
+  def forget(self, collection_id: int) -> None:
+    """Drops counters of collection, e.g. when collection is deleted"""
+    self.collections.pop(collection_id, None)
+    if collection_id in self._pending:
+      self._stale.add(collection_id)
+
+  def apply_deltas(self, collection_id: int, deltas: Dict[int, int]) -> None:
+    """Counts card prints whose quantity in collection was changed
+
+    Collection is forgotten if any quantity was lowered, since only
+    database knows whether its card print is still in collection.
+    """
+    if any(delta < 0 for delta in deltas.values()):
+      self.forget(collection_id)
+    else:
+      self.add(collection_id, [
+          card_print_id for card_print_id, delta in deltas.items() if delta > 0
+      ])
+
+  async def get_collection(self, db: Prisma,
+                           collection_id: int) -> CollectionCompletion:
+    """Returns counters of collection, loading them if needed"""
+    if collection_id in self.collections:
+      return self.collections[collection_id]
+    lock = self._locks.setdefault(collection_id, asyncio.Lock())
+    self._lock_users[collection_id] = self._lock_users.get(collection_id,
+                                                           0) + 1
+    try:
+      async with lock:
+        if collection_id not in self.collections:
+          self._pending[collection_id] = []
+          try:
+            card_print_ids = await database.get_collection_card_print_ids(
+                db, collection_id)
+            collection = CollectionCompletion()
+            self._add(collection, card_print_ids)
+            for is_added, pending_ids in self._pending[collection_id]:
+              if is_added:
+                self._add(collection, pending_ids)
+              else:
+                self._discard(collection, pending_ids)
+            if collection_id in self._stale:
+              self._stale.discard(collection_id)
+              return collection
+            self.collections[collection_id] = collection
+          finally:
+            del self._pending[collection_id]
+    finally:
+      self._lock_users[collection_id] -= 1
+      if not self._lock_users[collection_id]:
+        del self._lock_users[collection_id]
+        del self._locks[collection_id]
+    return self.collections[collection_id]
+
+  def get_stats(self, collection: CollectionCompletion) -> dict:
+    """Returns completion of every expansion, expansion block and block set
+
+    Every entry holds number of owned distinct card prints and total
+    number of card prints, overall and by rarity.
+    """
+    levels: Dict[str, Dict[int, dict]] = {
+        "expansions": {},
+        "expansion_blocks": {},
+        "block_sets": {},
+    }
+    for expansion in self.catalog.expansions:
+      owned = collection.counters.get(expansion["id"], {})
+      keys = (("expansions", expansion["id"], expansion["name"]),
+              ("expansion_blocks", expansion["expansion_block_id"],
+               expansion["expansion_block"]),
+              ("block_sets", expansion["block_set_id"],
+               expansion["block_set"]))
+      for level, level_id, name in keys:
+        entry = levels[level].setdefault(level_id, {
+            "id": level_id,
+            "name": name,
+            "rarities": {},
+        })
+        for rarity, total in self.totals.get(expansion["id"], {}).items():
+          counts = entry["rarities"].setdefault(rarity, [0, 0])
+          counts[0] += owned.get(rarity, 0)
+          counts[1] += total
+    stats: Dict[str, List[dict]] = {}
+    for level, entries in levels.items():
+      stats[level] = []
+      for entry in entries.values():
+        entry["owned"] = sum(counts[0] for counts in entry["rarities"].values())
+        entry["total"] = sum(counts[1] for counts in entry["rarities"].values())
+        entry["rarities"] = {
+            rarity: {
+                "owned": counts[0],
+                "total": counts[1]
+            } for rarity, counts in sorted(entry["rarities"].items(),
+                                           key=lambda item: get_rarity_order(
+                                               item[0]))
+        }
+        stats[level].append(entry)
+    return stats
@@ -1,205 +1,672 @@
-"""Useful database queries and functions"""
+"""Useful database queries and functions
 
-from typing import Optional
+All functions expect already connected client, API shares one client
+for its whole lifetime, see create_client. Query functions are timed,
+see api/metrics.py, and wait for free slot, see api/admission.py.
+Writes drop cached views of rows they change, see api/views.py.
+Read-only functions run on read replicas, see api/replicas.py, except
+those loading state kept in memory and updated by later writes, which
+has to start from primary.
+"""
+
+import os
+from typing import Dict, List, Optional, Sequence
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
 
 from prisma import Prisma
 from prisma.models import BlockSet, ExpansionBlock, Expansion
 from prisma.models import Card, CardPrint, User, Collection, Deck
+from prisma.models import CollectionHasCardPrint, DeckHasCardPrint
+
+from api.admission import admitted
+from api.metrics import timed_query
+from api.replicas import read_only, writes
+from api.views import COLLECTION, DECK, KINDS, QUANTITY_KINDS
+from api.views import USER_COLLECTIONS, USER_DECKS, get_row_tags, view_cache
+
+
+DEFAULT_POOL_SIZE = 10
+DEFAULT_POOL_TIMEOUT = 10
+# Tables with card print quantities: (owner column, owner table)
+QUANTITY_TABLES = {
+    "collection_has_card_print": ("collection_id", "collection"),
+    "deck_has_card_print": ("deck_id", "deck"),
+}
+# Columns of user owned tables which can be read selectively
+COLLECTION_COLUMNS = ("id", "name", "description")
+DECK_COLUMNS = ("id", "name", "description", "hero_card_print_id")
+
+
+###
+# Client functions
+###
+def get_database_url(url: Optional[str] = None) -> str:
+  """Returns database url with connection pool settings from environment
+
+  Pool size is read from DATABASE_POOL_SIZE and time to wait for free
+  connection (in seconds) from DATABASE_POOL_TIMEOUT.
+  """
+  parts = urlsplit(url or os.getenv("DATABASE_URL", ""))
+  query = dict(parse_qsl(parts.query))
+  query["connection_limit"] = str(get_pool_size())
+  query["pool_timeout"] = os.getenv("DATABASE_POOL_TIMEOUT",
+                                    str(DEFAULT_POOL_TIMEOUT))
+  return urlunsplit(parts._replace(query=urlencode(query)))
+
+
+def get_pool_size() -> int:
+  """Returns max number of open connections from DATABASE_POOL_SIZE"""
+  return int(os.getenv("DATABASE_POOL_SIZE", str(DEFAULT_POOL_SIZE)))
+
+
+def get_replica_urls() -> List[str]:
+  """Returns read replica urls from comma separated DATABASE_REPLICA_URLS"""
+  return [
+      url.strip()
+      for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",")
+      if url.strip()
+  ]
+
+
+def create_client(url: Optional[str] = None) -> Prisma:
+  """Returns new not yet connected client with bounded connection pool"""
+  return Prisma(datasource={"url": get_database_url(url)})
 
 
 ###
 # Delete all data from table functions
 ###
+@admitted
+@timed_query
+@writes
 async def delete_all_block_sets(db: Prisma) -> int:
   """Delete all data from block_set table from database"""
-  await db.connect()
   deleted_sets_count = await db.blockset.delete_many()
-  await db.disconnect()
+  view_cache.invalidate_kinds(*KINDS)
   return deleted_sets_count
 
 
+@admitted
+@timed_query
+@writes
 async def delete_all_expansion_blocks(db: Prisma) -> int:
   """Delete all data from expansion_block table from database"""
-  await db.connect()
   deleted_expansion_blocks_count = await db.expansionblock.delete_many()
-  await db.disconnect()
+  view_cache.invalidate_kinds(*KINDS)
   return deleted_expansion_blocks_count
 
 
+@admitted
+@timed_query
+@writes
 async def delete_all_expansions(db: Prisma) -> int:
   """Delete all data from expansion table from database"""
-  await db.connect()
   deleted_expansions_count = await db.expansion.delete_many()
-  await db.disconnect()
+  view_cache.invalidate_kinds(*KINDS)
   return deleted_expansions_count
 
 
+@admitted
+@timed_query
+@writes
 async def delete_all_cards(db: Prisma) -> int:
   """Delete all data from card table from database"""
-  await db.connect()
   deleted_cards_count = await db.card.delete_many()
-  await db.disconnect()
+  view_cache.invalidate_kinds(*KINDS)
   return deleted_cards_count
 
 
+@admitted
+@timed_query
+@writes
 async def delete_all_card_prints(db: Prisma) -> int:
   """Delete all data from card_print table from database"""
-  await db.connect()
   deleted_card_prints_count = await db.cardprint.delete_many()
-  await db.disconnect()
+  view_cache.invalidate_kinds(*KINDS)
   return deleted_card_prints_count
 
 
+@admitted
+@timed_query
+@writes
 async def delete_all_users(db: Prisma) -> int:
   """Delete all data from user table from database"""
-  await db.connect()
   deleted_users_count = await db.user.delete_many()
-  await db.disconnect()
+  view_cache.invalidate_kinds(*KINDS)
   return deleted_users_count
 
 
+@admitted
+@timed_query
+@writes
 async def delete_all_collections(db: Prisma) -> int:
   """Delete all data from collection table from database"""
-  await db.connect()
   deleted_collections_count = await db.collection.delete_many()
-  await db.disconnect()
+  view_cache.invalidate_kinds(COLLECTION, USER_COLLECTIONS)
   return deleted_collections_count
 
 
+@admitted
+@timed_query
+@writes
 async def delete_all_decks(db: Prisma) -> int:
   """Delete all data from deck table from database"""
-  await db.connect()
   deleted_decks_count = await db.deck.delete_many()
-  await db.disconnect()
+  view_cache.invalidate_kinds(DECK, USER_DECKS)
   return deleted_decks_count
 
 
 ###
 # Add data to table functions
 ###
+@admitted
+@timed_query
+@writes
 async def add_block_set(db: Prisma, name: str) -> BlockSet:
   """Add a block set to the database"""
-  await db.connect()
   block_set = await db.blockset.create(data={"name": name},)
-  await db.disconnect()
   return block_set
 
 
+@admitted
+@timed_query
+@writes
 async def add_expansion_block(db: Prisma, name: str,
                               block_set_id: int) -> ExpansionBlock:
   """Add an expansion block to the database"""
-  await db.connect()
   expansion_block = await db.expansionblock.create(data={
       "name": name,
       "block_set_id": block_set_id,
   })
-  await db.disconnect()
   return expansion_block
 
 
+@admitted
+@timed_query
+@writes
 async def add_expansion(db: Prisma, name: str,
                         expansion_block_id: int) -> Expansion:
   """Add an expansion to the database"""
-  await db.connect()
   expansion = await db.expansion.create(data={
       "name": name,
       "expansion_block_id": expansion_block_id,
   })
-  await db.disconnect()
   return expansion
 
 
+@admitted
+@timed_query
+@writes
 async def add_card(db: Prisma,
                    name: str,
                    category: Optional[str] = None,
-                   mana_cost: Optional[int] = None,
-                   classes: Optional[list] = None,
-                   types: Optional[list] = None,
-                   attack_types: Optional[list] = None,
-                   legalities: Optional[list] = None) -> Card:
+                   mana_cost: Optional[str] = None,
+                   classes: Optional[str] = None,
+                   types: Optional[str] = None,
+                   attack_type: Optional[str] = None,
+                   legalities: Optional[str] = None) -> Card:
   """Add a card to the database"""
-  await db.connect()
-  card = await db.Card.create(
+  card = await db.card.create(
       data={
           "name": name,
           "category": category,
           "mana_cost": mana_cost,
           "classes": classes,
           "types": types,
-          "attack_types": attack_types,
+          "attack_type": attack_type,
           "legalities": legalities,
       })
-  await db.disconnect()
   return card
 
 
+@admitted
+@timed_query
+@writes
 async def add_card_print(db: Prisma,
                          card_id: int,
                          expansion_id: int,
                          id_in_expansion: int,
-                         image_front_url: str,
                          rarity: str,
-                         image_back_url: Optional[str] = None,
-                         rules: Optional[str] = None) -> CardPrint:
+                         text_front: Optional[str] = None,
+                         text_back: Optional[str] = None) -> CardPrint:
   """Add a card print to the database"""
-  await db.connect()
   card_print = await db.cardprint.create(
       data={
           "card_id": card_id,
           "expansion_id": expansion_id,
           "id_in_expansion": id_in_expansion,
-          "image_front_url": image_front_url,
-          "image_back_url": image_back_url,
-          "rules": rules,
           "rarity": rarity,
+          "text_front": text_front,
+          "text_back": text_back,
       })
-  await db.disconnect()
   return card_print
 
 
+@admitted
+@timed_query
+@writes
 async def add_user(db: Prisma,
-                   username: str,
+                   nickname: str,
                    email: str,
                    user_role: str = "Basic") -> User:
   """Add a user to the database"""
-  await db.connect()
   user = await db.user.create(data={
-      "username": username,
+      "nickname": nickname,
       "email": email,
       "user_role": user_role,
   })
-  await db.disconnect()
   return user
 
 
+@admitted
+@timed_query
+@writes
 async def add_collcetion(db: Prisma,
                          user_id: int,
                          name: str,
                          description: Optional[str] = None) -> Collection:
   """Add a collection to the database"""
-  await db.connect()
   collection = await db.collection.create(data={
       "user_id": user_id,
       "name": name,
       "description": description,
   })
-  await db.disconnect()
+  view_cache.invalidate((USER_COLLECTIONS, user_id))
   return collection
 
 
+@admitted
+@timed_query
+@writes
 async def add_deck(db: Prisma,
                    user_id: int,
                    hero_card_print_id: int,
                    name: str,
-                   description: Optional[str] = None) -> Deck:
+                   description: Optional[str] = None,
+                   is_public: bool = False) -> Deck:
   """Add a deck to the database"""
-  await db.connect()
   deck = await db.deck.create(
       data={
           "user_id": user_id,
           "name": name,
           "description": description,
-          "hero_card_print_id": hero_card_print_id
+          "hero_card_print_id": hero_card_print_id,
+          "is_public": is_public
       })
-  await db.disconnect()
+  view_cache.invalidate((USER_DECKS, user_id))
   return deck
+
+
+###
+# Bulk insert functions
+###
+@admitted
+@timed_query
+@writes
+async def add_many(db: Prisma,
+                   table: str,
+                   rows: List[dict],
+                   batch_size: int = 1000) -> int:
+  """Add rows to table in chunks of batch_size using one transaction
+
+  Every chunk is sent as a single create_many query and all chunks are
+  committed together.
+  """
+  if not rows:
+    return 0
+  async with db.batch_() as batcher:
+    actions = getattr(batcher, table)
+    for start in range(0, len(rows), batch_size):
+      actions.create_many(data=rows[start:start + batch_size])
+  view_cache.invalidate(*get_row_tags(table, rows))
+  return len(rows)
+
+
+@admitted
+@timed_query
+@writes
+async def add_collection_card_print_quantities(
+    db: Prisma, collection_id: int, quantities: Dict[int, int]) -> int:
+  """Add quantities of card prints to collection in one query
+
+  Rows already in collection get quantity increased, others are
+  inserted. Returns number of affected rows as reported by MySQL.
+  """
+  if not quantities:
+    return 0
+  values = ", ".join(["(?, ?, ?)"] * len(quantities))
+  params = []
+  for card_print_id, quantity in quantities.items():
+    params.extend((collection_id, card_print_id, quantity))
+  count = await db.execute_raw(
+      "INSERT INTO collection_has_card_print "
+      "(collection_id, card_print_id, quantity) "
+      f"VALUES {values} "
+      "ON DUPLICATE KEY UPDATE quantity = quantity + VALUES(quantity)",
+      *params)
+  view_cache.invalidate((COLLECTION, collection_id))
+  return count
+
+
+@admitted
+@timed_query
+@writes
+async def add_card_print_quantity_deltas(db: Prisma, table: str,
+                                         deltas: Dict[int, Dict[int,
+                                                                int]]) -> None:
+  """Adds quantity deltas keyed by owner id and card print id
+
+  All deltas are written in one transaction of at most three statements.
+  Positive deltas are upserted, negative ones lower quantity down to zero
+  and rows left with zero quantity are deleted.
+  """
+  owner_column = QUANTITY_TABLES[table][0]
+  added = []
+  removed = []
+  for owner_id, card_print_deltas in deltas.items():
+    for card_print_id, delta in card_print_deltas.items():
+      if delta > 0:
+        added.extend((owner_id, card_print_id, delta))
+      elif delta < 0:
+        removed.append((owner_id, card_print_id, -delta))
+  if not added and not removed:
+    return
+  async with db.batch_() as batcher:
+    if added:
+      values = ", ".join(["(?, ?, ?)"] * (len(added) // 3))
+      batcher.execute_raw(
+          f"INSERT INTO {table} ({owner_column}, card_print_id, quantity) "
+          f"VALUES {values} "
+          "ON DUPLICATE KEY UPDATE quantity = quantity + VALUES(quantity)",
+          *added)
+    if removed:
+      keys = ", ".join(["(?, ?)"] * len(removed))
+      key_params = [value for row in removed for value in row[:2]]
+      cases = " ".join([f"WHEN {owner_column} = ? AND card_print_id = ? "
+                        "THEN ?"] * len(removed))
+      batcher.execute_raw(
+          f"UPDATE {table} SET quantity = quantity - "
+          f"LEAST(quantity, CASE {cases} END) "
+          f"WHERE ({owner_column}, card_print_id) IN ({keys})",
+          *[value for row in removed for value in row], *key_params)
+      batcher.execute_raw(
+          f"DELETE FROM {table} WHERE quantity = 0 "
+          f"AND ({owner_column}, card_print_id) IN ({keys})", *key_params)
+  # Views already hold pending deltas, but replicas get them only now
+  view_cache.invalidate(*[(QUANTITY_KINDS[table], owner_id)
+                          for owner_id in deltas])
+
+
+@admitted
+@timed_query
+async def quantity_owner_exists(db: Prisma, table: str, owner_id: int) -> bool:
+  """Returns whether collection or deck owning quantities of table exists"""
+  owner_table = QUANTITY_TABLES[table][1]
+  rows = await db.query_raw(f"SELECT id FROM {owner_table} WHERE id = ?",
+                            owner_id)
+  return bool(rows)
+
+
+@admitted
+@timed_query
+async def get_stored_quantity(db: Prisma, table: str, owner_id: int,
+                              card_print_id: int) -> Optional[int]:
+  """Returns stored quantity of card print in collection or deck of table
+
+  Quantity is 0 if card print is not stored and None if collection or
+  deck does not exist. Read on primary, since quantity has to include
+  every flushed change.
+  """
+  owner_column, owner_table = QUANTITY_TABLES[table]
+  rows = await db.query_raw(
+      f"SELECT {owner_table}.id, {table}.quantity FROM {owner_table} "
+      f"LEFT JOIN {table} ON {table}.{owner_column} = {owner_table}.id "
+      f"AND {table}.card_print_id = ? WHERE {owner_table}.id = ?",
+      card_print_id, owner_id)
+  if not rows:
+    return None
+  return rows[0]["quantity"] or 0
+
+
+@admitted
+@timed_query
+@read_only
+async def user_exists(db: Prisma, user_id: int) -> bool:
+  """Returns whether user exists"""
+  user = await db.user.find_unique(where={"id": user_id})
+  return user is not None
+
+
+@admitted
+@timed_query
+@read_only
+async def collection_exists(db: Prisma, collection_id: int) -> bool:
+  """Returns whether collection exists"""
+  collection = await db.collection.find_unique(where={"id": collection_id})
+  return collection is not None
+
+
+###
+# Keyset pagination functions
+###
+@admitted
+@timed_query
+@read_only
+async def get_user_collections(
+    db: Prisma,
+    user_id: int,
+    after_id: Optional[int] = None,
+    take: int = 100,
+    columns: Sequence[str] = COLLECTION_COLUMNS) -> List[dict]:
+  """Returns up to take collections of user with id greater than after_id
+
+  Only given columns are read. Seeks on fk_collection_user1_idx which
+  also holds collection ids, so listing only ids and names does not read
+  descriptions.
+  """
+  return await get_user_rows(db, "collection", COLLECTION_COLUMNS, user_id,
+                             after_id, take, columns)
+
+
+@admitted
+@timed_query
+@read_only
+async def get_collection_card_prints(
+    db: Prisma,
+    collection_id: int,
+    after_card_print_id: Optional[int] = None,
+    take: int = 100) -> List[CollectionHasCardPrint]:
+  """Returns up to take card prints of collection after given card print
+
+  Seeks on primary key (collection_id, card_print_id).
+  """
+  where = {"collection_id": collection_id}
+  if after_card_print_id is not None:
+    where["card_print_id"] = {"gt": after_card_print_id}
+  return await db.collectionhascardprint.find_many(
+      where=where, order={"card_print_id": "asc"}, take=take)
+
+
+@admitted
+@timed_query
+@read_only
+async def get_user_decks(db: Prisma,
+                         user_id: int,
+                         after_id: Optional[int] = None,
+                         take: int = 100,
+                         columns: Sequence[str] = DECK_COLUMNS) -> List[dict]:
+  """Returns up to take decks of user with id greater than after_id
+
+  Only given columns are read. Seeks on fk_deck_user1_idx which also
+  holds deck ids.
+  """
+  return await get_user_rows(db, "deck", DECK_COLUMNS, user_id, after_id,
+                             take, columns)
+
+
+async def get_user_rows(db: Prisma, table: str, table_columns: Sequence[str],
+                        user_id: int, after_id: Optional[int], take: int,
+                        columns: Sequence[str]) -> List[dict]:
+  """Returns page of given columns of rows of user ordered by id
+
+  Raises ValueError if any column is not one of table_columns, so column
+  names in query always come from this module.
+  """
+  unknown = set(columns).difference(table_columns)
+  if unknown:
+    raise ValueError(f"Unknown columns of {table}: {sorted(unknown)}")
+  where = "user_id = ?"
+  params: List[int] = [user_id]
+  if after_id is not None:
+    where += " AND id > ?"
+    params.append(after_id)
+  return await db.query_raw(
+      f"SELECT {', '.join(columns)} FROM {table} WHERE {where} "
+      "ORDER BY id LIMIT ?", *params, take)
+
+
+@admitted
+@timed_query
+async def get_collection_card_print_ids(db: Prisma,
+                                        collection_id: int) -> List[int]:
+  """Returns ids of all card prints in collection
+
+  Reads only primary key (collection_id, card_print_id).
+  """
+  rows = await db.query_raw(
+      "SELECT card_print_id FROM collection_has_card_print "
+      "WHERE collection_id = ?", collection_id)
+  return [row["card_print_id"] for row in rows]
+
+
+@admitted
+@timed_query
+@read_only
+async def get_deck_card_prints(db: Prisma,
+                               deck_id: int,
+                               after_card_print_id: Optional[int] = None,
+                               take: int = 100) -> List[DeckHasCardPrint]:
+  """Returns up to take card prints of deck after given card print
+
+  Seeks on primary key (deck_id, card_print_id).
+  """
+  where = {"deck_id": deck_id}
+  if after_card_print_id is not None:
+    where["card_print_id"] = {"gt": after_card_print_id}
+  return await db.deckhascardprint.find_many(
+      where=where, order={"card_print_id": "asc"}, take=take)
+
+
+###
+# Batch read functions
+###
+@admitted
+@timed_query
+@read_only
+async def get_decks(db: Prisma, deck_ids: List[int]) -> List[Deck]:
+  """Returns decks with given ids in one query"""
+  return await db.deck.find_many(where={"id": {"in": deck_ids}})
+
+
+@admitted
+@timed_query
+@read_only
+async def get_decks_card_prints(db: Prisma,
+                                deck_ids: List[int]) -> List[DeckHasCardPrint]:
+  """Returns card prints of all decks with given ids in one query"""
+  return await db.deckhascardprint.find_many(
+      where={"deck_id": {
+          "in": deck_ids
+      }})
+
+
+@admitted
+@timed_query
+@read_only
+async def get_collections(db: Prisma,
+                          collection_ids: List[int]) -> List[Collection]:
+  """Returns collections with given ids in one query"""
+  return await db.collection.find_many(where={"id": {"in": collection_ids}})
+
+
+@admitted
+@timed_query
+@read_only
+async def get_collections_card_prints(
+    db: Prisma, collection_ids: List[int]) -> List[CollectionHasCardPrint]:
+  """Returns card prints of all collections with given ids in one query"""
+  return await db.collectionhascardprint.find_many(
+      where={"collection_id": {
+          "in": collection_ids
+      }})
+
+
+@admitted
+@timed_query
+@read_only
+async def get_public_decks_card_prints(db: Prisma) -> List[DeckHasCardPrint]:
+  """Returns card prints of all public decks in one query"""
+  return await db.deckhascardprint.find_many(
+      where={"deck": {
+          "is": {
+              "is_public": True
+          }
+      }})
+
+
+###
+# Ownership functions
+###
+@admitted
+@timed_query
+async def get_collection_user_ids(
+    db: Prisma,
+    collection_ids: Optional[Sequence[int]] = None) -> Dict[int, int]:
+  """Returns ids of owners of collections keyed by collection id
+
+  Owners of given collections only are returned if collection_ids are
+  given.
+  """
+  where = ""
+  if collection_ids is not None:
+    where = f" WHERE id IN ({', '.join(['?'] * len(collection_ids))})"
+  rows = await db.query_raw("SELECT id, user_id FROM collection" + where,
+                            *(collection_ids or ()))
+  return {row["id"]: row["user_id"] for row in rows}
+
+
+@admitted
+@timed_query
+async def get_user_card_print_quantities(
+    db: Prisma, user_ids: Optional[Sequence[int]] = None) -> List[dict]:
+  """Returns quantity of every card print over all collections of a user
+
+  Rows hold user_id, card_print_id and quantity, of given users only if
+  user_ids are given.
+  """
+  where = ""
+  if user_ids is not None:
+    where = f"WHERE collection.user_id IN ({', '.join(['?'] * len(user_ids))}) "
+  return await db.query_raw(
+      "SELECT collection.user_id, collection_has_card_print.card_print_id, "
+      "SUM(collection_has_card_print.quantity) AS quantity "
+      "FROM collection_has_card_print JOIN collection "
+      "ON collection.id = collection_has_card_print.collection_id " + where +
+      "GROUP BY collection.user_id, collection_has_card_print.card_print_id",
+      *(user_ids or ()))
+
+
+@admitted
+@timed_query
+async def get_user_card_print_ids(
+    db: Prisma, user_ids: Optional[Sequence[int]] = None) -> List[dict]:
+  """Returns user_id and card_print_id rows of user_has_card_print
+
+  Only rows of given users are returned if user_ids are given.
+  """
+  where = ""
+  if user_ids is not None:
+    where = f" WHERE user_id IN ({', '.join(['?'] * len(user_ids))})"
+  return await db.query_raw(
+      "SELECT user_id, card_print_id FROM user_has_card_print" + where,
+      *(user_ids or ()))
@@ -0,0 +1,99 @@
+"""FastAPI dependencies shared by API routes"""
+
+from typing import Awaitable, Callable
+
+from fastapi import Depends, Request
+from prisma import Prisma
+
+from api.admission import Priority, request_admission
+from api.analytics import DeckAnalytics
+from api.catalog import Catalog
+from api.completion import CompletionIndex
+from api.facets import FacetIndex
+from api.legality import LegalityIndex
+from api.loaders import Loaders
+from api.responses import ResponseCache
+from api.search import SearchIndex
+from api.trades import TradeIndex
+from api.views import ViewCache, view_cache
+from api.write_buffer import QuantityBuffer
+
+
+def get_db(request: Request) -> Prisma:
+  """Returns database client connected for the whole application lifetime"""
+  return request.app.state.db
+
+
+def request_priority(priority: Priority) -> Callable[[], Awaitable[None]]:
+  """Returns dependency running database operations of route with priority"""
+
+  async def set_priority() -> None:
+    state = request_admission.get()
+    if state is not None:
+      state.priority = priority
+
+  return set_priority
+
+
+def get_collection_quantities(request: Request) -> QuantityBuffer:
+  """Returns pending quantity changes of collection card prints"""
+  return request.app.state.collection_quantities
+
+
+def get_deck_quantities(request: Request) -> QuantityBuffer:
+  """Returns pending quantity changes of deck card prints"""
+  return request.app.state.deck_quantities
+
+
+def get_loaders(
+    db: Prisma = Depends(get_db),
+    collection_quantities: QuantityBuffer = Depends(get_collection_quantities),
+    deck_quantities: QuantityBuffer = Depends(get_deck_quantities)
+) -> Loaders:
+  """Returns batching loaders of database rows created for one request"""
+  return Loaders(db, collection_quantities, deck_quantities)
+
+
+def get_catalog(request: Request) -> Catalog:
+  """Returns catalog currently served by the API"""
+  return request.app.state.catalog_cache.catalog
+
+
+def get_search_index(request: Request) -> SearchIndex:
+  """Returns search index kept up to date with catalog"""
+  return request.app.state.search_index
+
+
+def get_facet_index(request: Request) -> FacetIndex:
+  """Returns facet bitsets kept up to date with catalog"""
+  return request.app.state.facet_index
+
+
+def get_completion_index(request: Request) -> CompletionIndex:
+  """Returns completion counters of collections"""
+  return request.app.state.completion_index
+
+
+def get_legality_index(request: Request) -> LegalityIndex:
+  """Returns legality bitmasks kept up to date with catalog"""
+  return request.app.state.legality_index
+
+
+def get_deck_analytics(request: Request) -> DeckAnalytics:
+  """Returns deck analytics kept up to date with catalog"""
+  return request.app.state.deck_analytics
+
+
+def get_response_cache(request: Request) -> ResponseCache:
+  """Returns serialized catalog responses emptied on catalog reload"""
+  return request.app.state.response_cache
+
+
+def get_trade_index(request: Request) -> TradeIndex:
+  """Returns owned and spare card print bitmaps of users"""
+  return request.app.state.trade_index
+
+
+def get_view_cache() -> ViewCache:
+  """Returns cached collection and deck views dropped by every write"""
+  return view_cache
@@ -0,0 +1,140 @@
+"""
+Faceted filtering of cards with bitsets
+
+Every value of every card attribute has one bitset over positions of
+cards in catalog, bitsets are plain python integers. Filtering is then
+only bitwise operations on them and facet counts are population counts
+of intersections, no database query is needed for any combination.
+"""
+
+import bisect
+from typing import Dict, Iterable, List, Optional
+
+from api.catalog import Catalog
+
+# Facet name: card attribute it is built from
+FACETS = {
+    "class": "classes",
+    "type": "types",
+    "legality": "legalities",
+    "category": "category",
+    "mana_cost": "mana_cost",
+    "attack_type": "attack_type",
+}
+
+NEGATION_PREFIX = "!"
+
+try:
+  count_bits = int.bit_count
+except AttributeError:  # Python < 3.10
+
+  def count_bits(bits: int) -> int:
+    """Returns number of set bits"""
+    return bin(bits).count("1")
+
+
+def get_positions(bits: int, limit: Optional[int] = None) -> List[int]:
+  """Returns positions of up to limit lowest set bits in ascending order"""
+  if limit is None:
+    return [
+        position for position, bit in enumerate(reversed(bin(bits)[2:]))
+        if bit == "1"
+    ]
+  positions = []
+  while bits and len(positions) < limit:
+    lowest = bits & -bits
+    positions.append(lowest.bit_length() - 1)
+    bits ^= lowest
+  return positions
+
+
+class FacetIndex:
+  """Bitset per value of every facet over positions of catalog cards"""
+
+  def __init__(self) -> None:
+    self.cards: List[dict] = []
+    self.card_ids: List[int] = []
+    self.all_bits = 0
+    self.bitsets: Dict[str, Dict[str, int]] = {facet: {} for facet in FACETS}
+
+  def update(self, catalog: Catalog) -> None:
+    """Rebuilds bitsets from catalog"""
+    bitsets: Dict[str, Dict[str, int]] = {facet: {} for facet in FACETS}
+    for position, card in enumerate(catalog.cards):
+      bit = 1 << position
+      for facet, attribute in FACETS.items():
+        values = card[attribute]
+        if values is None:
+          continue
+        for value in values if isinstance(values, list) else [values]:
+          bitsets[facet][value] = bitsets[facet].get(value, 0) | bit
+    self.cards = catalog.cards
+    self.card_ids = catalog.card_ids
+    self.all_bits = (1 << len(self.cards)) - 1
+    self.bitsets = bitsets
+
+  def get_facet_bits(self, facet: str, values: Iterable[str]) -> int:
+    """Returns bits of cards matching filter of one facet
+
+    Values are OR-ed together, values prefixed with ! exclude cards.
+    """
+    included = 0
+    has_included = False
+    excluded = 0
+    for value in values:
+      if value.startswith(NEGATION_PREFIX):
+        excluded |= self.bitsets[facet].get(value[len(NEGATION_PREFIX):], 0)
+      else:
+        has_included = True
+        included |= self.bitsets[facet].get(value, 0)
+    return (included if has_included else self.all_bits) & ~excluded
+
+  def filter(self, filters: Dict[str, List[str]]) -> int:
+    """Returns bits of cards matching all facet filters"""
+    bits = self.all_bits
+    for facet, values in filters.items():
+      if values:
+        bits &= self.get_facet_bits(facet, values)
+    return bits
+
+  def get_cards(self,
+                bits: int,
+                after_id: Optional[int] = None,
+                limit: Optional[int] = None) -> List[dict]:
+    """Returns cards at positions of set bits
+
+    With after_id only cards with greater id are returned, positions are
+    ordered by card id so it only clears lower bits.
+    """
+    if after_id is not None:
+      bits &= ~((1 << bisect.bisect_right(self.card_ids, after_id)) - 1)
+    return [self.cards[position] for position in get_positions(bits, limit)]
+
+  def get_counts(
+      self,
+      filters: Dict[str, List[str]],
+      facets: Optional[Iterable[str]] = None) -> Dict[str, Dict[str, int]]:
+    """Returns number of matching cards for every value of every facet
+
+    Counts of facet are computed with filters of all other facets, so
+    they show how many cards selecting another value would give.
+    """
+    facet_bits = {
+        facet: self.get_facet_bits(facet, values)
+        for facet, values in filters.items()
+        if values
+    }
+    counts = {}
+    for facet in facets or FACETS:
+      bits = self.all_bits
+      for other_facet, other_bits in facet_bits.items():
+        if other_facet != facet:
+          bits &= other_bits
+      counts[facet] = {
+          value: count
+          for value, count in ((value, count_bits(bits & value_bits))
+                               for value, value_bits in sorted(
+                                   self.bitsets[facet].items()))
+          if count
+      }
+    return counts
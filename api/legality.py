@@ -0,0 +1,160 @@
+"""
+Deck validation against format rules
+
+Every card gets bitmask of formats it is legal in and bitmask of classes
+it is restricted to, every hero gets bitmask of its class. Validation of
+deck is then one pass over its card prints with bitwise checks, which
+is cheap enough to validate hundreds of decks in one request.
+
+Rules checked:
+  - hero is a hero card legal in the format
+  - every card is legal in the format
+  - class cards share a class with the hero, cards without class are
+    neutral
+  - no card (by name, over all its prints) has more than MAX_COPIES
+    copies and there are no other heroes in the deck
+  - deck has at least MIN_DECK_SIZE cards, hero not counted
+"""
+
+from typing import Dict, List, NamedTuple, Optional
+
+from api.catalog import Catalog
+
+FORMATS = ("Block", "Core", "Contemporary", "Classic")
+CLASSES = ("Death Knight", "Druid", "Hunter", "Mage", "Paladin", "Priest",
+           "Rogue", "Shaman", "Warlock", "Warrior")
+HERO_CATEGORIES = ("Hero", "Master_Hero")
+
+MIN_DECK_SIZE = 60
+MAX_COPIES = 4
+
+# Rules which can be violated
+UNKNOWN_FORMAT = "unknown_format"
+UNKNOWN_DECK = "unknown_deck"
+UNKNOWN_CARD_PRINT = "unknown_card_print"
+HERO = "hero"
+LEGALITY = "legality"
+CLASS = "class"
+COPY_LIMIT = "copy_limit"
+DECK_SIZE = "deck_size"
+
+
+def get_mask(values: List[str], names: tuple) -> int:
+  """Returns bitmask with bit of every value at its position in names"""
+  mask = 0
+  for value in values:
+    if value in names:
+      mask |= 1 << names.index(value)
+  return mask
+
+
+def get_violation(rule: str,
+                  message: str,
+                  card_print_id: Optional[int] = None) -> dict:
+  """Returns violation of rule, optionally caused by card print"""
+  violation = {"rule": rule, "message": message}
+  if card_print_id is not None:
+    violation["card_print_id"] = card_print_id
+  return violation
+
+
+class CardMasks(NamedTuple):
+  """Bitmasks of card checked by rules"""
+  card_id: int
+  format_mask: int
+  class_mask: int
+  is_hero: bool
+
+
+class LegalityIndex:
+  """Format and class bitmasks of every card print"""
+
+  def __init__(self) -> None:
+    self.cards: Dict[int, dict] = {}
+    self.card_prints: Dict[int, CardMasks] = {}
+
+  def update(self, catalog: Catalog) -> None:
+    """Rebuilds bitmasks from catalog"""
+    card_masks = {}
+    for card in catalog.cards:
+      is_hero = card["category"] in HERO_CATEGORIES
+      # Class of hero is one of its types
+      class_mask = get_mask(
+          card["classes"] + (card["types"] if is_hero else []), CLASSES)
+      card_masks[card["id"]] = CardMasks(card["id"],
+                                         get_mask(card["legalities"], FORMATS),
+                                         class_mask, is_hero)
+    self.cards = catalog.card_by_id
+    self.card_prints = {
+        card_print["id"]: card_masks[card_print["card_id"]]
+        for card_print in catalog.card_prints
+    }
+
+  def validate(self, deck_format: str, hero_card_print_id: int,
+               quantities: Dict[int, int]) -> List[dict]:
+    """Returns all violations of format rules by deck
+
+    Quantities are keyed by card print id, hero is not part of them.
+    """
+    if deck_format not in FORMATS:
+      return [
+          get_violation(UNKNOWN_FORMAT,
+                        f"Format must be one of {', '.join(FORMATS)}")
+      ]
+    format_bit = 1 << FORMATS.index(deck_format)
+    violations = []
+
+    hero = self.card_prints.get(hero_card_print_id)
+    hero_class_mask = 0
+    if hero is None or not hero.is_hero:
+      violations.append(
+          get_violation(HERO, "Hero card print is not a hero",
+                        hero_card_print_id))
+    else:
+      hero_class_mask = hero.class_mask
+      if not hero.format_mask & format_bit:
+        violations.append(
+            get_violation(LEGALITY, f"Hero is not legal in {deck_format}",
+                          hero_card_print_id))
+
+    copies: Dict[int, int] = {}
+    first_print: Dict[int, int] = {}
+    size = 0
+    for card_print_id, quantity in quantities.items():
+      masks = self.card_prints.get(card_print_id)
+      if masks is None:
+        violations.append(
+            get_violation(UNKNOWN_CARD_PRINT, "Card print does not exist",
+                          card_print_id))
+        continue
+      card_id, format_mask, class_mask, is_hero = masks
+      size += quantity
+      copies[card_id] = copies.get(card_id, 0) + quantity
+      first_print.setdefault(card_id, card_print_id)
+      if is_hero:
+        violations.append(
+            get_violation(HERO, "Deck can not contain other heroes",
+                          card_print_id))
+      if not format_mask & format_bit:
+        violations.append(
+            get_violation(LEGALITY,
+                          f"{self.cards[card_id]['name']} is not legal in "
+                          f"{deck_format}", card_print_id))
+      if class_mask and hero_class_mask and not class_mask & hero_class_mask:
+        violations.append(
+            get_violation(CLASS,
+                          f"{self.cards[card_id]['name']} is not of hero "
+                          "class", card_print_id))
+
+    for card_id, count in copies.items():
+      if count > MAX_COPIES:
+        violations.append(
+            get_violation(
+                COPY_LIMIT, f"{count} copies of {self.cards[card_id]['name']}"
+                f", at most {MAX_COPIES} are allowed", first_print[card_id]))
+    if size < MIN_DECK_SIZE:
+      violations.append(
+          get_violation(
+              DECK_SIZE,
+              f"Deck has {size} cards, at least {MIN_DECK_SIZE} are needed"))
+    return violations
@@ -0,0 +1,171 @@
+"""
+Request scoped batching loaders of database rows
+
+Loader collects all keys requested while request handler waits and reads
+them with one query once the event loop gets to it, so code can load
+rows one by one without running query per row. Loaded rows are memoized
+for the rest of request, loaders are created by get_loaders for every
+request and are never shared.
+
+Catalog (card prints, cards and expansions) is held in memory, see
+api/catalog.py, so loaders are only needed for user data. Card prints
+of collections and decks include quantity changes not yet written, see
+api/write_buffer.py.
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Generic, Hashable
+from typing import Iterable, List, Optional, Tuple, TypeVar
+
+from prisma import Prisma
+from prisma.models import Collection, CollectionHasCardPrint, Deck
+from prisma.models import DeckHasCardPrint
+
+from api import database
+from api.write_buffer import Deltas, QuantityBuffer, merge_quantities
+
+Key = TypeVar("Key", bound=Hashable)
+Value = TypeVar("Value")
+Rows = TypeVar("Rows")
+
+# Keys read by one query, MySQL handles long IN lists but packets do not
+MAX_BATCH_SIZE = 1000
+
+
+class DataLoader(Generic[Key, Value]):
+  """Loads values of keys in batches with per-loader memoization
+
+  batch_load gets list of distinct keys and returns dict of their
+  values, keys missing in it are loaded as None.
+  """
+
+  def __init__(self,
+               batch_load: Callable[[List[Key]], Awaitable[Dict[Key, Value]]],
+               max_batch_size: int = MAX_BATCH_SIZE) -> None:
+    self.batch_load = batch_load
+    self.max_batch_size = max_batch_size
+    self.batches = 0
+    self._futures: Dict[Key, "asyncio.Future[Optional[Value]]"] = {}
+    self._queue: List[Key] = []
+    self._tasks: List["asyncio.Task[None]"] = []
+
+  async def load(self, key: Key) -> Optional[Value]:
+    """Returns value of key, loaded together with other waiting keys"""
+    return await self._get_future(key)
+
+  async def load_many(self, keys: List[Key]) -> List[Optional[Value]]:
+    """Returns values of keys in their order, loaded in one batch"""
+    # Futures are queued right away, not once gather starts its tasks
+    return list(await asyncio.gather(*[self._get_future(key) for key in keys]))
+
+  def _get_future(self, key: Key) -> "asyncio.Future[Optional[Value]]":
+    future = self._futures.get(key)
+    if future is None:
+      loop = asyncio.get_running_loop()
+      future = self._futures[key] = loop.create_future()
+      self._queue.append(key)
+      if len(self._queue) == 1:
+        # Runs after all handlers already scheduled had their turn
+        loop.call_soon(self._dispatch)
+    return future
+
+  def _dispatch(self) -> None:
+    keys, self._queue = self._queue, []
+    for start in range(0, len(keys), self.max_batch_size):
+      task = asyncio.ensure_future(
+          self._run(keys[start:start + self.max_batch_size]))
+      self._tasks.append(task)
+      task.add_done_callback(self._tasks.remove)
+
+  async def _run(self, keys: List[Key]) -> None:
+    self.batches += 1
+    try:
+      values = await self.batch_load(keys)
+    except Exception as error:  # pylint: disable=broad-except
+      # Failed keys are not memoized so they can be loaded again
+      for key in keys:
+        self._futures.pop(key).set_exception(error)
+      return
+    for key in keys:
+      self._futures[key].set_result(values.get(key))
+
+
+async def read_quantities(
+    buffer: Optional[QuantityBuffer], owner_ids: List[int],
+    read_rows: Callable[[], Awaitable[Rows]]) -> Tuple[Rows, Dict[int, Deltas]]:
+  """Returns rows read by read_rows with pending deltas of buffer if any"""
+  if buffer is None:
+    return await read_rows(), {}
+  return await buffer.read(owner_ids, read_rows)
+
+
+def get_quantities(rows: Iterable[Any]) -> Dict[int, int]:
+  """Returns quantities of card print rows keyed by card print id"""
+  return {row.card_print_id: row.quantity for row in rows}
+
+
+class Loaders:
+  """All loaders of one request"""
+
+  def __init__(self,
+               db: Prisma,
+               collection_quantities: Optional[QuantityBuffer] = None,
+               deck_quantities: Optional[QuantityBuffer] = None) -> None:
+    self.db = db
+    self.collection_quantities = collection_quantities
+    self.deck_quantities = deck_quantities
+    self.collection: DataLoader[int, Collection] = DataLoader(
+        self._load_collections)
+    self.collection_card_prints: DataLoader[
+        int, List[CollectionHasCardPrint]] = DataLoader(
+            self._load_collections_card_prints)
+    self.deck: DataLoader[int, Deck] = DataLoader(self._load_decks)
+    self.deck_card_prints: DataLoader[int, List[DeckHasCardPrint]] = (
+        DataLoader(self._load_decks_card_prints))
+
+  async def _load_collections(self, ids: List[int]) -> Dict[int, Collection]:
+    return {
+        collection.id: collection
+        for collection in await database.get_collections(self.db, ids)
+    }
+
+  async def _load_collections_card_prints(
+      self, ids: List[int]) -> Dict[int, List[CollectionHasCardPrint]]:
+    rows: Dict[int, List[CollectionHasCardPrint]] = {
+        collection_id: [] for collection_id in ids
+    }
+    stored_rows, deltas = await read_quantities(
+        self.collection_quantities, ids,
+        lambda: database.get_collections_card_prints(self.db, ids))
+    for row in stored_rows:
+      rows[row.collection_id].append(row)
+    for collection_id, collection_deltas in deltas.items():
+      rows[collection_id] = [
+          CollectionHasCardPrint(collection_id=collection_id,
+                                 card_print_id=card_print_id,
+                                 quantity=quantity)
+          for card_print_id, quantity in merge_quantities(
+              get_quantities(rows[collection_id]), collection_deltas).items()
+      ]
+    return rows
+
+  async def _load_decks(self, ids: List[int]) -> Dict[int, Deck]:
+    return {deck.id: deck for deck in await database.get_decks(self.db, ids)}
+
+  async def _load_decks_card_prints(
+      self, ids: List[int]) -> Dict[int, List[DeckHasCardPrint]]:
+    rows: Dict[int, List[DeckHasCardPrint]] = {deck_id: [] for deck_id in ids}
+    stored_rows, deltas = await read_quantities(
+        self.deck_quantities, ids,
+        lambda: database.get_decks_card_prints(self.db, ids))
+    for row in stored_rows:
+      rows[row.deck_id].append(row)
+    for deck_id, deck_deltas in deltas.items():
+      rows[deck_id] = [
+          DeckHasCardPrint(deck_id=deck_id,
+                           card_print_id=card_print_id,
+                           quantity=quantity)
+          for card_print_id, quantity in merge_quantities(
+              get_quantities(rows[deck_id]), deck_deltas).items()
+      ]
+    return rows
@@ -0,0 +1,243 @@
+"""
+Request and database query metrics exposed in Prometheus text format
+
+MetricsMiddleware times every request by route template and counts
+requests in flight. Functions of api/database.py are wrapped with
+timed_query, which times every call by function name and remembers it
+in queries of current request. Requests slower than SLOW_REQUEST_SECONDS
+(slow request log is off if it is not set) are logged with queries they
+ran.
+"""
+
+import contextvars
+import functools
+import logging
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from typing import TypeVar
+
+from starlette.routing import Match
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds of histogram buckets in seconds, Prometheus defaults
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Route label of requests which match no route, so paths like
+# /cards/1/unknown do not create new series
+UNMATCHED_ROUTE = "unmatched"
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+Labels = Tuple[Tuple[str, str], ...]
+Function = TypeVar("Function", bound=Callable[..., Awaitable[Any]])
+Queries = List[Tuple[str, float, bool]]
+
+# Queries of request being handled as (operation, seconds, failed)
+request_queries: "contextvars.ContextVar[Optional[Queries]]" = (
+    contextvars.ContextVar("request_queries", default=None))
+
+
+class Histogram:
+  """Cumulative counts of observed values by bucket with their sum"""
+
+  def __init__(self, buckets: Tuple[float, ...] = BUCKETS) -> None:
+    self.buckets = buckets
+    self.counts = [0] * len(buckets)
+    self.count = 0
+    self.sum = 0.0
+
+  def observe(self, value: float) -> None:
+    """Adds value to every bucket it fits in"""
+    self.count += 1
+    self.sum += value
+    for index, bound in enumerate(self.buckets):
+      if value <= bound:
+        self.counts[index] += 1
+
+
+def escape_label(value: str) -> str:
+  """Returns label value with backslashes, quotes and newlines escaped"""
+  return value.replace("\\", "\\\\").replace('"', '\\"').replace(
+      "\n", "\\n")
+
+
+def format_labels(labels: Labels) -> str:
+  """Returns labels as {name="value"} with values escaped"""
+  if not labels:
+    return ""
+  return "{" + ",".join(f'{name}="{escape_label(value)}"'
+                        for name, value in labels) + "}"
+
+
+def format_number(value: float) -> str:
+  """Returns value as Prometheus number"""
+  return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metrics:
+  """Histograms, counters and gauges keyed by metric name and labels"""
+
+  def __init__(self) -> None:
+    self.descriptions: Dict[str, Tuple[str, str]] = {}
+    self.histograms: Dict[str, Dict[Labels, Histogram]] = {}
+    self.values: Dict[str, Dict[Labels, float]] = {}
+
+  def describe(self, name: str, metric_type: str, description: str) -> None:
+    """Registers metric with its type and help text"""
+    self.descriptions[name] = (metric_type, description)
+    if metric_type == "histogram":
+      self.histograms.setdefault(name, {})
+    else:
+      self.values.setdefault(name, {})
+
+  def observe(self, name: str, labels: Labels, value: float) -> None:
+    """Adds value to histogram of labels"""
+    histogram = self.histograms[name].get(labels)
+    if histogram is None:
+      histogram = self.histograms[name][labels] = Histogram()
+    histogram.observe(value)
+
+  def add(self, name: str, labels: Labels, value: float = 1) -> None:
+    """Adds value to counter or gauge of labels"""
+    self.values[name][labels] = self.values[name].get(labels, 0) + value
+
+  def set(self, name: str, labels: Labels, value: float) -> None:
+    """Sets gauge of labels to value"""
+    self.values[name][labels] = value
+
+  def reset(self) -> None:
+    """Forgets all recorded values"""
+    for histograms in self.histograms.values():
+      histograms.clear()
+    for values in self.values.values():
+      values.clear()
+
+  def render(self) -> str:
+    """Returns all metrics in Prometheus text format"""
+    lines = []
+    for name, (metric_type, description) in sorted(self.descriptions.items()):
+      lines.append(f"# HELP {name} {description}")
+      lines.append(f"# TYPE {name} {metric_type}")
+      if metric_type != "histogram":
+        for labels, value in sorted(self.values[name].items()):
+          lines.append(f"{name}{format_labels(labels)} "
+                       f"{format_number(value)}")
+        continue
+      for labels, histogram in sorted(self.histograms[name].items()):
+        for bound, count in zip(histogram.buckets, histogram.counts):
+          lines.append(f"{name}_bucket"
+                       f"{format_labels(labels + (('le', str(bound)),))} "
+                       f"{count}")
+        lines.append(f"{name}_bucket"
+                     f"{format_labels(labels + (('le', '+Inf'),))} "
+                     f"{histogram.count}")
+        lines.append(f"{name}_sum{format_labels(labels)} "
+                     f"{format_number(histogram.sum)}")
+        lines.append(f"{name}_count{format_labels(labels)} "
+                     f"{histogram.count}")
+    return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
+metrics.describe("http_request_duration_seconds", "histogram",
+                 "Time to handle request by route and response status")
+metrics.describe("http_requests_in_flight", "gauge",
+                 "Requests being handled by route")
+metrics.describe("db_query_duration_seconds", "histogram",
+                 "Time of api/database.py calls by function")
+metrics.describe("db_query_errors_total", "counter",
+                 "Failed api/database.py calls by function")
+
+
+def timed_query(function: Function) -> Function:
+  """Wraps database function to record its duration and failures"""
+  operation = function.__name__
+
+  @functools.wraps(function)
+  async def wrapper(*args: Any, **kwargs: Any) -> Any:
+    start = time.perf_counter()
+    failed = True
+    try:
+      result = await function(*args, **kwargs)
+      failed = False
+      return result
+    finally:
+      duration = time.perf_counter() - start
+      labels = (("operation", operation),)
+      metrics.observe("db_query_duration_seconds", labels, duration)
+      if failed:
+        metrics.add("db_query_errors_total", labels)
+      queries = request_queries.get()
+      if queries is not None:
+        queries.append((operation, duration, failed))
+
+  return wrapper  # type: ignore
+
+
+def get_slow_request_seconds() -> Optional[float]:
+  """Returns SLOW_REQUEST_SECONDS or None if slow request log is off"""
+  value = os.getenv("SLOW_REQUEST_SECONDS")
+  return float(value) if value else None
+
+
+class MetricsMiddleware:
+  """ASGI middleware timing requests by route template"""
+
+  def __init__(self, app: ASGIApp) -> None:
+    self.app = app
+
+  def get_route(self, scope: Scope) -> str:
+    """Returns path template of route matching request"""
+    for route in scope["app"].router.routes:
+      match, _ = route.matches(scope)
+      if match == Match.FULL:
+        return route.path
+    return UNMATCHED_ROUTE
+
+  async def __call__(self, scope: Scope, receive: Receive,
+                     send: Send) -> None:
+    if scope["type"] != "http":
+      await self.app(scope, receive, send)
+      return
+    route = self.get_route(scope)
+    route_labels = (("method", scope["method"]), ("route", route))
+    status = 500
+
+    async def send_with_status(message: Message) -> None:
+      nonlocal status
+      if message["type"] == "http.response.start":
+        status = message["status"]
+      await send(message)
+
+    queries: Queries = []
+    token = request_queries.set(queries)
+    metrics.add("http_requests_in_flight", route_labels)
+    start = time.perf_counter()
+    try:
+      await self.app(scope, receive, send_with_status)
+    finally:
+      duration = time.perf_counter() - start
+      metrics.add("http_requests_in_flight", route_labels, -1)
+      metrics.observe("http_request_duration_seconds",
+                      route_labels + (("status", str(status)),), duration)
+      request_queries.reset(token)
+      slow_request_seconds = get_slow_request_seconds()
+      if slow_request_seconds is not None and duration >= slow_request_seconds:
+        log_slow_request(scope, status, duration, queries)
+
+
+def log_slow_request(scope: Scope, status: int, duration: float,
+                     queries: Queries) -> None:
+  """Logs slow request with all database queries it ran"""
+  path = scope["path"]
+  if scope.get("query_string"):
+    path += "?" + scope["query_string"].decode("latin-1")
+  query_time = sum(query_duration for _, query_duration, _ in queries)
+  logger.warning(
+      "Slow request %s %s %d took %.1f ms, %d queries took %.1f ms%s",
+      scope["method"], path, status, duration * 1000, len(queries),
+      query_time * 1000, "".join(
+          f"\n  {operation} {query_duration * 1000:.1f} ms"
+          f"{' failed' if failed else ''}"
+          for operation, query_duration, failed in queries))
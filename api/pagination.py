@@ -0,0 +1,92 @@
+"""
+Keyset (cursor) pagination
+
+Cursor is opaque url-safe string encoding sort key of last item of
+previous page. Next page is read by seeking right after that key, in
+memory with binary search and in database with "greater than" condition
+on indexed columns, so every page costs the same as the first one.
+"""
+
+import base64
+import binascii
+import bisect
+import json
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException, Query
+
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
+
+
+def encode_cursor(key: Sequence[Any]) -> str:
+  """Returns opaque cursor encoding sort key"""
+  data = json.dumps(list(key), separators=(",", ":")).encode("utf-8")
+  return base64.urlsafe_b64encode(data).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[Any, ...]:
+  """Returns sort key encoded in cursor, raises ValueError if invalid"""
+  try:
+    data = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+    key = json.loads(data.decode("utf-8"))
+  except (binascii.Error, UnicodeDecodeError, json.JSONDecodeError) as error:
+    raise ValueError("Invalid cursor") from error
+  if not isinstance(key, list):
+    raise ValueError("Invalid cursor")
+  return tuple(key)
+
+
+class PageParams:
+  """Page size and sort key after which page starts"""
+
+  def __init__(self, after: Optional[Tuple[Any, ...]], limit: int) -> None:
+    self.after = after
+    self.limit = limit
+
+  def after_id(self) -> Optional[int]:
+    """Returns single integer sort key of cursor or None for first page"""
+    if self.after is None:
+      return None
+    if len(self.after) != 1 or not isinstance(self.after[0], int):
+      raise HTTPException(status_code=400, detail="Invalid cursor")
+    return self.after[0]
+
+
+def get_page_params(cursor: Optional[str] = Query(None),
+                    limit: int = Query(DEFAULT_LIMIT, ge=1,
+                                       le=MAX_LIMIT)) -> PageParams:
+  """Returns page parameters from cursor and limit query parameters"""
+  if not cursor:
+    return PageParams(None, limit)
+  try:
+    return PageParams(decode_cursor(cursor), limit)
+  except ValueError as error:
+    raise HTTPException(status_code=400, detail="Invalid cursor") from error
+
+
+def get_page(items: Sequence[Any], key: Callable[[Any], Sequence[Any]],
+             limit: int) -> dict:
+  """Returns page from up to limit + 1 items read after cursor
+
+  Extra item only tells there is next page, cursor then points to the
+  last returned item.
+  """
+  page = list(items[:limit])
+  next_cursor = None
+  if len(items) > limit:
+    next_cursor = encode_cursor(key(page[-1]))
+  return {"items": page, "next_cursor": next_cursor}
+
+
+def get_page_by_id(items: Sequence[dict],
+                   params: PageParams,
+                   ids: Optional[List[int]] = None) -> dict:
+  """Returns page of items sorted by id, seeking with binary search"""
+  after_id = params.after_id()
+  start = 0
+  if after_id is not None:
+    start = bisect.bisect_right(
+        ids if ids is not None else [item["id"] for item in items], after_id)
+  return get_page(items[start:start + params.limit + 1],
+                  lambda item: (item["id"],), params.limit)
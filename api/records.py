@@ -0,0 +1,133 @@
+"""
+Compact read-only records of catalog cards and card prints
+
+Records are mappings with __slots__ instead of dicts. Columns with few
+distinct values (category, mana cost, attack type, rarity and whole
+lists of classes, types and legalities) are stored as small integer
+codes into vocabularies shared by all records, so every distinct value
+is held in memory once. Values are decoded when record is read, which
+keeps record["classes"] and dict(record) working like with dicts.
+"""
+
+from collections.abc import Mapping
+from typing import Any, Dict, Hashable, Iterator, List, Optional, Tuple
+
+
+class Vocabulary:
+  """Distinct values of column and their codes in order of first use"""
+
+  def __init__(self) -> None:
+    self.values: List[Hashable] = []
+    self.codes: Dict[Hashable, int] = {}
+
+  def encode(self, value: Hashable) -> int:
+    """Returns code of value, adding value if it is new"""
+    code = self.codes.get(value)
+    if code is None:
+      code = self.codes[value] = len(self.values)
+      self.values.append(value)
+    return code
+
+  def __len__(self) -> int:
+    return len(self.values)
+
+
+CATEGORIES = Vocabulary()
+MANA_COSTS = Vocabulary()
+ATTACK_TYPES = Vocabulary()
+CLASSES = Vocabulary()
+TYPES = Vocabulary()
+LEGALITIES = Vocabulary()
+RARITIES = Vocabulary()
+
+
+def split_values(value: Optional[str]) -> Tuple[str, ...]:
+  """Returns values of comma separated column"""
+  if not value:
+    return ()
+  return tuple(value.split(","))
+
+
+class Record(Mapping):
+  """Read-only mapping of record fields stored in slots
+
+  FIELDS maps every field to vocabulary its slot holds codes of, or to
+  None if slot holds the value itself. Coded tuples are read as lists.
+  """
+
+  __slots__ = ()
+  FIELDS: Dict[str, Optional[Vocabulary]] = {}
+
+  def __getitem__(self, field: str) -> Any:
+    vocabulary = self.FIELDS[field]
+    value = getattr(self, field)
+    if vocabulary is None:
+      return value
+    value = vocabulary.values[value]
+    return list(value) if isinstance(value, tuple) else value
+
+  def __iter__(self) -> Iterator[str]:
+    return iter(self.FIELDS)
+
+  def __len__(self) -> int:
+    return len(self.FIELDS)
+
+  def __repr__(self) -> str:
+    return f"{type(self).__name__}({dict(self)!r})"
+
+
+class CardRecord(Record):
+  """Card as served by API, coded attributes are held as codes"""
+
+  __slots__ = ("id", "name", "category", "mana_cost", "attack_type",
+               "classes", "types", "legalities")
+  FIELDS = {
+      "id": None,
+      "name": None,
+      "category": CATEGORIES,
+      "mana_cost": MANA_COSTS,
+      "attack_type": ATTACK_TYPES,
+      "classes": CLASSES,
+      "types": TYPES,
+      "legalities": LEGALITIES,
+  }
+
+  def __init__(self, row: dict) -> None:
+    self.id = row["id"]
+    self.name = row["name"]
+    self.category = CATEGORIES.encode(row["category"])
+    self.mana_cost = MANA_COSTS.encode(row["mana_cost"])
+    self.attack_type = ATTACK_TYPES.encode(row["attack_type"])
+    self.classes = CLASSES.encode(split_values(row["classes"]))
+    self.types = TYPES.encode(split_values(row["types"]))
+    self.legalities = LEGALITIES.encode(split_values(row["legalities"]))
+
+
+class CardPrintRecord(Record):
+  """Card print as served by API, rarity is held as code"""
+
+  __slots__ = ("id", "card_id", "expansion_id", "id_in_expansion", "rarity",
+               "text_front", "text_back")
+  FIELDS = {
+      "id": None,
+      "card_id": None,
+      "expansion_id": None,
+      "id_in_expansion": None,
+      "rarity": RARITIES,
+      "text_front": None,
+      "text_back": None,
+  }
+
+  def __init__(self, row: dict, texts: Optional[Dict[str, str]] = None) -> None:
+    """Texts are shared with other card prints through texts if given"""
+    self.id = row["id"]
+    self.card_id = row["card_id"]
+    self.expansion_id = row["expansion_id"]
+    self.id_in_expansion = row["id_in_expansion"]
+    self.rarity = RARITIES.encode(row["rarity"])
+    if texts is None:
+      self.text_front = row["text_front"]
+      self.text_back = row["text_back"]
+    else:
+      self.text_front = texts.setdefault(row["text_front"], row["text_front"])
+      self.text_back = texts.setdefault(row["text_back"], row["text_back"])
@@ -0,0 +1,197 @@
+"""
+Routing of read-only database queries to read replicas
+
+Read-only functions of api/database.py run on the least busy replica of
+DATABASE_REPLICA_URLS, ties taking turns, writes always run on primary.
+Replicas lag behind primary, so a request which wrote runs its later
+reads on primary and its response sets cookie keeping reads of the
+client on primary for REPLICA_STICKY_SECONDS, which should cover
+replica lag plus QUANTITY_FLUSH_SECONDS. Failed reads are repeated on
+primary and the replica is left out for REPLICA_RETRY_SECONDS.
+"""
+
+import contextvars
+import functools
+import http.cookies
+import logging
+import os
+import time
+from typing import Any, Awaitable, Callable, Iterable, List, Optional
+from typing import TypeVar
+
+from prisma import Prisma
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STICKY_SECONDS = 5.0
+DEFAULT_RETRY_SECONDS = 30.0
+# Cookie holding time until which reads of client go to primary
+STICKY_COOKIE = "read_primary_until"
+
+Function = TypeVar("Function", bound=Callable[..., Awaitable[Any]])
+
+
+class RequestRouting:
+  """Whether reads of request have to see writes of its client
+
+  Shared by all tasks of request, so a write in one is seen in others.
+  """
+
+  def __init__(self, primary_until: float = 0.0) -> None:
+    self.primary_until = primary_until
+    self.wrote = False
+
+  def reads_primary(self) -> bool:
+    """Returns whether reads of request go to primary"""
+    return self.wrote or time.time() < self.primary_until
+
+
+# Routing state of request being handled, None outside requests
+request_routing: "contextvars.ContextVar[Optional[RequestRouting]]" = (
+    contextvars.ContextVar("request_routing", default=None))
+
+
+def mark_written() -> None:
+  """Sends following reads of current request and its client to primary"""
+  state = request_routing.get()
+  if state is not None:
+    state.wrote = True
+
+
+class Replica:
+  """Client of one replica with its reads in flight"""
+
+  def __init__(self, db: Prisma) -> None:
+    self.db = db
+    self.in_flight = 0
+    self.failed_until = 0.0
+
+
+class ReplicaRouter:
+  """Picks client for every read, primary when no replica can serve it"""
+
+  def __init__(self, retry_seconds: float = DEFAULT_RETRY_SECONDS) -> None:
+    self.replicas: List[Replica] = []
+    self.retry_seconds = retry_seconds
+    self._turn = 0
+
+  def set_replicas(self, clients: Iterable[Prisma]) -> None:
+    """Routes reads to connected clients of replicas"""
+    self.replicas = [Replica(db) for db in clients]
+    self.retry_seconds = float(
+        os.getenv("REPLICA_RETRY_SECONDS", str(DEFAULT_RETRY_SECONDS)))
+
+  def choose(self) -> Optional[Replica]:
+    """Returns least busy available replica or None to read primary"""
+    state = request_routing.get()
+    if not self.replicas or (state is not None and state.reads_primary()):
+      return None
+    now = time.monotonic()
+    self._turn = (self._turn + 1) % len(self.replicas)
+    # Replicas starting at current turn, so ties take turns
+    available = [
+        replica for replica in self.replicas[self._turn:] +
+        self.replicas[:self._turn] if replica.failed_until <= now
+    ]
+    if not available:
+      return None
+    return min(available, key=lambda replica: replica.in_flight)
+
+  def fail(self, replica: Replica) -> None:
+    """Leaves replica out for retry_seconds"""
+    replica.failed_until = time.monotonic() + self.retry_seconds
+
+
+replica_router = ReplicaRouter()
+
+
+def reads_replicas() -> bool:
+  """Returns whether read-only queries of current request run on replicas"""
+  state = request_routing.get()
+  return bool(replica_router.replicas) and (state is None or
+                                            not state.reads_primary())
+
+
+def read_only(function: Function) -> Function:
+  """Wraps database function to run on replica, falling back to primary"""
+
+  @functools.wraps(function)
+  async def wrapper(db: Prisma, *args: Any, **kwargs: Any) -> Any:
+    replica = replica_router.choose()
+    if replica is None:
+      return await function(db, *args, **kwargs)
+    replica.in_flight += 1
+    try:
+      return await function(replica.db, *args, **kwargs)
+    except Exception:  # pylint: disable=broad-except
+      logger.warning("Read %s failed on replica, reading primary",
+                     function.__name__,
+                     exc_info=True)
+      replica_router.fail(replica)
+    finally:
+      replica.in_flight -= 1
+    return await function(db, *args, **kwargs)
+
+  return wrapper  # type: ignore
+
+
+def writes(function: Function) -> Function:
+  """Wraps database function to send later reads of request to primary"""
+
+  @functools.wraps(function)
+  async def wrapper(*args: Any, **kwargs: Any) -> Any:
+    mark_written()
+    return await function(*args, **kwargs)
+
+  return wrapper  # type: ignore
+
+
+def get_sticky_seconds() -> float:
+  """Returns seconds reads of client go to primary after it wrote"""
+  return float(os.getenv("REPLICA_STICKY_SECONDS",
+                         str(DEFAULT_STICKY_SECONDS)))
+
+
+def get_primary_until(scope: Scope) -> float:
+  """Returns time until which sticky cookie of request reads primary"""
+  for name, value in scope["headers"]:
+    if name != b"cookie":
+      continue
+    cookies = http.cookies.SimpleCookie()
+    try:
+      cookies.load(value.decode("latin-1"))
+      return float(cookies[STICKY_COOKIE].value)
+    except (KeyError, ValueError, http.cookies.CookieError):
+      continue
+  return 0.0
+
+
+class ReplicaMiddleware:
+  """ASGI middleware keeping reads of clients which wrote on primary"""
+
+  def __init__(self, app: ASGIApp) -> None:
+    self.app = app
+
+  async def __call__(self, scope: Scope, receive: Receive,
+                     send: Send) -> None:
+    if scope["type"] != "http":
+      await self.app(scope, receive, send)
+      return
+    state = RequestRouting(get_primary_until(scope))
+
+    async def send_with_cookie(message: Message) -> None:
+      if message["type"] == "http.response.start" and state.wrote:
+        sticky_seconds = get_sticky_seconds()
+        headers = MutableHeaders(scope=message)
+        headers.append(
+            "set-cookie", f"{STICKY_COOKIE}={time.time() + sticky_seconds:.3f}"
+            f"; Max-Age={int(sticky_seconds) + 1}; Path=/; HttpOnly")
+      await send(message)
+
+    token = request_routing.set(state)
+    try:
+      await self.app(scope, receive, send_with_cookie)
+    finally:
+      request_routing.reset(token)
@@ -0,0 +1,204 @@
+"""
+Pre-serialized and precompressed catalog responses
+
+Catalog responses are the same for everybody until catalog is reloaded,
+so body of every distinct catalog request is serialized once with orjson
+and kept with its gzip and brotli variants. Every variant has its own
+strong ETag, hash of body with encoding appended, e.g. "<hash>-br". Requests
+with matching If-None-Match get 304 and Cache-Control lets shared caches
+serve responses without asking API at all. Cache is emptied whenever
+catalog changes.
+
+Brotli is used only if brotli package is installed.
+"""
+
+import gzip
+import hashlib
+import os
+import urllib.parse
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import orjson
+from fastapi import Request, Response
+
+from api.catalog import Catalog
+
+try:
+  import brotli
+except ImportError:  # pragma: no cover
+  brotli = None
+
+DEFAULT_MAX_AGE = 300
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+# Bodies smaller than this are not worth compressing
+MIN_COMPRESSED_SIZE = 512
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+# Content encodings appended to ETags of compressed bodies
+ENCODINGS = ("br", "gzip")
+
+
+def serialize(content: Any) -> bytes:
+  """Returns content as JSON bytes, catalog records are serialized as dicts"""
+  return orjson.dumps(content, default=dict)
+
+
+def get_accepted_encodings(header: Optional[str]) -> List[str]:
+  """Returns encodings accepted by Accept-Encoding header without q=0"""
+  encodings = []
+  for item in (header or "").split(","):
+    encoding, _, parameters = item.strip().partition(";")
+    quality = parameters.strip()
+    if quality.startswith("q=") and quality[2:].strip() in ("0", "0.0",
+                                                            "0.00", "0.000"):
+      continue
+    if encoding:
+      encodings.append(encoding.strip().lower())
+  return encodings
+
+
+def get_etag_hash(etag: str) -> str:
+  """Returns body hash of ETag without weak prefix and encoding suffix"""
+  value = etag.strip()
+  if value.startswith("W/"):
+    value = value[2:]
+  value = value.strip('"')
+  for encoding in ENCODINGS:
+    if value.endswith(f"-{encoding}"):
+      return value[:-len(encoding) - 1]
+  return value
+
+
+def matches_etag(header: Optional[str], etag: str) -> bool:
+  """Returns if If-None-Match header contains etag in any encoding or *"""
+  if not header:
+    return False
+  etag_hash = get_etag_hash(etag)
+  return any(value.strip() == "*" or get_etag_hash(value) == etag_hash
+             for value in header.split(","))
+
+
+class CachedBody:
+  """Serialized body with strong ETag and lazily made compressed variants
+
+  etag is ETag of body without encoding.
+  """
+
+  def __init__(self, body: bytes) -> None:
+    self.body = body
+    self.etag = f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+    self.encoded: Dict[str, bytes] = {}
+
+  @property
+  def size(self) -> int:
+    """Returns number of bytes held by all variants"""
+    return len(self.body) + sum(len(body) for body in self.encoded.values())
+
+  def get_encoding(self, accepted: List[str]) -> Optional[str]:
+    """Returns best encoding among accepted ones, None for plain body"""
+    if len(self.body) < MIN_COMPRESSED_SIZE:
+      return None
+    if brotli is not None and "br" in accepted:
+      return "br"
+    if "gzip" in accepted:
+      return "gzip"
+    return None
+
+  def get_etag(self, encoding: Optional[str]) -> str:
+    """Returns ETag of body in encoding"""
+    if encoding is None:
+      return self.etag
+    return f'{self.etag[:-1]}-{encoding}"'
+
+  def get_encoded(self, encoding: Optional[str]) -> bytes:
+    """Returns body in encoding, compressing it on first use"""
+    if encoding is None:
+      return self.body
+    if encoding not in self.encoded:
+      if encoding == "br":
+        self.encoded["br"] = brotli.compress(self.body, quality=BROTLI_QUALITY)
+      else:
+        self.encoded["gzip"] = gzip.compress(self.body,
+                                             compresslevel=GZIP_LEVEL,
+                                             mtime=0)
+    return self.encoded[encoding]
+
+
+def get_cache_key(request: Request) -> str:
+  """Returns request path with query parameters in canonical order
+
+  Parameters are encoded again, so values holding & or = cannot make key
+  of other parameters.
+  """
+  query = sorted(request.query_params.multi_items())
+  return request.url.path + "?" + urllib.parse.urlencode(query)
+
+
+class ResponseCache:
+  """Serialized catalog responses keyed by request path and query
+
+  Least recently used bodies are dropped once all of them take more than
+  max_bytes.
+  """
+
+  def __init__(self,
+               max_age: Optional[int] = None,
+               max_bytes: int = DEFAULT_MAX_BYTES) -> None:
+    if max_age is None:
+      max_age = int(os.getenv("CATALOG_CACHE_MAX_AGE", str(DEFAULT_MAX_AGE)))
+    self.cache_control = f"public, max-age={max_age}"
+    self.max_bytes = max_bytes
+    self.size = 0
+    self.hits = 0
+    self.misses = 0
+    self._bodies: "OrderedDict[str, CachedBody]" = OrderedDict()
+
+  def update(self, catalog: Catalog) -> None:  # pylint: disable=unused-argument
+    """Drops all bodies since they were made from previous catalog"""
+    self._bodies.clear()
+    self.size = 0
+
+  def _get_body(self, key: str, get_content: Callable[[], Any]) -> CachedBody:
+    cached = self._bodies.get(key)
+    if cached is not None:
+      self.hits += 1
+      self._bodies.move_to_end(key)
+      return cached
+    self.misses += 1
+    cached = CachedBody(serialize(get_content()))
+    self._bodies[key] = cached
+    self.size += cached.size
+    self._shrink()
+    return cached
+
+  def _shrink(self) -> None:
+    while self.size > self.max_bytes and len(self._bodies) > 1:
+      _, dropped = self._bodies.popitem(last=False)
+      self.size -= dropped.size
+
+  def respond(self, request: Request,
+              get_content: Callable[[], Any]) -> Response:
+    """Returns cached response to request, content is made only on miss
+
+    Exceptions raised by get_content, like 404, are not cached.
+    """
+    cached = self._get_body(get_cache_key(request), get_content)
+    encoding = cached.get_encoding(
+        get_accepted_encodings(request.headers.get("accept-encoding")))
+    headers = {
+        "ETag": cached.get_etag(encoding),
+        "Cache-Control": self.cache_control,
+        "Vary": "Accept-Encoding",
+    }
+    if matches_etag(request.headers.get("if-none-match"), cached.etag):
+      return Response(status_code=304, headers=headers)
+    size = cached.size
+    body = cached.get_encoded(encoding)
+    self.size += cached.size - size
+    self._shrink()
+    if encoding is not None:
+      headers["Content-Encoding"] = encoding
+    return Response(content=body,
+                    media_type="application/json",
+                    headers=headers)
@@ -0,0 +1 @@
+"""API routes grouped by resource"""
@@ -0,0 +1,228 @@
+"""Catalog routes served from in-memory catalog"""
+
+import hmac
+import os
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Request
+from fastapi import Query, Response
+from prisma import Prisma
+from pydantic import BaseModel, Field
+
+from api.catalog import Catalog
+from api.dependencies import get_catalog, get_db, get_facet_index
+from api.dependencies import get_response_cache
+from api.facets import FacetIndex
+from api.pagination import PageParams, get_page, get_page_by_id
+from api.pagination import get_page_params
+from api.responses import ResponseCache
+from api.sparse import CARD_FIELDS, CARD_PRINT_FIELDS, CARD_PRINT_RELATIONS
+from api.sparse import EXPANSION_FIELDS, SparseParams, get_card_content
+from api.sparse import get_card_print_content, get_sparse_params
+
+router = APIRouter(tags=["catalog"])
+
+MAX_BATCH_CARD_PRINTS = 1000
+
+
+class CardPrintsBatch(BaseModel):
+  """Ids of card prints fetched together"""
+  ids: List[int] = Field(..., max_items=MAX_BATCH_CARD_PRINTS)
+
+
+get_card_params = get_sparse_params({
+    "": CARD_FIELDS,
+    "card_prints": CARD_PRINT_FIELDS
+})
+# Card detail has always included its card prints
+get_card_detail_params = get_sparse_params(
+    {
+        "": CARD_FIELDS,
+        "card_prints": CARD_PRINT_FIELDS
+    },
+    default_include=["card_prints"])
+get_expansion_params = get_sparse_params({"": EXPANSION_FIELDS})
+get_card_print_params = get_sparse_params(CARD_PRINT_RELATIONS)
+get_card_print_batch_params = get_sparse_params(
+    CARD_PRINT_RELATIONS, default_include=["card", "expansion"])
+
+
+def get_filter_values(values: Optional[List[str]]) -> List[str]:
+  """Returns filter values from repeated and comma separated parameters"""
+  return [
+      value for parameter in values or [] for value in parameter.split(",")
+      if value
+  ]
+
+
+@router.get("/cards")
+async def get_cards(
+    request: Request,
+    card_class: Optional[List[str]] = Query(None, alias="class"),
+    card_type: Optional[List[str]] = Query(None, alias="type"),
+    legality: Optional[List[str]] = Query(None),
+    category: Optional[List[str]] = Query(None),
+    mana_cost: Optional[List[str]] = Query(None),
+    attack_type: Optional[List[str]] = Query(None),
+    facets: bool = False,
+    page_params: PageParams = Depends(get_page_params),
+    sparse_params: SparseParams = Depends(get_card_params),
+    catalog: Catalog = Depends(get_catalog),
+    facet_index: FacetIndex = Depends(get_facet_index),
+    response_cache: ResponseCache = Depends(get_response_cache)
+) -> Response:
+  """
+    Returns page of cards matching all given attribute filters
+
+    Values of one attribute are OR-ed and values prefixed with ! exclude
+    cards, e.g. ?class=Mage,Priest&legality=!Classic. With facets=true
+    response also contains count of matching cards for every attribute
+    value. Fields and included card prints are chosen with fields and
+    include.
+    """
+  filters = {
+      "class": get_filter_values(card_class),
+      "type": get_filter_values(card_type),
+      "legality": get_filter_values(legality),
+      "category": get_filter_values(category),
+      "mana_cost": get_filter_values(mana_cost),
+      "attack_type": get_filter_values(attack_type),
+  }
+
+  def get_content() -> dict:
+    if not any(filters.values()):
+      page = get_page_by_id(catalog.cards, page_params, catalog.card_ids)
+    else:
+      cards = facet_index.get_cards(facet_index.filter(filters),
+                                    after_id=page_params.after_id(),
+                                    limit=page_params.limit + 1)
+      page = get_page(cards, lambda card: (card["id"],), page_params.limit)
+    page["items"] = [
+        get_card_content(card, catalog, sparse_params)
+        for card in page["items"]
+    ]
+    if facets:
+      page["facets"] = facet_index.get_counts(filters)
+    return page
+
+  return response_cache.respond(request, get_content)
+
+
+@router.get("/cards/{card_id}")
+async def get_card(
+    request: Request,
+    card_id: int,
+    sparse_params: SparseParams = Depends(get_card_detail_params),
+    catalog: Catalog = Depends(get_catalog),
+    response_cache: ResponseCache = Depends(get_response_cache)
+) -> Response:
+  """Returns card with all its card prints unless include is given"""
+
+  def get_content() -> dict:
+    card = catalog.card_by_id.get(card_id)
+    if card is None:
+      raise HTTPException(status_code=404, detail="Card not found")
+    return get_card_content(card, catalog, sparse_params)
+
+  return response_cache.respond(request, get_content)
+
+
+@router.get("/expansions")
+async def get_expansions(
+    request: Request,
+    page_params: PageParams = Depends(get_page_params),
+    sparse_params: SparseParams = Depends(get_expansion_params),
+    catalog: Catalog = Depends(get_catalog),
+    response_cache: ResponseCache = Depends(get_response_cache)
+) -> Response:
+  """Returns page of expansions with names of their block and block set"""
+
+  def get_content() -> dict:
+    page = get_page_by_id(catalog.expansions, page_params,
+                          catalog.expansion_ids)
+    page["items"] = [
+        sparse_params.select(expansion) for expansion in page["items"]
+    ]
+    return page
+
+  return response_cache.respond(request, get_content)
+
+
+@router.get("/card-prints")
+async def get_card_prints(
+    request: Request,
+    card_id: Optional[int] = None,
+    expansion_id: Optional[int] = None,
+    page_params: PageParams = Depends(get_page_params),
+    sparse_params: SparseParams = Depends(get_card_print_params),
+    catalog: Catalog = Depends(get_catalog),
+    response_cache: ResponseCache = Depends(get_response_cache)
+) -> Response:
+  """
+    Returns page of card prints, optionally of one card or expansion
+
+    Card and expansion of card prints are returned with include.
+    """
+
+  def get_content() -> dict:
+    if card_id is None and expansion_id is None:
+      page = get_page_by_id(catalog.card_prints, page_params,
+                            catalog.card_print_ids)
+    else:
+      page = get_page_by_id(
+          catalog.get_card_prints(card_id=card_id, expansion_id=expansion_id),
+          page_params)
+    page["items"] = [
+        get_card_print_content(card_print, catalog, sparse_params)
+        for card_print in page["items"]
+    ]
+    return page
+
+  return response_cache.respond(request, get_content)
+
+
+@router.post("/card-prints/batch")
+async def get_card_prints_batch(
+    batch: CardPrintsBatch,
+    sparse_params: SparseParams = Depends(get_card_print_batch_params),
+    catalog: Catalog = Depends(get_catalog)) -> dict:
+  """
+    Returns card prints with given ids together with their card and
+    expansion unless include is given
+
+    Card prints are in order of given ids, ids of card prints which do not
+    exist are returned in missing_ids.
+    """
+  items = []
+  missing_ids = []
+  for card_print_id in batch.ids:
+    card_print = catalog.card_print_by_id.get(card_print_id)
+    if card_print is None:
+      missing_ids.append(card_print_id)
+      continue
+    items.append(get_card_print_content(card_print, catalog, sparse_params))
+  return {"items": items, "missing_ids": missing_ids}
+
+
+def check_reload_token(x_reload_token: Optional[str] = Header(None)) -> None:
+  """Rejects request unless token matches CATALOG_RELOAD_TOKEN"""
+  token = os.getenv("CATALOG_RELOAD_TOKEN")
+  if not token:
+    raise HTTPException(status_code=403, detail="Catalog reload is disabled")
+  if not x_reload_token or not hmac.compare_digest(x_reload_token, token):
+    raise HTTPException(status_code=403, detail="Invalid reload token")
+
+
+@router.post("/catalog/reload",
+             status_code=204,
+             dependencies=[Depends(check_reload_token)])
+async def reload_catalog(request: Request,
+                         db: Prisma = Depends(get_db)) -> Response:
+  """
+    Reloads catalog from database
+
+    Called by db/fill_db.py after it changes catalog, X-Reload-Token header
+    has to match CATALOG_RELOAD_TOKEN.
+    """
+  await request.app.state.catalog_cache.reload(db)
+  return Response(status_code=204)
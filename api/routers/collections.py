@@ -0,0 +1,227 @@
+"""User collection routes"""
+
+from typing import List, Tuple
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi import Response
+from fastapi.responses import StreamingResponse
+from prisma import Prisma
+
+from api import collection_io, database
+from api.admission import Priority
+from api.catalog import Catalog
+from api.completion import CompletionIndex
+from api.dependencies import get_catalog, get_collection_quantities
+from api.dependencies import get_completion_index, get_db, get_loaders
+from api.dependencies import get_trade_index, get_view_cache
+from api.dependencies import request_priority
+from api.loaders import Loaders
+from api.pagination import PageParams, get_page, get_page_params
+from api.sparse import CARD_PRINT_ROW_FIELDS, CARD_PRINT_ROW_RELATIONS
+from api.sparse import ROW_KEY_FIELDS, SparseParams
+from api.sparse import get_card_print_row_content, get_sparse_params
+from api.trades import TradeIndex
+from api.views import COLLECTION, USER_COLLECTIONS, Tag, ViewCache
+from api.write_buffer import QuantityBuffer, QuantityChange, merge_page
+
+router = APIRouter(tags=["collections"])
+
+get_collection_params = get_sparse_params({
+    "": database.COLLECTION_COLUMNS,
+    "card_prints": CARD_PRINT_ROW_FIELDS
+})
+get_card_print_row_params = get_sparse_params(CARD_PRINT_ROW_RELATIONS)
+
+
+@router.get("/users/{user_id}/collections")
+async def get_user_collections(
+    user_id: int,
+    request: Request,
+    page_params: PageParams = Depends(get_page_params),
+    sparse_params: SparseParams = Depends(get_collection_params),
+    db: Prisma = Depends(get_db),
+    loaders: Loaders = Depends(get_loaders),
+    view_cache: ViewCache = Depends(get_view_cache)) -> Response:
+  """
+    Returns page of collections of user ordered by id
+
+    Only columns of requested fields are read, card prints of all
+    collections of page are read in one query if included. Repeat views
+    are served from view cache.
+    """
+  async def get_view() -> Tuple[dict, List[Tag]]:
+    collections = await database.get_user_collections(
+        db,
+        user_id,
+        after_id=page_params.after_id(),
+        take=page_params.limit + 1,
+        columns=sparse_params.get_columns(database.COLLECTION_COLUMNS))
+    page = get_page([sparse_params.select(row) for row in collections],
+                    lambda collection: (collection["id"],), page_params.limit)
+    if sparse_params.includes("card_prints"):
+      card_prints = await loaders.collection_card_prints.load_many(
+          [collection["id"] for collection in page["items"]])
+      for collection, rows in zip(page["items"], card_prints):
+        collection["card_prints"] = [
+            sparse_params.select(
+                {
+                    "card_print_id": row.card_print_id,
+                    "quantity": row.quantity
+                },
+                "card_prints",
+                keys=ROW_KEY_FIELDS) for row in rows
+        ]
+    tags = [(USER_COLLECTIONS, user_id)]
+    if sparse_params.includes("card_prints"):
+      tags.extend(
+          (COLLECTION, collection["id"]) for collection in page["items"])
+    return page, tags
+
+  return await view_cache.respond(request, get_view)
+
+
+@router.get("/collections/{collection_id}/card-prints")
+async def get_collection_card_prints(
+    collection_id: int,
+    request: Request,
+    page_params: PageParams = Depends(get_page_params),
+    sparse_params: SparseParams = Depends(get_card_print_row_params),
+    db: Prisma = Depends(get_db),
+    catalog: Catalog = Depends(get_catalog),
+    collection_quantities: QuantityBuffer = Depends(get_collection_quantities),
+    view_cache: ViewCache = Depends(get_view_cache)
+) -> Response:
+  """
+    Returns page of card prints in collection ordered by card print id
+
+    Card prints, their cards and expansions are returned with include.
+    Quantity changes not yet written are included. Repeat views are
+    served from view cache.
+    """
+  async def get_view() -> Tuple[dict, List[Tag]]:
+    rows, deltas = await collection_quantities.read(
+        [collection_id], lambda: database.get_collection_card_prints(
+            db,
+            collection_id,
+            after_card_print_id=page_params.after_id(),
+            take=page_params.limit + 1))
+    page = merge_page([{
+        "card_print_id": row.card_print_id,
+        "quantity": row.quantity,
+    } for row in rows], deltas.get(collection_id, {}), page_params.after_id(),
+                      page_params.limit)
+    page["items"] = [
+        get_card_print_row_content(row, catalog, sparse_params)
+        for row in page["items"]
+    ]
+    return page, [(COLLECTION, collection_id)]
+
+  return await view_cache.respond(request, get_view)
+
+
+async def check_collection_exists(collection_id: int, db: Prisma) -> None:
+  """Raises 404 if collection does not exist"""
+  if not await database.collection_exists(db, collection_id):
+    raise HTTPException(status_code=404, detail="Collection not found")
+
+
+@router.post("/collections/{collection_id}/card-prints/{card_print_id}",
+             status_code=202)
+async def change_collection_card_print_quantity(
+    collection_id: int,
+    card_print_id: int,
+    change: QuantityChange,
+    catalog: Catalog = Depends(get_catalog),
+    collection_quantities: QuantityBuffer = Depends(get_collection_quantities)
+) -> dict:
+  """
+    Adds delta to quantity of card print in collection
+
+    Changes are merged and written in batches shortly after, reads of
+    the collection include them right away. Quantity never drops below
+    zero, card print is removed from collection at zero.
+    """
+  if card_print_id not in catalog.card_print_by_id:
+    raise HTTPException(status_code=404, detail="Card print not found")
+  pending_delta = await collection_quantities.change(collection_id,
+                                                     card_print_id,
+                                                     change.delta)
+  if pending_delta is None:
+    raise HTTPException(status_code=404, detail="Collection not found")
+  return {
+      "collection_id": collection_id,
+      "card_print_id": card_print_id,
+      "pending_delta": pending_delta,
+  }
+
+
+@router.post("/collections/{collection_id}/import",
+             dependencies=[Depends(request_priority(Priority.BULK))])
+async def import_collection_card_prints(
+    collection_id: int,
+    request: Request,
+    db: Prisma = Depends(get_db),
+    catalog: Catalog = Depends(get_catalog),
+    completion_index: CompletionIndex = Depends(get_completion_index),
+    trade_index: TradeIndex = Depends(get_trade_index)
+) -> dict:
+  """
+    Adds card prints from CSV or newline delimited JSON body to collection
+
+    Rows give card_print_id or expansion and id_in_expansion, and
+    quantity which is added to quantity already in collection. Invalid
+    rows are skipped and reported with their line numbers.
+    """
+  file_format = collection_io.get_format(request.headers.get("content-type"))
+  if file_format is None:
+    raise HTTPException(status_code=415,
+                        detail="Use text/csv or application/x-ndjson")
+  await check_collection_exists(collection_id, db)
+  return await collection_io.import_card_prints(
+      db,
+      collection_id,
+      request.stream(),
+      file_format,
+      catalog,
+      listeners=[completion_index.add, trade_index.add_quantities])
+
+
+@router.get("/collections/{collection_id}/export",
+            dependencies=[Depends(request_priority(Priority.BULK))])
+async def export_collection_card_prints(
+    collection_id: int,
+    export_format: str = Query(collection_io.CSV,
+                               alias="format",
+                               regex="^(csv|ndjson)$"),
+    db: Prisma = Depends(get_db),
+    catalog: Catalog = Depends(get_catalog)) -> StreamingResponse:
+  """Streams all card prints of collection as CSV or newline delimited JSON"""
+  await check_collection_exists(collection_id, db)
+  return StreamingResponse(
+      collection_io.export_card_prints(db, collection_id, export_format,
+                                       catalog),
+      media_type=collection_io.MEDIA_TYPES[export_format],
+      headers={
+          "Content-Disposition":
+              f"attachment; filename=collection-{collection_id}."
+              f"{export_format}"
+      })
+
+
+@router.get("/collections/{collection_id}/completion")
+async def get_collection_completion(
+    collection_id: int,
+    db: Prisma = Depends(get_db),
+    completion_index: CompletionIndex = Depends(get_completion_index)
+) -> dict:
+  """
+    Returns how complete collection is in every expansion, expansion
+    block and block set
+
+    Every entry holds number of distinct owned card prints and number of
+    all card prints, overall and by rarity.
+    """
+  if collection_id not in completion_index.collections:
+    await check_collection_exists(collection_id, db)
+  collection = await completion_index.get_collection(db, collection_id)
+  return completion_index.get_stats(collection)
@@ -0,0 +1,280 @@
+"""User deck routes"""
+
+import asyncio
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from prisma import Prisma
+from pydantic import BaseModel, Field
+
+from api import database, legality
+from api.analytics import DeckAnalytics
+from api.catalog import Catalog
+from api.dependencies import get_catalog, get_db, get_deck_analytics
+from api.dependencies import get_deck_quantities, get_legality_index
+from api.dependencies import get_loaders, get_view_cache
+from api.legality import LegalityIndex
+from api.loaders import Loaders
+from api.pagination import PageParams, get_page, get_page_params
+from api.sparse import CARD_PRINT_FIELDS, CARD_PRINT_ROW_FIELDS
+from api.sparse import CARD_PRINT_ROW_RELATIONS, ROW_KEY_FIELDS, SparseParams
+from api.sparse import get_card_print_row_content, get_sparse_params
+from api.views import DECK, USER_DECKS, Tag, ViewCache
+from api.write_buffer import QuantityBuffer, QuantityChange, merge_page
+
+router = APIRouter(tags=["decks"])
+
+MAX_VALIDATED_DECKS = 1000
+
+get_deck_params = get_sparse_params({
+    "": database.DECK_COLUMNS,
+    "card_prints": CARD_PRINT_ROW_FIELDS,
+    "hero": CARD_PRINT_FIELDS,
+})
+get_card_print_row_params = get_sparse_params(CARD_PRINT_ROW_RELATIONS)
+
+
+class DeckCardPrint(BaseModel):
+  """Card print of deck with number of copies"""
+  card_print_id: int
+  quantity: int = Field(1, ge=1)
+
+
+class DeckToValidate(BaseModel):
+  """Stored deck given by deck_id or deck given by its hero and cards"""
+  deck_id: Optional[int] = None
+  hero_card_print_id: Optional[int] = None
+  card_prints: List[DeckCardPrint] = []
+
+
+class DecksAnalysis(BaseModel):
+  """Stored decks and card prints analysed together"""
+  deck_ids: List[int] = Field([], max_items=MAX_VALIDATED_DECKS)
+  card_prints: List[DeckCardPrint] = []
+
+
+class DecksValidation(BaseModel):
+  """Decks validated against rules of one format"""
+  format: str
+  decks: List[DeckToValidate] = Field(..., max_items=MAX_VALIDATED_DECKS)
+
+
+@router.get("/users/{user_id}/decks")
+async def get_user_decks(
+    user_id: int,
+    request: Request,
+    page_params: PageParams = Depends(get_page_params),
+    sparse_params: SparseParams = Depends(get_deck_params),
+    db: Prisma = Depends(get_db),
+    catalog: Catalog = Depends(get_catalog),
+    loaders: Loaders = Depends(get_loaders),
+    view_cache: ViewCache = Depends(get_view_cache)) -> Response:
+  """
+    Returns page of decks of user ordered by id
+
+    Only columns of requested fields are read, hero card print and card
+    prints of all decks of page are read in one query if included.
+    Repeat views are served from view cache.
+    """
+  async def get_view() -> Tuple[dict, List[Tag]]:
+    keys = ["id"]
+    if sparse_params.includes("hero"):
+      keys.append("hero_card_print_id")
+    decks = await database.get_user_decks(
+        db,
+        user_id,
+        after_id=page_params.after_id(),
+        take=page_params.limit + 1,
+        columns=sparse_params.get_columns(database.DECK_COLUMNS, keys=keys))
+    page = get_page(decks, lambda deck: (deck["id"],), page_params.limit)
+    items = []
+    for deck in page["items"]:
+      item = sparse_params.select(deck)
+      if sparse_params.includes("hero"):
+        hero = catalog.card_print_by_id.get(deck["hero_card_print_id"])
+        item["hero"] = None if hero is None else sparse_params.select(
+            hero, "hero")
+      items.append(item)
+    if sparse_params.includes("card_prints"):
+      card_prints = await loaders.deck_card_prints.load_many(
+          [deck["id"] for deck in items])
+      for deck, rows in zip(items, card_prints):
+        deck["card_prints"] = [
+            sparse_params.select(
+                {
+                    "card_print_id": row.card_print_id,
+                    "quantity": row.quantity
+                },
+                "card_prints",
+                keys=ROW_KEY_FIELDS) for row in rows
+        ]
+    page["items"] = items
+    tags = [(USER_DECKS, user_id)]
+    if sparse_params.includes("card_prints"):
+      tags.extend((DECK, deck["id"]) for deck in items)
+    return page, tags
+
+  return await view_cache.respond(request, get_view)
+
+
+@router.get("/decks/{deck_id}/card-prints")
+async def get_deck_card_prints(
+    deck_id: int,
+    request: Request,
+    page_params: PageParams = Depends(get_page_params),
+    sparse_params: SparseParams = Depends(get_card_print_row_params),
+    db: Prisma = Depends(get_db),
+    catalog: Catalog = Depends(get_catalog),
+    deck_quantities: QuantityBuffer = Depends(get_deck_quantities),
+    view_cache: ViewCache = Depends(get_view_cache)
+) -> Response:
+  """
+    Returns page of card prints in deck ordered by card print id
+
+    Card prints, their cards and expansions are returned with include.
+    Quantity changes not yet written are included. Repeat views are
+    served from view cache.
+    """
+  async def get_view() -> Tuple[dict, List[Tag]]:
+    rows, deltas = await deck_quantities.read(
+        [deck_id], lambda: database.get_deck_card_prints(
+            db,
+            deck_id,
+            after_card_print_id=page_params.after_id(),
+            take=page_params.limit + 1))
+    page = merge_page([{
+        "card_print_id": row.card_print_id,
+        "quantity": row.quantity,
+    } for row in rows], deltas.get(deck_id, {}), page_params.after_id(),
+                      page_params.limit)
+    page["items"] = [
+        get_card_print_row_content(row, catalog, sparse_params)
+        for row in page["items"]
+    ]
+    return page, [(DECK, deck_id)]
+
+  return await view_cache.respond(request, get_view)
+
+
+@router.post("/decks/{deck_id}/card-prints/{card_print_id}", status_code=202)
+async def change_deck_card_print_quantity(
+    deck_id: int,
+    card_print_id: int,
+    change: QuantityChange,
+    catalog: Catalog = Depends(get_catalog),
+    deck_quantities: QuantityBuffer = Depends(get_deck_quantities)
+) -> dict:
+  """
+    Adds delta to quantity of card print in deck
+
+    Changes are merged and written in batches shortly after, reads of
+    the deck include them right away. Quantity never drops below zero,
+    card print is removed from deck at zero.
+    """
+  if card_print_id not in catalog.card_print_by_id:
+    raise HTTPException(status_code=404, detail="Card print not found")
+  pending_delta = await deck_quantities.change(deck_id, card_print_id,
+                                               change.delta)
+  if pending_delta is None:
+    raise HTTPException(status_code=404, detail="Deck not found")
+  return {
+      "deck_id": deck_id,
+      "card_print_id": card_print_id,
+      "pending_delta": pending_delta,
+  }
+
+
+@router.post("/decks/validate")
+async def validate_decks(
+    validation: DecksValidation,
+    loaders: Loaders = Depends(get_loaders),
+    legality_index: LegalityIndex = Depends(get_legality_index)
+) -> List[dict]:
+  """
+    Returns all rule violations of every deck in format
+
+    Decks are either stored decks given by deck_id, which are all read
+    in two queries, or decks given by hero_card_print_id and card_prints.
+    Results are in order of given decks.
+    """
+  deck_ids = [
+      deck.deck_id for deck in validation.decks if deck.deck_id is not None
+  ]
+  stored_decks, stored_rows = await asyncio.gather(
+      loaders.deck.load_many(deck_ids),
+      loaders.deck_card_prints.load_many(deck_ids))
+  heroes: Dict[int, int] = {}
+  quantities: Dict[int, Dict[int, int]] = {}
+  for deck_id, stored_deck, rows in zip(deck_ids, stored_decks, stored_rows):
+    if stored_deck is not None:
+      heroes[deck_id] = stored_deck.hero_card_print_id
+      quantities[deck_id] = {row.card_print_id: row.quantity for row in rows}
+
+  results = []
+  for deck in validation.decks:
+    if deck.deck_id is not None and deck.deck_id not in heroes:
+      violations = [
+          legality.get_violation(legality.UNKNOWN_DECK, "Deck does not exist")
+      ]
+    elif deck.deck_id is not None:
+      violations = legality_index.validate(validation.format,
+                                           heroes[deck.deck_id],
+                                           quantities[deck.deck_id])
+    else:
+      deck_quantities: Dict[int, int] = {}
+      for card_print in deck.card_prints:
+        deck_quantities[card_print.card_print_id] = deck_quantities.get(
+            card_print.card_print_id, 0) + card_print.quantity
+      violations = legality_index.validate(validation.format,
+                                           deck.hero_card_print_id,
+                                           deck_quantities)
+    results.append({
+        "deck_id": deck.deck_id,
+        "valid": not violations,
+        "violations": violations,
+    })
+  return results
+
+
+@router.get("/decks/meta-report")
+async def get_meta_report(
+    db: Prisma = Depends(get_db),
+    deck_analytics: DeckAnalytics = Depends(get_deck_analytics)) -> dict:
+  """
+    Returns mana curve, category, class and type distribution of all
+    public decks together
+    """
+  return await deck_analytics.get_meta_report(db)
+
+
+@router.get("/decks/{deck_id}/analytics")
+async def get_deck_statistics(
+    deck_id: int,
+    loaders: Loaders = Depends(get_loaders),
+    deck_analytics: DeckAnalytics = Depends(get_deck_analytics)) -> dict:
+  """Returns mana curve, category, class and type distribution of deck"""
+  deck, rows = await asyncio.gather(loaders.deck.load(deck_id),
+                                    loaders.deck_card_prints.load(deck_id))
+  if deck is None:
+    raise HTTPException(status_code=404, detail="Deck not found")
+  return deck_analytics.analyse(
+      {row.card_print_id: row.quantity for row in rows})
+
+
+@router.post("/decks/analytics")
+async def analyse_decks(
+    analysis: DecksAnalysis,
+    loaders: Loaders = Depends(get_loaders),
+    deck_analytics: DeckAnalytics = Depends(get_deck_analytics)) -> dict:
+  """
+    Returns mana curve, category, class and type distribution of stored
+    decks and given card prints together
+    """
+  quantities = [(card_print.card_print_id, card_print.quantity)
+                for card_print in analysis.card_prints]
+  for rows in await loaders.deck_card_prints.load_many(analysis.deck_ids):
+    quantities.extend((row.card_print_id, row.quantity) for row in rows)
+  total: Dict[int, int] = {}
+  for card_print_id, quantity in quantities:
+    total[card_print_id] = total.get(card_print_id, 0) + quantity
+  return deck_analytics.analyse(total)
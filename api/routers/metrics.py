@@ -0,0 +1,15 @@
+"""Prometheus metrics route"""
+
+from fastapi import APIRouter, Response
+
+from api.metrics import CONTENT_TYPE, metrics
+
+router = APIRouter(tags=["metrics"])
+
+
+@router.get("/metrics")
+async def get_metrics() -> Response:
+  """
+    Returns request and database query metrics in Prometheus text format
+    """
+  return Response(metrics.render(), media_type=CONTENT_TYPE)
@@ -0,0 +1,29 @@
+"""Full-text search routes"""
+
+from typing import List
+
+from fastapi import APIRouter, Depends, Query
+
+from api.catalog import Catalog
+from api.dependencies import get_catalog, get_search_index
+from api.search import SearchIndex
+
+router = APIRouter(tags=["search"])
+
+
+@router.get("/search")
+async def search_cards(
+    q: str = Query(..., min_length=1, max_length=256),
+    limit: int = Query(20, ge=1, le=100),
+    catalog: Catalog = Depends(get_catalog),
+    search_index: SearchIndex = Depends(get_search_index)
+) -> List[dict]:
+  """
+    Returns cards best matching query in their name or card print texts
+
+    Last word may be unfinished and words may contain one typo.
+    """
+  return [
+      dict(catalog.card_by_id[card_id], score=round(score, 4))
+      for card_id, score in search_index.search(q, limit)
+  ]
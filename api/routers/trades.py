@@ -0,0 +1,33 @@
+"""Trade matching routes"""
+
+from typing import List
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from prisma import Prisma
+
+from api import database
+from api.dependencies import get_db, get_trade_index
+from api.trades import TradeIndex
+
+router = APIRouter(tags=["trades"])
+
+
+@router.get("/users/{user_id}/trade-matches")
+async def get_trade_matches(
+    user_id: int,
+    limit: int = Query(20, ge=1, le=100),
+    db: Prisma = Depends(get_db),
+    trade_index: TradeIndex = Depends(get_trade_index)
+) -> List[dict]:
+  """
+    Returns best trade partners of user
+
+    Every match gives card prints partner has spare which user does not
+    own and spare card prints of user which partner does not own. Matches
+    are ranked by the smaller of the two counts.
+    """
+  await trade_index.load(db)
+  if user_id not in trade_index.users:
+    if not await database.user_exists(db, user_id):
+      raise HTTPException(status_code=404, detail="User not found")
+  return trade_index.get_matches(user_id, limit)
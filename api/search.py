@@ -0,0 +1,229 @@
+"""
+Full-text search over card names and card print texts
+
+Every card is one document with name field and text field holding
+front and back texts of all its prints. Index is inverted index with
+sorted vocabulary for prefix matching and deletion neighbourhood of
+every term for matching terms with one typo. Results are ranked with
+BM25 with name matches weighted above text matches.
+"""
+
+import bisect
+import heapq
+import math
+import re
+import unicodedata
+from typing import Dict, List, Optional, Set, Tuple
+
+from api.catalog import Catalog
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+FIELD_WEIGHTS = (3.0, 1.0)  # name, text
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Kinds of matches and weight of score of each kind
+TYPO, PREFIX, EXACT = 1, 2, 3
+MATCH_WEIGHTS = {TYPO: 0.5, PREFIX: 0.7, EXACT: 1.0}
+MIN_PREFIX_LENGTH = 2
+MIN_TYPO_LENGTH = 4
+MAX_EXPANSIONS = 50
+
+
+def tokenize(text: str) -> List[str]:
+  """Returns lowercase tokens without accents and apostrophes"""
+  text = unicodedata.normalize("NFKD", text.lower())
+  text = "".join(char for char in text if not unicodedata.combining(char))
+  text = text.replace("'", "").replace("\u2019", "")
+  return TOKEN_PATTERN.findall(text)
+
+
+def get_deletes(term: str) -> Set[str]:
+  """Returns all strings made by deleting one character from term"""
+  return {term[:i] + term[i + 1:] for i in range(len(term))}
+
+
+def is_one_edit_away(first: str, second: str) -> bool:
+  """Returns if strings differ by one insert, delete, change or swap"""
+  if abs(len(first) - len(second)) > 1 or first == second:
+    return first == second
+  if len(first) > len(second):
+    first, second = second, first
+  start = 0
+  while start < len(first) and first[start] == second[start]:
+    start += 1
+  if len(first) < len(second):
+    return first[start:] == second[start + 1:]
+  if first[start + 1:] == second[start + 1:]:
+    return True
+  return (first[start:start + 2] == second[start:start + 2][::-1]
+          and first[start + 2:] == second[start + 2:])
+
+
+def get_documents(catalog: Catalog) -> Dict[int, Tuple[str, str]]:
+  """Returns searchable name and text of every card keyed by card id"""
+  documents = {}
+  for card in catalog.cards:
+    texts = []
+    for card_print in catalog.card_prints_by_card.get(card["id"], []):
+      for text in (card_print["text_front"], card_print["text_back"]):
+        if text and text not in texts:
+          texts.append(text)
+    documents[card["id"]] = (card["name"], "\n".join(texts))
+  return documents
+
+
+class SearchIndex:
+  """Inverted index of cards which is updated incrementally"""
+
+  def __init__(self) -> None:
+    self.documents: Dict[int, Tuple[str, str]] = {}
+    self.lengths: Dict[int, Tuple[int, int]] = {}
+    self.total_lengths = [0, 0]
+    # term -> card id -> term frequency in name and in text
+    self.postings: Dict[str, Dict[int, Tuple[int, int]]] = {}
+    self.terms: List[str] = []
+    self.deletes: Dict[str, Set[str]] = {}
+    self._scores: Dict[str, Dict[int, float]] = {}
+    self._vocabulary_changed = False
+
+  def update(self, catalog: Catalog) -> None:
+    """Reindexes only cards which were added, changed or removed"""
+    documents = get_documents(catalog)
+    for card_id in list(self.documents):
+      if documents.get(card_id) != self.documents[card_id]:
+        self._remove(card_id)
+    for card_id, document in documents.items():
+      if card_id not in self.documents:
+        self._add(card_id, document)
+    if self._vocabulary_changed:
+      self.terms = sorted(self.postings)
+      self._vocabulary_changed = False
+    self._scores = {}
+
+  def _add(self, card_id: int, document: Tuple[str, str]) -> None:
+    frequencies: Dict[str, List[int]] = {}
+    lengths = []
+    for field, text in enumerate(document):
+      tokens = tokenize(text)
+      lengths.append(len(tokens))
+      for token in tokens:
+        frequencies.setdefault(token, [0, 0])[field] += 1
+    for term, frequency in frequencies.items():
+      if term not in self.postings:
+        self.postings[term] = {}
+        self._vocabulary_changed = True
+        for key in get_deletes(term) | {term}:
+          self.deletes.setdefault(key, set()).add(term)
+      self.postings[term][card_id] = tuple(frequency)
+    self.documents[card_id] = document
+    self.lengths[card_id] = tuple(lengths)
+    for field, length in enumerate(lengths):
+      self.total_lengths[field] += length
+
+  def _remove(self, card_id: int) -> None:
+    for field, length in enumerate(self.lengths.pop(card_id)):
+      self.total_lengths[field] -= length
+    for term in set(
+        tokenize(self.documents[card_id][0]) +
+        tokenize(self.documents.pop(card_id)[1])):
+      del self.postings[term][card_id]
+      if not self.postings[term]:
+        del self.postings[term]
+        self._vocabulary_changed = True
+        for key in get_deletes(term) | {term}:
+          self.deletes[key].discard(term)
+          if not self.deletes[key]:
+            del self.deletes[key]
+
+  def _get_candidates(self, token: str, is_last: bool) -> Dict[str, int]:
+    """Returns terms token can stand for with kind of each match
+
+    Only last token of query can be unfinished word and typos are looked
+    for only when token itself is not in any card.
+    """
+    candidates = {}
+    if len(token) >= MIN_TYPO_LENGTH and token not in self.postings:
+      typos = set()
+      for key in get_deletes(token) | {token}:
+        typos |= self.deletes.get(key, set())
+      for term in typos:
+        if is_one_edit_away(token, term):
+          candidates[term] = TYPO
+    if is_last and len(token) >= MIN_PREFIX_LENGTH:
+      start = bisect.bisect_left(self.terms, token)
+      end = bisect.bisect_left(self.terms, token + "\uffff", start)
+      prefixed = sorted(self.terms[start:end],
+                        key=lambda term: -len(self.postings[term]))
+      for term in prefixed[:MAX_EXPANSIONS]:
+        candidates[term] = PREFIX
+    if token in self.postings:
+      candidates[token] = EXACT
+    return candidates
+
+  def _score(self, term: str) -> Dict[int, float]:
+    """Returns BM25 score of term for every card containing it
+
+    Scores are cached until next update.
+    """
+    if term in self._scores:
+      return self._scores[term]
+    postings = self.postings[term]
+    count = len(self.documents)
+    idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+    average_lengths = [max(total / count, 1) for total in self.total_lengths]
+    scores = {}
+    for card_id, frequencies in postings.items():
+      score = 0.0
+      for field, frequency in enumerate(frequencies):
+        if not frequency:
+          continue
+        norm = 1 - BM25_B + BM25_B * (self.lengths[card_id][field] /
+                                      average_lengths[field])
+        score += FIELD_WEIGHTS[field] * frequency * (BM25_K1 + 1) / (
+            frequency + BM25_K1 * norm)
+      scores[card_id] = idf * score
+    self._scores[term] = scores
+    return scores
+
+  def search(self, query: str, limit: int = 20) -> List[Tuple[int, float]]:
+    """Returns ids and scores of best cards matching every query token
+
+    Cards are ordered by kinds of their matches first (exact before
+    prefix before typo) and by score second, so prefix and typo matches
+    never outrank exact ones. Tokens matching fewest cards are processed
+    first, every next token only looks at cards matched so far.
+    """
+    tokens = list(dict.fromkeys(tokenize(query)))
+    token_candidates = sorted(
+        (self._get_candidates(token, position == len(tokens) - 1)
+         for position, token in enumerate(tokens)),
+        key=lambda candidates: sum(
+            len(self.postings[term]) for term in candidates))
+    totals: Optional[Dict[int, Tuple[int, float]]] = None
+    for candidates in token_candidates:
+      best: Dict[int, Tuple[int, float]] = {}
+      for term, kind in candidates.items():
+        scores = self._score(term)
+        if totals is None:
+          matched = scores.items()
+        else:
+          matched = ((card_id, scores[card_id])
+                     for card_id in totals
+                     if card_id in scores)
+        for card_id, score in matched:
+          match = (kind, MATCH_WEIGHTS[kind] * score)
+          if match > best.get(card_id, (0, 0.0)):
+            best[card_id] = match
+      totals = {
+          card_id: (kind + (totals[card_id][0] if totals else 0),
+                    score + (totals[card_id][1] if totals else 0))
+          for card_id, (kind, score) in best.items()
+      }
+      if not totals:
+        return []
+    results = heapq.nsmallest(
+        limit, (totals or {}).items(),
+        key=lambda item: (-item[1][0], -item[1][1], item[0]))
+    return [(card_id, score) for card_id, (_, score) in results]
@@ -0,0 +1,380 @@
+"""
+Binary snapshot of catalog assets
+
+Snapshot is one file compiled from assets/cards.json, assets/prints.json
+and assets/expansions.json by db/build_snapshot.py. It holds tables of
+fixed-width records, pool of interned strings the records point to and
+sorted name indexes. Reader memory-maps the file and decodes records
+only when they are accessed, so opening it takes no time and all
+processes reading the same snapshot share its pages.
+
+Layout (all integers little-endian unsigned 32 bit):
+  header: magic, version, (offset, count) of every section
+  strings: UTF-8 bytes of all distinct strings
+  block sets: name
+  expansion blocks: name, block set position
+  expansions: name, expansion block position
+  cards: name, category, mana cost, classes, types, attack type,
+    legalities, list values are comma separated
+  card prints: card position, expansion position, card name, expansion
+    name, id in expansion, rarity, text front, text back, sorted by
+    card position so card prints of one card are next to each other
+  card name index, expansion name index: positions sorted by name
+  card print ranges: position of first card print of every card
+
+Every string is stored as (offset, length) into strings, NULL_OFFSET
+stands for None. Card prints whose card or expansion does not exist
+have NO_POSITION instead of position and are stored last.
+"""
+
+import contextlib
+import mmap
+import os
+import struct
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+MAGIC = b"WTCGSNAP"
+VERSION = 1
+NULL_OFFSET = 0xFFFFFFFF
+NO_POSITION = 0xFFFFFFFF
+
+SECTIONS = ("strings", "block_sets", "expansion_blocks", "expansions",
+            "cards", "card_prints", "card_name_index",
+            "expansion_name_index", "card_print_ranges")
+HEADER = struct.Struct("<8sI" + "II" * len(SECTIONS))
+RECORDS = {
+    "block_sets": struct.Struct("<II"),
+    "expansion_blocks": struct.Struct("<III"),
+    "expansions": struct.Struct("<III"),
+    "cards": struct.Struct("<14I"),
+    "card_prints": struct.Struct("<13I"),
+    "card_name_index": struct.Struct("<I"),
+    "expansion_name_index": struct.Struct("<I"),
+    "card_print_ranges": struct.Struct("<I"),
+}
+
+CARD_COLUMNS = ("card_category", "card_mana_cost", "card_classes",
+                "card_types", "card_attack_type", "card_legalities")
+LIST_COLUMNS = ("card_classes", "card_types", "card_legalities")
+CARD_PRINT_TEXT_COLUMNS = ("card_print_rarity", "card_print_text_front",
+                           "card_print_text_back")
+
+
+class StringPool:
+  """Interned strings stored once and referenced by offset and length"""
+
+  def __init__(self) -> None:
+    self.data = bytearray()
+    self.refs: Dict[str, Tuple[int, int]] = {}
+
+  def add(self, value: Optional[str]) -> Tuple[int, int]:
+    """Returns offset and length of value, adding it if not yet stored"""
+    if value is None:
+      return NULL_OFFSET, 0
+    if value not in self.refs:
+      encoded = value.encode("utf-8")
+      self.refs[value] = (len(self.data), len(encoded))
+      self.data += encoded
+    return self.refs[value]
+
+
+def join_values(values: Optional[List[str]]) -> Optional[str]:
+  """Returns comma separated values or None if there are none"""
+  if not values:
+    return None
+  return ",".join(values)
+
+
+def build_snapshot(cards: dict, card_prints: list,
+                   expansions_dict: dict) -> bytes:
+  """Returns snapshot compiled from loaded assets json"""
+  strings = StringPool()
+  tables: Dict[str, List[Tuple[int, ...]]] = {
+      section: [] for section in SECTIONS[1:]
+  }
+
+  expansion_positions = {}
+  for block_set, expansion_blocks in expansions_dict.items():
+    block_set_position = len(tables["block_sets"])
+    tables["block_sets"].append(strings.add(block_set))
+    for expansion_block, expansions in expansion_blocks.items():
+      expansion_block_position = len(tables["expansion_blocks"])
+      tables["expansion_blocks"].append(
+          strings.add(expansion_block) + (block_set_position,))
+      for expansion in expansions:
+        expansion_positions[expansion] = len(tables["expansions"])
+        tables["expansions"].append(
+            strings.add(expansion) + (expansion_block_position,))
+
+  card_positions = {}
+  for name, card in cards.items():
+    card_positions[name] = len(tables["cards"])
+    record = strings.add(name)
+    for column in CARD_COLUMNS:
+      value = card[column]
+      record += strings.add(
+          join_values(value) if column in LIST_COLUMNS else value)
+    tables["cards"].append(record)
+
+  card_print_records = []
+  for card_print in card_prints:
+    card_position = card_positions.get(card_print["card_name"], NO_POSITION)
+    expansion_position = expansion_positions.get(
+        card_print["card_print_expansion_name"], NO_POSITION)
+    if expansion_position == NO_POSITION:
+      card_position = NO_POSITION
+    record = (card_position, expansion_position)
+    record += strings.add(card_print["card_name"])
+    record += strings.add(card_print["card_print_expansion_name"])
+    record += (int(card_print["card_print_id_in_exapansion"]),)
+    for column in CARD_PRINT_TEXT_COLUMNS:
+      record += strings.add(card_print[column])
+    card_print_records.append(record)
+  card_print_records.sort(key=lambda record: (record[0], record[1], record[6]))
+  tables["card_prints"] = card_print_records
+
+  ranges = [0] * (len(tables["cards"]) + 1)
+  for record in card_print_records:
+    if record[0] != NO_POSITION:
+      ranges[record[0] + 1] += 1
+  for position in range(len(tables["cards"])):
+    ranges[position + 1] += ranges[position]
+  tables["card_print_ranges"] = [(start,) for start in ranges]
+  tables["card_name_index"] = [
+      (position,) for _, position in sorted(
+          (name.encode("utf-8"), position)
+          for name, position in card_positions.items())
+  ]
+  tables["expansion_name_index"] = [
+      (position,) for _, position in sorted(
+          (name.encode("utf-8"), position)
+          for name, position in expansion_positions.items())
+  ]
+
+  sections: Dict[str, Tuple[int, int, bytes]] = {}
+  offset = HEADER.size
+  sections["strings"] = (offset, len(strings.data), bytes(strings.data))
+  offset += len(strings.data)
+  offset += -offset % 4
+  for section in SECTIONS[1:]:
+    data = b"".join(RECORDS[section].pack(*record)
+                    for record in tables[section])
+    sections[section] = (offset, len(tables[section]), data)
+    offset += len(data)
+
+  header = []
+  for section in SECTIONS:
+    header.extend(sections[section][:2])
+  output = bytearray(HEADER.pack(MAGIC, VERSION, *header))
+  for section in SECTIONS:
+    output += b"\0" * (sections[section][0] - len(output))
+    output += sections[section][2]
+  return bytes(output)
+
+
+def write_snapshot(path: str, cards: dict, card_prints: list,
+                   expansions_dict: dict) -> int:
+  """Writes snapshot compiled from assets json, returns its size
+
+  File is replaced at once, so processes which have the old snapshot
+  mapped keep reading the old one.
+  """
+  data = build_snapshot(cards, card_prints, expansions_dict)
+  temporary_path = f"{path}.tmp"
+  with open(temporary_path, "wb") as file:
+    file.write(data)
+  os.replace(temporary_path, path)
+  return len(data)
+
+
+class Snapshot:
+  """Memory-mapped snapshot decoding records on access"""
+
+  def __init__(self, path: str) -> None:
+    with open(path, "rb") as file:
+      self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    self._buffer = memoryview(self._mmap)
+    self._strings = self._buffer[0:0]
+    if len(self._buffer) < HEADER.size:
+      self.close()
+      raise ValueError(f"{path} is not a catalog snapshot")
+    magic, version, *header = HEADER.unpack_from(self._buffer)
+    if magic != MAGIC or version != VERSION:
+      self.close()
+      raise ValueError(f"{path} is not a catalog snapshot of version "
+                       f"{VERSION}")
+    self._sections = {
+        section: (header[2 * position], header[2 * position + 1])
+        for position, section in enumerate(SECTIONS)
+    }
+    strings_offset, strings_length = self._sections["strings"]
+    self._strings = self._buffer[strings_offset:strings_offset +
+                                 strings_length]
+    # Strings decoded so far by offset while whole snapshot is decoded
+    self._decoded: Optional[Dict[int, str]] = None
+
+  @contextlib.contextmanager
+  def decoding(self) -> Iterator[None]:
+    """Decodes every distinct string only once within the block
+
+    Meant for reading most of snapshot at once, decoded strings are
+    kept until the block ends.
+    """
+    self._decoded = {}
+    try:
+      yield
+    finally:
+      self._decoded = None
+
+  def close(self) -> None:
+    """Releases memory map"""
+    self._strings.release()
+    self._buffer.release()
+    self._mmap.close()
+
+  def __enter__(self) -> "Snapshot":
+    return self
+
+  def __exit__(self, *args: Any) -> None:
+    self.close()
+
+  def count(self, section: str) -> int:
+    """Returns number of records in section"""
+    return self._sections[section][1]
+
+  def get_record(self, section: str, position: int) -> Tuple[int, ...]:
+    """Returns raw record at position of section"""
+    if not 0 <= position < self._sections[section][1]:
+      raise IndexError(f"{section} record {position} out of range")
+    record = RECORDS[section]
+    return record.unpack_from(self._buffer,
+                              self._sections[section][0] +
+                              position * record.size)
+
+  def iter_records(self, section: str) -> Iterator[Tuple[int, ...]]:
+    """Yields raw records of section in stored order"""
+    offset, count = self._sections[section]
+    record = RECORDS[section]
+    return record.iter_unpack(self._buffer[offset:offset +
+                                           count * record.size])
+
+  def get_string(self, offset: int, length: int) -> Optional[str]:
+    """Returns string stored at offset or None for NULL_OFFSET"""
+    if offset == NULL_OFFSET:
+      return None
+    if self._decoded is not None:
+      if offset not in self._decoded:
+        self._decoded[offset] = str(self._strings[offset:offset + length],
+                                    "utf-8")
+      return self._decoded[offset]
+    return str(self._strings[offset:offset + length], "utf-8")
+
+  def _get_strings(self, record: Sequence[int], start: int,
+                   count: int) -> List[Optional[str]]:
+    return [
+        self.get_string(record[position], record[position + 1])
+        for position in range(start, start + 2 * count, 2)
+    ]
+
+  def _find(self, index: str, section: str, name: str) -> Optional[int]:
+    """Returns position of record with name using binary search"""
+    encoded = name.encode("utf-8")
+    low, high = 0, self.count(index)
+    while low < high:
+      middle = (low + high) // 2
+      position = self.get_record(index, middle)[0]
+      offset, length = self.get_record(section, position)[:2]
+      stored = self._strings[offset:offset + length].tobytes()
+      if stored < encoded:
+        low = middle + 1
+      elif stored > encoded:
+        high = middle
+      else:
+        return position
+    return None
+
+  def find_card(self, name: str) -> Optional[int]:
+    """Returns position of card with name or None"""
+    return self._find("card_name_index", "cards", name)
+
+  def find_expansion(self, name: str) -> Optional[int]:
+    """Returns position of expansion with name or None"""
+    return self._find("expansion_name_index", "expansions", name)
+
+  def get_card(self, position: int) -> Dict[str, Any]:
+    """Returns card at position as in cards.json with its name"""
+    values = self._get_strings(self.get_record("cards", position), 0, 7)
+    card = {"card_name": values[0]}
+    for column, value in zip(CARD_COLUMNS, values[1:]):
+      if column in LIST_COLUMNS:
+        value = value.split(",") if value else []
+      card[column] = value
+    return card
+
+  def get_card_print_positions(self, card_position: int) -> range:
+    """Returns positions of card prints of card at position"""
+    start = self.get_record("card_print_ranges", card_position)[0]
+    end = self.get_record("card_print_ranges", card_position + 1)[0]
+    return range(start, end)
+
+  def get_card_positions(self) -> Dict[str, int]:
+    """Returns positions of all cards keyed by card name"""
+    return {
+        self.get_string(*record[:2]): position
+        for position, record in enumerate(self.iter_records("cards"))
+    }
+
+  def find_card_print(self, card_position: int, expansion_name: str,
+                      id_in_expansion: int) -> Optional[int]:
+    """Returns position of card print of card at card_position or None"""
+    for position in self.get_card_print_positions(card_position):
+      record = self.get_record("card_prints", position)
+      if record[6] == id_in_expansion and self.get_string(
+          record[4], record[5]) == expansion_name:
+        return position
+    return None
+
+  def get_card_print(self, position: int) -> Dict[str, Any]:
+    """Returns card print at position as in prints.json"""
+    return self._get_card_print(self.get_record("card_prints", position))
+
+  def _get_card_print(self, record: Sequence[int]) -> Dict[str, Any]:
+    card_name, expansion_name = self._get_strings(record, 2, 2)
+    card_print = {
+        "card_name": card_name,
+        "card_print_expansion_name": expansion_name,
+        "card_print_id_in_exapansion": str(record[6]),
+    }
+    card_print.update(
+        zip(CARD_PRINT_TEXT_COLUMNS, self._get_strings(record, 7, 3)))
+    return card_print
+
+  def get_assets(self) -> Tuple[dict, list, dict]:
+    """Returns cards, card prints and expansions as loaded from assets json
+
+    Like json.load all values are then held in memory of this process.
+    """
+    with self.decoding():
+      block_sets = [
+          self.get_string(*record)
+          for record in self.iter_records("block_sets")
+      ]
+      expansion_blocks = [(self.get_string(*record[:2]), record[2])
+                          for record in self.iter_records("expansion_blocks")]
+      expansions_dict: dict = {block_set: {} for block_set in block_sets}
+      for name, block_set_position in expansion_blocks:
+        expansions_dict[block_sets[block_set_position]][name] = []
+      for record in self.iter_records("expansions"):
+        name, block_set_position = expansion_blocks[record[2]]
+        expansions_dict[block_sets[block_set_position]][name].append(
+            self.get_string(*record[:2]))
+
+      cards = {}
+      for position in range(self.count("cards")):
+        card = self.get_card(position)
+        cards[card.pop("card_name")] = card
+      card_prints = [
+          self._get_card_print(record)
+          for record in self.iter_records("card_prints")
+      ]
+      return cards, card_prints, expansions_dict
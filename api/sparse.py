@@ -0,0 +1,185 @@
+"""
+Sparse fieldsets and relation includes of API responses
+
+Client narrows response with ?fields=id,name and asks for related
+entities with ?include=card,expansion, fields of included relation are
+narrowed with relation prefix, e.g. ?fields=id,rarity,card.name. Key
+fields of every entity (its id) are always returned so pages and
+relations keep working.
+"""
+
+from collections.abc import Mapping
+from typing import Callable, Dict, Iterable, List, Optional, Set
+
+from fastapi import HTTPException, Query
+
+from api.catalog import Catalog
+
+# Fields of catalog entities and their keys
+CARD_FIELDS = ("id", "name", "category", "mana_cost", "attack_type",
+               "classes", "types", "legalities")
+CARD_PRINT_FIELDS = ("id", "card_id", "expansion_id", "id_in_expansion",
+                     "rarity", "text_front", "text_back")
+EXPANSION_FIELDS = ("id", "name", "expansion_block_id", "expansion_block",
+                    "block_set_id", "block_set")
+# Fields of card print rows of collections and decks
+CARD_PRINT_ROW_FIELDS = ("card_print_id", "quantity")
+KEY_FIELDS = ("id",)
+ROW_KEY_FIELDS = ("card_print_id",)
+# Fields and relations of card prints and of rows which hold them
+CARD_PRINT_RELATIONS = {
+    "": CARD_PRINT_FIELDS,
+    "card": CARD_FIELDS,
+    "expansion": EXPANSION_FIELDS,
+}
+CARD_PRINT_ROW_RELATIONS = {
+    "": CARD_PRINT_ROW_FIELDS,
+    "card_print": CARD_PRINT_FIELDS,
+    "card": CARD_FIELDS,
+    "expansion": EXPANSION_FIELDS,
+}
+
+
+def split_names(values: Optional[List[str]]) -> List[str]:
+  """Returns names from repeated and comma separated parameters"""
+  return [
+      name.strip() for value in values or [] for name in value.split(",")
+      if name.strip()
+  ]
+
+
+class SparseParams:
+  """Fields and relations requested by client
+
+  fields maps relation to names of its requested fields, entity itself
+  is relation "". Relation without entry in fields has all fields.
+  """
+
+  def __init__(self, fields: Dict[str, Set[str]], include: Set[str]) -> None:
+    self.fields = fields
+    self.include = include
+
+  def includes(self, relation: str) -> bool:
+    """Returns if relation was requested"""
+    return relation in self.include
+
+  def get_fields(self, relation: str = "") -> Optional[Set[str]]:
+    """Returns requested fields of relation or None if all are requested"""
+    return self.fields.get(relation)
+
+  def get_columns(self,
+                  columns: Iterable[str],
+                  relation: str = "",
+                  keys: Iterable[str] = KEY_FIELDS) -> List[str]:
+    """Returns columns of relation holding requested and key fields"""
+    fields = self.fields.get(relation)
+    if fields is None:
+      return list(columns)
+    fields = fields.union(keys)
+    return [column for column in columns if column in fields]
+
+  def select(self,
+             row: Mapping,
+             relation: str = "",
+             keys: Iterable[str] = KEY_FIELDS) -> dict:
+    """Returns requested and key fields of row of relation"""
+    fields = self.fields.get(relation)
+    if fields is None:
+      return dict(row)
+    fields = fields.union(keys)
+    return {name: row[name] for name in row if name in fields}
+
+
+def get_sparse_params(
+    fields: Dict[str, Iterable[str]],
+    default_include: Iterable[str] = ()) -> Callable[..., SparseParams]:
+  """Returns dependency reading fields and include parameters
+
+  fields maps entity ("") and its relations to their fields, includes not
+  given by client default to default_include. Unknown names are
+  rejected with 400.
+  """
+  allowed = {relation: set(names) for relation, names in fields.items()}
+  relations = sorted(relation for relation in allowed if relation)
+  default = set(default_include)
+
+  def get_params(
+      fields_values: Optional[List[str]] = Query(
+          None,
+          alias="fields",
+          description="Fields to return, fields of included relations are "
+          "prefixed with relation name"),
+      include_values: Optional[List[str]] = Query(
+          None,
+          alias="include",
+          description=f"Relations to include: {', '.join(relations)}"
+          if relations else "No relations can be included")
+  ) -> SparseParams:
+    include = default if include_values is None else set(
+        split_names(include_values))
+    unknown = include.difference(relations)
+    if unknown:
+      raise HTTPException(
+          status_code=400,
+          detail=f"Unknown relations to include: {', '.join(sorted(unknown))}")
+    requested: Dict[str, Set[str]] = {}
+    for name in split_names(fields_values):
+      relation, _, field = name.rpartition(".")
+      if field not in allowed.get(relation, ()):
+        raise HTTPException(status_code=400, detail=f"Unknown field: {name}")
+      requested.setdefault(relation, set()).add(field)
+    return SparseParams(requested, include)
+
+  return get_params
+
+
+###
+# Catalog entities with their relations
+###
+def get_card_content(card: Mapping, catalog: Catalog,
+                     params: SparseParams) -> dict:
+  """Returns requested fields of card and its card prints if included"""
+  content = params.select(card)
+  if params.includes("card_prints"):
+    content["card_prints"] = [
+        params.select(card_print, "card_prints")
+        for card_print in catalog.card_prints_by_card.get(card["id"], [])
+    ]
+  return content
+
+
+def get_card_print_relations(card_print: Mapping, catalog: Catalog,
+                             params: SparseParams) -> dict:
+  """Returns card and expansion of card print if they are included"""
+  relations = {}
+  if params.includes("card"):
+    relations["card"] = params.select(
+        catalog.card_by_id[card_print["card_id"]], "card")
+  if params.includes("expansion"):
+    relations["expansion"] = params.select(
+        catalog.expansion_by_id[card_print["expansion_id"]], "expansion")
+  return relations
+
+
+def get_card_print_content(card_print: Mapping, catalog: Catalog,
+                           params: SparseParams) -> dict:
+  """Returns requested fields of card print and its included relations"""
+  content = params.select(card_print)
+  content.update(get_card_print_relations(card_print, catalog, params))
+  return content
+
+
+def get_card_print_row_content(row: dict, catalog: Catalog,
+                               params: SparseParams) -> dict:
+  """Returns collection or deck row with its included relations
+
+  Relations are card print of row and its card and expansion.
+  """
+  content = params.select(row, keys=ROW_KEY_FIELDS)
+  card_print = catalog.card_print_by_id.get(row["card_print_id"])
+  if card_print is None:
+    return content
+  if params.includes("card_print"):
+    content["card_print"] = params.select(card_print, "card_print")
+  content.update(get_card_print_relations(card_print, catalog, params))
+  return content
@@ -0,0 +1,231 @@
+"""
+Trade matching of users by owned and spare card prints
+
+For every user index keeps bitmap of owned card prints and bitmap of
+spare ones (more than one copy over all collections of the user),
+bitmaps are plain python integers with bit of every card print id set.
+Card print ids are dense, so bitmap of a user takes one bit per card
+print of catalog whatever the size of the collection.
+
+Partners of a user are found with intersections only: partner offers
+its spares the user does not own and wants the user's spares it does
+not own. Partners are ranked by the smaller of the two counts, so
+trades going both ways come first. Bitmaps are loaded from database on
+first request and updated with every collection import and quantity
+change. Lowered quantities are not applied, since database keeps every
+collection at zero or more while index holds totals of users, so user
+is read again on next request instead. So is owner of collection created
+after load, once next request looks it up.
+"""
+
+import asyncio
+import heapq
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from prisma import Prisma
+
+from api import database
+from api.catalog import Catalog
+from api.facets import count_bits, get_positions
+
+
+def get_bits(card_print_ids: Iterable[int]) -> int:
+  """Returns bitmap with bit of every card print id set
+
+  Bits are set in bytearray first, setting them one by one in integer
+  would copy it for every id.
+  """
+  card_print_ids = list(card_print_ids)
+  if not card_print_ids:
+    return 0
+  bitmap = bytearray(max(card_print_ids) // 8 + 1)
+  for card_print_id in card_print_ids:
+    bitmap[card_print_id >> 3] |= 1 << (card_print_id & 7)
+  return int.from_bytes(bitmap, "little")
+
+
+class UserCards:
+  """Owned and spare card prints of one user"""
+
+  def __init__(self) -> None:
+    # Card print id -> quantity over all collections of user
+    self.quantities: Dict[int, int] = {}
+    self.owned = 0
+    self.spares = 0
+
+  def add(self, quantities: Dict[int, int]) -> None:
+    """Adds quantities of card prints changed in collections of user"""
+    for card_print_id, quantity in quantities.items():
+      total = self.quantities.get(card_print_id, 0) + quantity
+      if total > 0:
+        self.quantities[card_print_id] = total
+      else:
+        self.quantities.pop(card_print_id, None)
+    self.owned |= get_bits(card_print_id for card_print_id in quantities
+                           if card_print_id in self.quantities)
+    self.owned &= ~get_bits(card_print_id for card_print_id in quantities
+                            if card_print_id not in self.quantities)
+    self.spares |= get_bits(card_print_id for card_print_id in quantities
+                            if self.quantities.get(card_print_id, 0) > 1)
+    self.spares &= ~get_bits(card_print_id for card_print_id in quantities
+                             if self.quantities.get(card_print_id, 0) < 2)
+
+
+async def read_users(
+    db: Prisma,
+    user_ids: Optional[List[int]] = None) -> Dict[int, UserCards]:
+  """Reads owned card prints of given users or of all users"""
+  collection_rows, user_rows = await asyncio.gather(
+      database.get_user_card_print_quantities(db, user_ids),
+      database.get_user_card_print_ids(db, user_ids))
+  quantities: Dict[int, Dict[int, int]] = {}
+  for row in collection_rows:
+    quantities.setdefault(row["user_id"],
+                          {})[row["card_print_id"]] = row["quantity"]
+  for row in user_rows:
+    quantities.setdefault(row["user_id"],
+                          {}).setdefault(row["card_print_id"], 1)
+  users = {}
+  for user_id, user_quantities in quantities.items():
+    users[user_id] = UserCards()
+    users[user_id].add(user_quantities)
+  return users
+
+
+class TradeIndex:
+  """Bitmaps of card prints owned and spared by every user
+
+  All users are loaded at once on first request, since every match
+  compares user with all others. Users whose quantities were lowered or
+  who changed collection unknown to index are read again on next
+  request. Imports done while loading are applied after load in order.
+  """
+
+  def __init__(self) -> None:
+    self.all_bits = 0
+    self.users: Dict[int, UserCards] = {}
+    self.collection_users: Dict[int, int] = {}
+    self.loaded = False
+    # Users left out until they are read again
+    self.stale_users: Set[int] = set()
+    # Collections created after load whose owners are looked up on load
+    self.unresolved_collections: Set[int] = set()
+    # Imports (collection id, quantities) done while index was loading
+    self._pending: Optional[List[Tuple[int, Dict[int, int]]]] = None
+    self._lock: Optional[asyncio.Lock] = None
+
+  def update(self, catalog: Catalog) -> None:
+    """Rebuilds bitmap of card prints in catalog, others are not traded"""
+    self.all_bits = get_bits(card_print["id"]
+                             for card_print in catalog.card_prints)
+
+  def add_quantities(self, collection_id: int,
+                     quantities: Dict[int, int]) -> None:
+    """Adds quantities of card prints changed in collection
+
+    Owner of collection is forgotten if any quantity was lowered, since
+    only database knows how many copies its collections still hold.
+    """
+    if self._pending is not None:
+      self._pending.append((collection_id, dict(quantities)))
+    elif self.loaded:
+      user_id = self.collection_users.get(collection_id)
+      if user_id is None:
+        # Collection was created after load, its owner is read on next load
+        self.unresolved_collections.add(collection_id)
+        return
+      if any(quantity < 0 for quantity in quantities.values()):
+        self.users.pop(user_id, None)
+        self.stale_users.add(user_id)
+      elif user_id not in self.stale_users:
+        self.users.setdefault(user_id, UserCards()).add(quantities)
+
+  def clear(self) -> None:
+    """Forgets all users, they are loaded again on next request"""
+    self.users = {}
+    self.collection_users = {}
+    self.stale_users = set()
+    self.unresolved_collections = set()
+    self.loaded = False
+
+  async def load(self, db: Prisma) -> None:
+    """Reads owned card prints of all users if they are not loaded yet
+
+    Only stale users and owners of unresolved collections are read if
+    the rest is loaded.
+    """
+    if self.is_current():
+      return
+    if self._lock is None:
+      self._lock = asyncio.Lock()
+    async with self._lock:
+      if self.is_current():
+        return
+      self._pending = []
+      stale_users, self.stale_users = self.stale_users, set()
+      unresolved = self.unresolved_collections
+      self.unresolved_collections = set()
+      try:
+        if self.loaded:
+          if unresolved:
+            collection_users = await database.get_collection_user_ids(
+                db, sorted(unresolved))
+            self.collection_users.update(collection_users)
+            stale_users |= set(collection_users.values())
+          users = await read_users(db, sorted(stale_users))
+          for user_id in stale_users:
+            self.users.pop(user_id, None)
+          self.users.update(users)
+        else:
+          collection_users, self.users = await asyncio.gather(
+              database.get_collection_user_ids(db), read_users(db))
+          self.collection_users = collection_users
+          self.loaded = True
+        pending, self._pending = self._pending, None
+        for collection_id, pending_quantities in pending:
+          self.add_quantities(collection_id, pending_quantities)
+      except BaseException:
+        self.stale_users |= stale_users
+        self.unresolved_collections |= unresolved
+        raise
+      finally:
+        self._pending = None
+
+  def is_current(self) -> bool:
+    """Returns if all users are loaded and none has to be read again"""
+    return (self.loaded and not self.stale_users and
+            not self.unresolved_collections)
+
+  def get_matches(self, user_id: int, limit: int) -> List[dict]:
+    """Returns up to limit best trade partners of user
+
+    Partner has to offer at least one card print the user does not own
+    and want at least one spare of the user.
+    """
+    user = self.users.get(user_id)
+    if user is None:
+      return []
+    missing = self.all_bits & ~user.owned
+    spares = self.all_bits & user.spares
+    if not missing or not spares:
+      return []
+    matches = []
+    for partner_id, partner in self.users.items():
+      offered = partner.spares & missing
+      if partner_id == user_id or not offered:
+        continue
+      wanted = spares & ~partner.owned
+      if not wanted:
+        continue
+      offered_count = count_bits(offered)
+      wanted_count = count_bits(wanted)
+      matches.append((min(offered_count, wanted_count),
+                      offered_count + wanted_count, -partner_id, offered,
+                      wanted))
+    return [{
+        "user_id": -negative_id,
+        "score": score,
+        "offered_card_print_ids": get_positions(offered),
+        "wanted_card_print_ids": get_positions(wanted),
+    } for score, _, negative_id, offered, wanted in heapq.nlargest(
+        limit, matches, key=lambda match: match[:3])]
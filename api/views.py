@@ -0,0 +1,196 @@
+"""
+Cache of collection and deck views of users
+
+Collection and deck pages are viewed far more often than they change, so
+every distinct page request is kept serialized with its ETag, like
+catalog responses in api/responses.py, and repeat views are answered
+without touching database. Entries are tagged with collections, decks
+and users whose rows they hold, every write of api/database.py and
+every quantity change invalidates its tags only. Least recently used
+entries are dropped once all take more than VIEW_CACHE_MAX_BYTES and
+every entry expires after VIEW_CACHE_TTL seconds, which bounds staleness
+after writes done by other processes, like db/fill_db.py.
+
+View read before invalidation of one of its tags is not stored, nor is
+view read on replica during REPLICA_STICKY_SECONDS after invalidation,
+since replica may not have the write yet.
+"""
+
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional, Set
+from typing import Tuple
+
+from fastapi import Request, Response
+
+from api.catalog import Catalog
+from api.replicas import get_sticky_seconds, reads_replicas
+from api.responses import CachedBody, get_cache_key, matches_etag, serialize
+
+DEFAULT_MAX_BYTES = 32 * 1024 * 1024
+DEFAULT_TTL = 60.0
+CACHE_CONTROL = "private, no-cache"
+
+# Kind of rows and their id, e.g. ("collection", 1)
+Tag = Tuple[str, int]
+COLLECTION = "collection"
+DECK = "deck"
+USER_COLLECTIONS = "user_collections"
+USER_DECKS = "user_decks"
+KINDS = (COLLECTION, DECK, USER_COLLECTIONS, USER_DECKS)
+# Kinds of views holding card prints of tables with quantities
+QUANTITY_KINDS = {
+    "collection_has_card_print": COLLECTION,
+    "deck_has_card_print": DECK,
+}
+
+# Prisma tables of add_many holding rows of views: (kind, id column)
+ROW_KINDS = {
+    "collection": (USER_COLLECTIONS, "user_id"),
+    "deck": (USER_DECKS, "user_id"),
+    "collectionhascardprint": (COLLECTION, "collection_id"),
+    "deckhascardprint": (DECK, "deck_id"),
+}
+
+
+def get_row_tags(table: str, rows: Iterable[dict]) -> Set[Tag]:
+  """Returns tags of views holding rows added to Prisma table"""
+  if table not in ROW_KINDS:
+    return set()
+  kind, column = ROW_KINDS[table]
+  return {(kind, row[column]) for row in rows}
+
+
+class CachedView:
+  """Serialized view with its tags and expiry time"""
+
+  def __init__(self, body: CachedBody, tags: Set[Tag], expires: float) -> None:
+    self.body = body
+    self.tags = tags
+    self.expires = expires
+
+
+class ViewCache:
+  """Serialized views keyed by request path and query, dropped by tag"""
+
+  def __init__(self,
+               max_bytes: Optional[int] = None,
+               ttl: Optional[float] = None) -> None:
+    self.max_bytes = DEFAULT_MAX_BYTES
+    self.ttl = DEFAULT_TTL
+    self.configure(max_bytes, ttl)
+    self.size = 0
+    self.hits = 0
+    self.misses = 0
+    self._views: "OrderedDict[str, CachedView]" = OrderedDict()
+    self._keys: Dict[Tag, Set[str]] = {}
+    # Last invalidation time of tags and of whole kinds
+    self._invalidated: Dict[Tag, float] = {}
+    self._kinds_invalidated: Dict[str, float] = {}
+
+  def configure(self,
+                max_bytes: Optional[int] = None,
+                ttl: Optional[float] = None) -> None:
+    """Sets memory budget and time to live, from environment if not given"""
+    self.max_bytes = max_bytes or int(
+        os.getenv("VIEW_CACHE_MAX_BYTES", str(DEFAULT_MAX_BYTES)))
+    self.ttl = ttl or float(os.getenv("VIEW_CACHE_TTL", str(DEFAULT_TTL)))
+
+  def update(self, catalog: Catalog) -> None:  # pylint: disable=unused-argument
+    """Drops all views since they hold values of previous catalog"""
+    self.invalidate_kinds(*KINDS)
+
+  def _drop(self, key: str) -> None:
+    view = self._views.pop(key)
+    self.size -= view.body.size
+    for tag in view.tags:
+      keys = self._keys[tag]
+      keys.discard(key)
+      if not keys:
+        del self._keys[tag]
+
+  def invalidate(self, *tags: Tag) -> None:
+    """Drops views holding rows of tags"""
+    now = time.monotonic()
+    for tag in tags:
+      for key in list(self._keys.get(tag, ())):
+        self._drop(key)
+      self._invalidated[tag] = now
+    # Reads started before ttl are never stored, so older times are not
+    # needed any more
+    if len(self._invalidated) > len(self._views) + 1000:
+      self._invalidated = {
+          tag: invalidated
+          for tag, invalidated in self._invalidated.items()
+          if invalidated > now - self.ttl
+      }
+
+  def invalidate_kinds(self, *kinds: str) -> None:
+    """Drops all views holding rows of kinds"""
+    now = time.monotonic()
+    for kind in kinds:
+      self._kinds_invalidated[kind] = now
+    for key, view in list(self._views.items()):
+      if any(tag[0] in kinds for tag in view.tags):
+        self._drop(key)
+
+  def _is_fresh(self, tags: Iterable[Tag], started: float) -> bool:
+    """Returns whether no tag was invalidated since read started"""
+    if started < time.monotonic() - self.ttl:
+      return False
+    return all(
+        self._invalidated.get(tag, -1.0) < started and
+        self._kinds_invalidated.get(tag[0], -1.0) < started for tag in tags)
+
+  def _get(self, key: str) -> Optional[CachedView]:
+    view = self._views.get(key)
+    if view is None:
+      return None
+    if view.expires <= time.monotonic():
+      self._drop(key)
+      return None
+    self._views.move_to_end(key)
+    return view
+
+  def _put(self, key: str, view: CachedView) -> None:
+    if key in self._views:
+      self._drop(key)
+    self._views[key] = view
+    self.size += view.body.size
+    for tag in view.tags:
+      self._keys.setdefault(tag, set()).add(key)
+    while self.size > self.max_bytes and len(self._views) > 1:
+      self._drop(next(iter(self._views)))
+
+  async def respond(
+      self, request: Request,
+      get_view: Callable[[], Awaitable[Tuple[Any, Iterable[Tag]]]]
+  ) -> Response:
+    """Returns cached view requested, view is read only on miss
+
+    get_view returns content of view and tags of rows it holds.
+    """
+    key = get_cache_key(request)
+    view = self._get(key)
+    if view is not None:
+      self.hits += 1
+    else:
+      self.misses += 1
+      started = time.monotonic()
+      if reads_replicas():
+        started -= get_sticky_seconds()
+      content, tags = await get_view()
+      view = CachedView(CachedBody(serialize(content)), set(tags),
+                        time.monotonic() + self.ttl)
+      if self._is_fresh(view.tags, started):
+        self._put(key, view)
+    headers = {"ETag": view.body.etag, "Cache-Control": CACHE_CONTROL}
+    if matches_etag(request.headers.get("if-none-match"), view.body.etag):
+      return Response(status_code=304, headers=headers)
+    return Response(content=view.body.body,
+                    media_type="application/json",
+                    headers=headers)
+
+
+view_cache = ViewCache()
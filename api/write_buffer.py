@@ -0,0 +1,282 @@
+"""
+Write-behind buffer of card print quantity changes
+
+Every +1/-1 on a card print of collection or deck is merged into one
+pending delta per (owner id, card print id) instead of being written.
+Stored quantity is read with every change, so pending delta keeps
+quantity at zero or more just like writing every change on its own.
+Pending deltas are written as one transaction of batched statements
+every QUANTITY_FLUSH_SECONDS or once QUANTITY_FLUSH_SIZE keys are
+pending, and on shutdown. Reads merge pending deltas into rows read
+from database, so users see their own writes before they are flushed.
+"""
+
+import asyncio
+import logging
+import os
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional
+from typing import Tuple, TypeVar
+
+from prisma import Prisma
+from pydantic import BaseModel, Field
+
+from api import database
+from api.pagination import encode_cursor
+from api.replicas import mark_written
+from api.views import QUANTITY_KINDS, view_cache
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_FLUSH_SECONDS = 1.0
+DEFAULT_FLUSH_SIZE = 1000
+# Flushes of one existing owner which may fail while database answers
+# before its deltas are dropped, e.g. when card print was deleted
+MAX_FLUSH_ATTEMPTS = 3
+
+# Largest change of quantity accepted at once
+MAX_QUANTITY_DELTA = 1000
+
+# Card print id -> quantity delta
+Deltas = Dict[int, int]
+# Called with owner id and its deltas once they are written
+FlushListener = Callable[[int, Deltas], None]
+Rows = TypeVar("Rows")
+
+
+class QuantityChange(BaseModel):
+  """Change of quantity of card print, e.g. +1 or -1"""
+  delta: int = Field(..., ge=-MAX_QUANTITY_DELTA, le=MAX_QUANTITY_DELTA)
+
+
+def merge_page(rows: List[dict], deltas: Deltas, after_id: Optional[int],
+               limit: int) -> dict:
+  """Returns page of rows with pending deltas applied
+
+  Rows hold card_print_id and quantity and are read after after_id with
+  limit + 1. They hold every stored card print up to the last one read,
+  or all of them if fewer were read, so only deltas in that range belong
+  to the page. Rows whose quantity drops to zero are left out.
+  """
+  has_more = len(rows) > limit
+  end = rows[-1]["card_print_id"] if has_more else None
+  quantities = {row["card_print_id"]: row["quantity"] for row in rows}
+  for card_print_id, delta in deltas.items():
+    if ((after_id is None or card_print_id > after_id) and
+        (end is None or card_print_id <= end)):
+      quantities[card_print_id] = quantities.get(card_print_id, 0) + delta
+  items = [{
+      "card_print_id": card_print_id,
+      "quantity": quantity
+  } for card_print_id, quantity in sorted(quantities.items()) if quantity > 0]
+  page = items[:limit]
+  next_cursor = None
+  if len(items) > limit:
+    next_cursor = encode_cursor((page[-1]["card_print_id"],))
+  elif has_more:
+    next_cursor = encode_cursor((end,))
+  return {"items": page, "next_cursor": next_cursor}
+
+
+def merge_quantities(quantities: Dict[int, int],
+                     deltas: Deltas) -> Dict[int, int]:
+  """Returns quantities keyed by card print id with deltas applied"""
+  merged = dict(quantities)
+  for card_print_id, delta in deltas.items():
+    merged[card_print_id] = merged.get(card_print_id, 0) + delta
+  return {
+      card_print_id: quantity
+      for card_print_id, quantity in merged.items()
+      if quantity > 0
+  }
+
+
+class QuantityBuffer:
+  """Pending quantity deltas of one table merged by owner and card print
+
+  Reads wait while a flush is being written and are repeated if a flush
+  started while they were reading, so a delta is never missing from
+  them nor counted twice.
+  """
+
+  def __init__(self,
+               db: Prisma,
+               table: str,
+               flush_seconds: Optional[float] = None,
+               flush_size: Optional[int] = None,
+               listeners: Iterable[FlushListener] = ()) -> None:
+    self.db = db
+    self.table = table
+    self.flush_seconds = flush_seconds or float(
+        os.getenv("QUANTITY_FLUSH_SECONDS", str(DEFAULT_FLUSH_SECONDS)))
+    self.flush_size = flush_size or int(
+        os.getenv("QUANTITY_FLUSH_SIZE", str(DEFAULT_FLUSH_SIZE)))
+    self.listeners = list(listeners)
+    # Owner id -> card print id -> delta
+    self.deltas: Dict[int, Deltas] = {}
+    self.size = 0
+    self.flushes = 0
+    self._attempts: Dict[int, int] = {}
+    self._flushing = False
+    self._idle: Optional[asyncio.Event] = None
+    self._lock: Optional[asyncio.Lock] = None
+    self._task: Optional[asyncio.Task] = None
+
+  def add(self,
+          owner_id: int,
+          card_print_id: int,
+          delta: int,
+          stored: Optional[int] = None) -> int:
+    """Merges delta into pending delta of card print and returns it
+
+    Pending delta never drops below -stored if stored quantity is given.
+    Flush is started right away once flush_size keys are pending. Reads
+    of client which changed quantity go to primary from now on, since
+    replicas get the change only some time after flush.
+    """
+    mark_written()
+    view_cache.invalidate((QUANTITY_KINDS[self.table], owner_id))
+    owner_deltas = self.deltas.setdefault(owner_id, {})
+    if card_print_id not in owner_deltas:
+      self.size += 1
+    pending = owner_deltas.get(card_print_id, 0) + delta
+    if stored is not None:
+      pending = max(pending, -stored)
+    owner_deltas[card_print_id] = pending
+    if self.size >= self.flush_size:
+      asyncio.ensure_future(self._try_flush())
+    return pending
+
+  async def change(self, owner_id: int, card_print_id: int,
+                   delta: int) -> Optional[int]:
+    """Adds delta to quantity of card print, keeping it at zero or more
+
+    Returns pending delta of card print or None if owner does not exist.
+    """
+    stored, _ = await self.read([], lambda: database.get_stored_quantity(
+        self.db, self.table, owner_id, card_print_id))
+    if stored is None:
+      return None
+    return self.add(owner_id, card_print_id, delta, stored)
+
+  async def read(
+      self, owner_ids: Iterable[int], read_rows: Callable[[], Awaitable[Rows]]
+  ) -> Tuple[Rows, Dict[int, Deltas]]:
+    """Returns rows read by read_rows with pending deltas not in them
+
+    Deltas are copied and keyed by owner id, owners without pending
+    deltas are left out.
+    """
+    if self._idle is None:
+      self._idle = asyncio.Event()
+      self._idle.set()
+    while True:
+      await self._idle.wait()
+      flushes = self.flushes
+      rows = await read_rows()
+      if flushes == self.flushes and not self._flushing:
+        return rows, {
+            owner_id: dict(self.deltas[owner_id])
+            for owner_id in owner_ids
+            if owner_id in self.deltas
+        }
+
+  async def flush(self) -> None:
+    """Writes all pending deltas in one transaction
+
+    Owners whose deltas failed to be written are retried one by one,
+    deltas of those failing again are kept for next flush unless their
+    owner no longer exists or they failed MAX_FLUSH_ATTEMPTS times.
+    """
+    if self._lock is None:
+      self._lock = asyncio.Lock()
+    if self._idle is None:
+      self._idle = asyncio.Event()
+      self._idle.set()
+    async with self._lock:
+      if not self.deltas:
+        return
+      deltas, self.deltas = self.deltas, {}
+      self.size = 0
+      self.flushes += 1
+      self._flushing = True
+      self._idle.clear()
+      try:
+        try:
+          await database.add_card_print_quantity_deltas(
+              self.db, self.table, deltas)
+          written = deltas
+        except Exception:  # pylint: disable=broad-except
+          logger.exception("Flush of %s failed, retrying owners one by one",
+                           self.table)
+          written = await self._flush_owners(deltas)
+      finally:
+        self._flushing = False
+        self._idle.set()
+    for owner_id, owner_deltas in written.items():
+      self._attempts.pop(owner_id, None)
+      for listener in self.listeners:
+        listener(owner_id, owner_deltas)
+
+  async def _flush_owners(self,
+                          deltas: Dict[int, Deltas]) -> Dict[int, Deltas]:
+    written = {}
+    for owner_id, owner_deltas in deltas.items():
+      try:
+        await database.add_card_print_quantity_deltas(
+            self.db, self.table, {owner_id: owner_deltas})
+      except Exception:  # pylint: disable=broad-except
+        if await self._should_retry(owner_id):
+          self._restore(owner_id, owner_deltas)
+        else:
+          logger.error("Dropped %d pending deltas of %s owner %d",
+                       len(owner_deltas), self.table, owner_id)
+        continue
+      written[owner_id] = owner_deltas
+    return written
+
+  async def _should_retry(self, owner_id: int) -> bool:
+    try:
+      exists = await database.quantity_owner_exists(self.db, self.table,
+                                                    owner_id)
+    except Exception:  # pylint: disable=broad-except
+      # Database is not answering, nothing is wrong with the deltas
+      return True
+    attempts = self._attempts[owner_id] = self._attempts.get(owner_id, 0) + 1
+    if exists and attempts < MAX_FLUSH_ATTEMPTS:
+      return True
+    del self._attempts[owner_id]
+    return False
+
+  def _restore(self, owner_id: int, deltas: Deltas) -> None:
+    owner_deltas = self.deltas.setdefault(owner_id, {})
+    for card_print_id, delta in deltas.items():
+      if card_print_id not in owner_deltas:
+        self.size += 1
+      owner_deltas[card_print_id] = owner_deltas.get(card_print_id, 0) + delta
+
+  async def _try_flush(self) -> None:
+    try:
+      await self.flush()
+    except Exception:  # pylint: disable=broad-except
+      logger.exception("Flush of %s failed", self.table)
+
+  async def _flush_periodically(self) -> None:
+    while True:
+      await asyncio.sleep(self.flush_seconds)
+      await self._try_flush()
+
+  def start(self) -> None:
+    """Starts flushing pending deltas every flush_seconds"""
+    if self._task is None:
+      self._task = asyncio.ensure_future(self._flush_periodically())
+
+  async def close(self) -> None:
+    """Stops periodic flushes and writes everything still pending"""
+    if self._task is not None:
+      self._task.cancel()
+      try:
+        await self._task
+      except asyncio.CancelledError:
+        pass
+      self._task = None
+    await self.flush()
@@ -0,0 +1,3 @@
+"""
+Benchmarks of database seeding and API endpoints, see benchmarks/run.py
+"""
@@ -0,0 +1,353 @@
+"""
+Benchmark script for wowtcg-tracker-api
+
+Seeds SQLite stand-in of database (see benchmarks/sqlite_client.py) with
+assets folder through db/fill_db.py, starts API on it and measures p50
+and p99 latency of endpoints called through ASGI app by several
+concurrent clients. Results are written as JSON and compared with
+baseline results, script exits with 1 if any metric got worse than its
+threshold allows.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import math
+import os
+import platform
+import sqlite3
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from colorama import Fore, Style
+
+current = os.path.dirname(os.path.realpath(__file__))
+parent = os.path.dirname(current)
+sys.path.append(parent)
+sys.path.append(os.path.join(parent, "db"))
+
+# pylint: disable=wrong-import-position
+import fill_db
+from api import app, database, on_shutdown, start
+from benchmarks.sqlite_client import SQLiteClient
+# pylint: enable=wrong-import-position
+
+try:
+  import resource
+except ImportError:  # Windows
+  resource = None
+
+RED = Fore.RED
+GREEN = Fore.GREEN
+CYAN = Fore.CYAN
+YELLOW = Fore.YELLOW
+RESET_COLOR = Style.RESET_ALL
+
+DEFAULT_OUTPUT = "benchmark-results.json"
+DEFAULT_CONCURRENCY = "1,8,32"
+DEFAULT_REQUESTS = 200
+DEFAULT_MAX_REGRESSION = 0.25
+
+COLLECTION_SIZE = 500
+DECK_SIZE = 60
+
+# Name: method, path and JSON body, {user_id}, {collection_id},
+# {deck_id}, {card_id} and {card_print_id} are filled with seeded ids
+ENDPOINTS = {
+    "cards": ("GET", "/cards?limit=100", None),
+    "cards_filtered": ("GET", "/cards?class=Mage&type=!Human&facets=true",
+                       None),
+    "card": ("GET", "/cards/{card_id}", None),
+    "card_prints_sparse":
+        ("GET", "/card-prints?limit=100&fields=rarity,card.name"
+         "&include=card", None),
+    "card_prints_batch": ("POST", "/card-prints/batch", {
+        "ids": "{card_print_ids}"
+    }),
+    "search": ("GET", "/search?q=fire", None),
+    "collection_card_prints":
+        ("GET", "/collections/{collection_id}/card-prints?limit=100", None),
+    "collection_completion":
+        ("GET", "/collections/{collection_id}/completion", None),
+    "deck_analytics": ("GET", "/decks/{deck_id}/analytics", None),
+    "trade_matches": ("GET", "/users/{user_id}/trade-matches", None),
+    "collection_quantity":
+        ("POST", "/collections/{collection_id}/card-prints/{card_print_id}", {
+            "delta": 1
+        }),
+}
+
+
+def get_arguments() -> argparse.Namespace:
+  """Returns parsed command line arguments"""
+  parser = argparse.ArgumentParser(description="Benchmarks database "
+                                   "seeding and API endpoints on SQLite "
+                                   "stand-in of database")
+  parser.add_argument("--output",
+                      default=DEFAULT_OUTPUT,
+                      help=f"Results JSON file (default: {DEFAULT_OUTPUT})")
+  parser.add_argument("--baseline",
+                      help="Results JSON file to compare results with")
+  parser.add_argument("--max-regression",
+                      type=float,
+                      default=DEFAULT_MAX_REGRESSION,
+                      help="Allowed relative growth of every metric over "
+                      f"baseline (default: {DEFAULT_MAX_REGRESSION})")
+  parser.add_argument("--threshold",
+                      action="append",
+                      default=[],
+                      metavar="METRIC=RATIO",
+                      help="Allowed relative growth of one metric, "
+                      "overrides --max-regression")
+  parser.add_argument("--concurrency",
+                      default=DEFAULT_CONCURRENCY,
+                      help="Comma separated numbers of concurrent clients "
+                      f"(default: {DEFAULT_CONCURRENCY})")
+  parser.add_argument("--requests",
+                      type=int,
+                      default=DEFAULT_REQUESTS,
+                      help="Requests to every endpoint at every "
+                      f"concurrency (default: {DEFAULT_REQUESTS})")
+  parser.add_argument("--batch-size",
+                      type=int,
+                      default=fill_db.DEFAULT_BATCH_SIZE,
+                      help="Batch size of fill script (default: "
+                      f"{fill_db.DEFAULT_BATCH_SIZE})")
+  arguments = parser.parse_args()
+  try:
+    arguments.thresholds = get_thresholds(arguments.threshold)
+    arguments.concurrency_levels = [
+        int(level) for level in arguments.concurrency.split(",")
+    ]
+  except ValueError as error:
+    parser.error(str(error))
+  return arguments
+
+
+def get_thresholds(values: List[str]) -> Dict[str, float]:
+  """Returns thresholds of metrics from METRIC=RATIO values"""
+  thresholds = {}
+  for value in values:
+    metric, separator, ratio = value.partition("=")
+    if not separator:
+      raise ValueError(f"Threshold {value} is not METRIC=RATIO")
+    thresholds[metric] = float(ratio)
+  return thresholds
+
+
+def get_percentile(values: List[float], percentile: float) -> float:
+  """Returns nearest-rank percentile of values"""
+  ordered = sorted(values)
+  rank = max(math.ceil(percentile / 100 * len(ordered)), 1)
+  return ordered[rank - 1]
+
+
+def get_peak_memory() -> Optional[int]:
+  """Returns peak resident memory of process in KiB"""
+  if resource is None:
+    return None
+  peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+  # macOS reports bytes, Linux kilobytes
+  return peak // 1024 if sys.platform == "darwin" else peak
+
+
+def get_regressions(metrics: Dict[str, float], baseline: Dict[str, float],
+                    max_regression: float,
+                    thresholds: Dict[str, float]) -> List[str]:
+  """Returns descriptions of metrics which grew past their threshold
+
+  All metrics are lower is better, metrics missing in baseline are
+  skipped.
+  """
+  regressions = []
+  for metric, value in sorted(metrics.items()):
+    base = baseline.get(metric)
+    if base is None or value is None:
+      continue
+    threshold = thresholds.get(metric, max_regression)
+    if value > base * (1 + threshold):
+      regressions.append(f"{metric}: {value:.3f} > {base:.3f} "
+                         f"+{threshold:.0%}")
+  return regressions
+
+
+async def call(method: str,
+               path: str,
+               body: Optional[Any] = None) -> Tuple[int, float]:
+  """Returns status and seconds taken by request sent to ASGI app"""
+  path, _, query = path.partition("?")
+  content = b"" if body is None else json.dumps(body).encode("utf-8")
+  scope = {
+      "type": "http",
+      "asgi": {
+          "version": "3.0"
+      },
+      "http_version": "1.1",
+      "method": method,
+      "scheme": "http",
+      "path": path,
+      "raw_path": path.encode("utf-8"),
+      "query_string": query.encode("utf-8"),
+      "root_path": "",
+      "headers": [(b"host", b"benchmark"),
+                  (b"content-type", b"application/json"),
+                  (b"content-length", str(len(content)).encode("ascii"))],
+      "client": ("127.0.0.1", 0),
+      "server": ("benchmark", 80),
+  }
+  messages = [{"type": "http.request", "body": content, "more_body": False}]
+  status = 0
+
+  async def receive() -> dict:
+    if messages:
+      return messages.pop()
+    # Client stays connected until response is sent
+    await asyncio.get_running_loop().create_future()
+    return {"type": "http.disconnect"}
+
+  async def send(message: dict) -> None:
+    nonlocal status
+    if message["type"] == "http.response.start":
+      status = message["status"]
+
+  start_time = time.perf_counter()
+  await app(scope, receive, send)
+  return status, time.perf_counter() - start_time
+
+
+async def measure_endpoint(method: str, path: str, body: Optional[Any],
+                           concurrency: int, requests: int) -> List[float]:
+  """Returns latencies of requests sent by concurrent clients in seconds"""
+  latencies: List[float] = []
+  remaining = [requests]
+
+  async def client() -> None:
+    while remaining[0] > 0:
+      remaining[0] -= 1
+      status, latency = await call(method, path, body)
+      if status not in (200, 202):
+        raise RuntimeError(f"{method} {path} returned {status}")
+      latencies.append(latency)
+
+  await asyncio.gather(*(client() for _ in range(concurrency)))
+  return latencies
+
+
+async def seed_user_data(db: SQLiteClient) -> Dict[str, Any]:
+  """Adds user with collection and public deck and returns their ids"""
+  user = await database.add_user(db, "benchmark", "benchmark@example.com")
+  card_prints = await db.cardprint.find_many(order={"id": "asc"})
+  collection = await database.add_collcetion(db, user.id, "Benchmark")
+  await database.add_collection_card_print_quantities(
+      db, collection.id,
+      {card_print.id: 1 for card_print in card_prints[:COLLECTION_SIZE]})
+  hero = (await db.card.find_many(where={"category": "Hero"}, take=1))[0]
+  hero_print = (await db.cardprint.find_many(where={"card_id": hero.id},
+                                             take=1))[0]
+  deck = await database.add_deck(db,
+                                 user.id,
+                                 hero_print.id,
+                                 "Benchmark",
+                                 is_public=True)
+  await db.deckhascardprint.create_many(data=[{
+      "deck_id": deck.id,
+      "card_print_id": card_print.id,
+      "quantity": 1
+  } for card_print in card_prints[:DECK_SIZE]])
+  return {
+      "user_id": user.id,
+      "collection_id": collection.id,
+      "deck_id": deck.id,
+      "card_id": hero.id,
+      "card_print_id": hero_print.id,
+      "card_print_ids": [card_print.id for card_print in card_prints[:100]],
+  }
+
+
+def fill_ids(value: Any, ids: Dict[str, Any]) -> Any:
+  """Returns path or body with placeholders replaced by seeded ids"""
+  if isinstance(value, dict):
+    return {key: fill_ids(item, ids) for key, item in value.items()}
+  if isinstance(value, str) and value.startswith("{") and value.endswith(
+      "}") and value[1:-1] in ids:
+    return ids[value[1:-1]]
+  if isinstance(value, str):
+    return value.format(**ids)
+  return value
+
+
+async def run(arguments: argparse.Namespace, path: str) -> Dict[str, float]:
+  """Runs all benchmarks with database at path and returns metrics"""
+  metrics: Dict[str, float] = {}
+  cards = fill_db.get_data_from_json("assets/cards.json")
+  card_prints = fill_db.get_data_from_json("assets/prints.json")
+  expansions = fill_db.get_data_from_json("assets/expansions.json")
+
+  print(f"{CYAN}🛈 Filling database from assets folder{RESET_COLOR}")
+  db = SQLiteClient(path)
+  start_time = time.perf_counter()
+  with contextlib.redirect_stdout(io.StringIO()):
+    await fill_db.fill_database(db, cards, card_prints, expansions,
+                                arguments.batch_size)
+  metrics["fill_db_seconds"] = time.perf_counter() - start_time
+  metrics["fill_db_queries"] = db.queries
+  metrics["fill_db_peak_memory_kib"] = get_peak_memory()
+
+  await db.connect()
+  ids = await seed_user_data(db)
+  print(f"{CYAN}🛈 Starting API{RESET_COLOR}")
+  start_time = time.perf_counter()
+  await start(db)
+  metrics["startup_seconds"] = time.perf_counter() - start_time
+
+  try:
+    for name, (method, endpoint_path, body) in ENDPOINTS.items():
+      endpoint_path = fill_ids(endpoint_path, ids)
+      body = fill_ids(body, ids)
+      for concurrency in arguments.concurrency_levels:
+        latencies = await measure_endpoint(method, endpoint_path, body,
+                                           concurrency, arguments.requests)
+        for percentile in (50, 99):
+          metrics[f"{name}_c{concurrency}_p{percentile}_ms"] = (
+              get_percentile(latencies, percentile) * 1000)
+        print(f"{CYAN}🛈 {name} with {YELLOW}{concurrency}{CYAN} clients: "
+              f"p50 {YELLOW}"
+              f"{metrics[f'{name}_c{concurrency}_p50_ms']:.2f}{CYAN} ms, "
+              f"p99 {YELLOW}"
+              f"{metrics[f'{name}_c{concurrency}_p99_ms']:.2f}{CYAN} ms"
+              f"{RESET_COLOR}")
+  finally:
+    await on_shutdown()
+  metrics["peak_memory_kib"] = get_peak_memory()
+  return metrics
+
+
+if __name__ == "__main__":
+  args = get_arguments()
+  with tempfile.TemporaryDirectory() as directory:
+    results = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "requests": args.requests,
+        "metrics": asyncio.run(run(args, os.path.join(directory,
+                                                      "benchmark.db"))),
+    }
+  with open(args.output, "w", encoding="utf-8") as file:
+    json.dump(results, file, indent=2)
+  print(f"{GREEN}🛈 Results written to {args.output}{RESET_COLOR}")
+
+  if args.baseline:
+    with open(args.baseline, "r", encoding="utf-8") as file:
+      baseline_metrics = json.load(file)["metrics"]
+    found = get_regressions(results["metrics"], baseline_metrics,
+                            args.max_regression, args.thresholds)
+    for regression in found:
+      print(f"{RED}⚠ Regression of {regression}{RESET_COLOR}")
+    if found:
+      sys.exit(1)
+    print(f"{GREEN}🛈 No regressions against {args.baseline}{RESET_COLOR}")
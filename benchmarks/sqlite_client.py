@@ -0,0 +1,449 @@
+"""
+In-process SQLite stand-in for Prisma client used by benchmarks
+
+Tables are created from prisma/schema.prisma, so benchmarks run the
+real fill script and API without MySQL server. Client implements only
+the part of Prisma client API this project uses: find_many, find_unique,
+create, create_many, update, delete_many, batch_, query_raw and
+execute_raw. MySQL upsert used by collection imports is translated to
+SQLite one and LEAST to SQLite MIN.
+
+Queries run synchronously in event loop thread, so measured latency
+includes query execution but not network round trips to database.
+"""
+
+import contextlib
+import functools
+import os
+import re
+import sqlite3
+from typing import Any, Awaitable, Callable, Dict, Iterable, Iterator, List
+from typing import Optional, Tuple, Union
+
+SCHEMA_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)),
+                           "prisma", "schema.prisma")
+
+SCALAR_TYPES = {
+    "Int": "INTEGER",
+    "BigInt": "INTEGER",
+    "String": "TEXT",
+    "Boolean": "INTEGER",
+    "Float": "REAL",
+    "DateTime": "TEXT",
+}
+OPERATORS = {"gt": ">", "gte": ">=", "lt": "<", "lte": "<=", "not": "!="}
+
+MODEL_PATTERN = re.compile(r"^model (\w+) \{(.*?)^\}", re.M | re.S)
+ENUM_PATTERN = re.compile(r"^enum (\w+) \{", re.M)
+FIELD_PATTERN = re.compile(r"^(\w+)\s+(\w+)(\[\]|\?)?\s*(.*)$")
+UPSERT_PATTERN = re.compile(r"ON DUPLICATE KEY UPDATE", re.I)
+VALUES_PATTERN = re.compile(r"VALUES\((\w+)\)", re.I)
+LEAST_PATTERN = re.compile(r"\bLEAST\(", re.I)
+
+# Query recorded by batch, run when batch exits
+Query = Callable[[], Awaitable[Any]]
+
+
+def get_names(attribute: str, text: str) -> List[str]:
+  """Returns field names of list argument like @@id([a, b]) or fields: [a]"""
+  match = re.search(re.escape(attribute) + r"\s*\(?\[([^\]]*)\]", text)
+  if match is None:
+    return []
+  return [name.strip() for name in match.group(1).split(",")]
+
+
+class Relation:
+  """Foreign key of model to another model"""
+
+  def __init__(self, target: str, fields: List[str], references: List[str],
+               cascade: bool) -> None:
+    self.target = target
+    self.fields = fields
+    self.references = references
+    self.cascade = cascade
+
+
+class Model:
+  """Table of Prisma model with its scalar columns and relations"""
+
+  def __init__(self, name: str, body: str, models: Iterable[str],
+               enums: Iterable[str]) -> None:
+    self.name = name
+    self.table = name
+    self.columns: Dict[str, str] = {}
+    self.booleans = set()
+    self.relations: Dict[str, Relation] = {}
+    self.definitions: List[str] = []
+    self.indexes: List[List[str]] = []
+    self.has_primary_key = False
+    primary_key: List[str] = []
+    for line in (line.strip() for line in body.splitlines()):
+      if line.startswith("@@map"):
+        self.table = re.search(r'"(\w+)"', line).group(1)
+      elif line.startswith("@@id"):
+        primary_key = get_names("@@id", line)
+      elif line.startswith("@@index"):
+        self.indexes.append(get_names("@@index", line))
+      elif line.startswith("@@unique"):
+        self.definitions.append(
+            f"UNIQUE ({', '.join(get_names('@@unique', line))})")
+      elif line and not line.startswith("//"):
+        self._add_field(line, models, enums)
+    if not self.has_primary_key:
+      self.definitions.append(f"PRIMARY KEY ({', '.join(primary_key)})")
+    elif primary_key:
+      # SQLite only increments single column primary key
+      self.definitions.append(f"UNIQUE ({', '.join(primary_key)})")
+
+  def _add_field(self, line: str, models: Iterable[str],
+                 enums: Iterable[str]) -> None:
+    match = FIELD_PATTERN.match(line)
+    if match is None:
+      return
+    name, field_type, modifier, attributes = match.groups()
+    if modifier == "[]":
+      return
+    if field_type in models:
+      self.relations[name] = Relation(
+          field_type, get_names("fields:", attributes),
+          get_names("references:", attributes), "onDelete: Cascade"
+          in attributes)
+      return
+    column_type = "TEXT" if field_type in enums else SCALAR_TYPES[field_type]
+    self.columns[name] = column_type
+    if field_type == "Boolean":
+      self.booleans.add(name)
+    definition = f"{name} {column_type}"
+    if "autoincrement()" in attributes or "@id" in attributes.split():
+      definition += " PRIMARY KEY"
+      self.has_primary_key = True
+    if modifier != "?" and "autoincrement()" not in attributes:
+      definition += " NOT NULL"
+    if "@unique" in attributes and "autoincrement()" not in attributes:
+      definition += " UNIQUE"
+    default = re.search(r"@default\((\w+)\)", attributes)
+    if default is not None:
+      value = {"false": "0", "true": "1"}.get(default.group(1))
+      definition += f" DEFAULT {value or repr(default.group(1))}"
+    self.definitions.append(definition)
+
+  def get_statements(self, tables: Dict[str, str]) -> List[str]:
+    """Returns statements creating table and its indexes
+
+    tables maps model names to their tables for foreign keys.
+    """
+    foreign_keys = [
+        f"FOREIGN KEY ({', '.join(relation.fields)}) REFERENCES "
+        f"{tables[relation.target]} ({', '.join(relation.references)})" +
+        (" ON DELETE CASCADE" if relation.cascade else "")
+        for relation in self.relations.values()
+    ]
+    definitions = ",\n  ".join(self.definitions + foreign_keys)
+    statements = [
+        f"CREATE TABLE IF NOT EXISTS {self.table} (\n  {definitions}\n)"
+    ]
+    for columns in self.indexes:
+      statements.append(f"CREATE INDEX IF NOT EXISTS "
+                        f"{self.table}_{'_'.join(columns)}_idx "
+                        f"ON {self.table} ({', '.join(columns)})")
+    return statements
+
+  def to_row(self, values: Tuple, names: List[str]) -> "Row":
+    """Returns row of selected values with booleans converted"""
+    return Row({
+        name: bool(value) if name in self.booleans and value is not None else
+        value for name, value in zip(names, values)
+    })
+
+
+def parse_schema(text: str) -> Dict[str, Model]:
+  """Returns models of Prisma schema keyed by client attribute name"""
+  blocks = MODEL_PATTERN.findall(text)
+  names = {name for name, _ in blocks}
+  enums = set(ENUM_PATTERN.findall(text))
+  return {
+      name.lower(): Model(name, body, names, enums) for name, body in blocks
+  }
+
+
+class Row:
+  """Model instance with fields as attributes like Prisma models"""
+
+  def __init__(self, values: Dict[str, Any]) -> None:
+    self.__dict__.update(values)
+
+  def dict(self) -> Dict[str, Any]:
+    """Returns values of all fields"""
+    return dict(self.__dict__)
+
+  def __repr__(self) -> str:
+    return f"Row({self.__dict__!r})"
+
+
+def get_value(value: Any) -> Any:
+  """Returns value as SQLite parameter"""
+  return int(value) if isinstance(value, bool) else value
+
+
+class Actions:
+  """Queries of one model, like db.card of Prisma client"""
+
+  def __init__(self, client: "SQLiteClient", model: Model) -> None:
+    self.client = client
+    self.model = model
+
+  def get_where(self, where: Optional[Dict[str, Any]],
+                model: Optional[Model] = None) -> Tuple[str, List[Any]]:
+    """Returns SQL condition and its parameters of Prisma where filter"""
+    model = model or self.model
+    conditions = []
+    params: List[Any] = []
+    for field, condition in (where or {}).items():
+      if field in model.relations:
+        relation = model.relations[field]
+        target = self.client.models[relation.target.lower()]
+        sql, target_params = self.get_where(condition.get("is"), target)
+        conditions.append(f"({', '.join(relation.fields)}) IN (SELECT "
+                          f"{', '.join(relation.references)} FROM "
+                          f"{target.table} WHERE {sql})")
+        params.extend(target_params)
+      elif not isinstance(condition, dict):
+        if condition is None:
+          conditions.append(f"{field} IS NULL")
+        else:
+          conditions.append(f"{field} = ?")
+          params.append(get_value(condition))
+      else:
+        for operator, value in condition.items():
+          if operator in ("in", "not_in"):
+            negation = "NOT " if operator == "not_in" else ""
+            conditions.append(
+                f"{field} {negation}IN ({', '.join('?' * len(value))})")
+            params.extend(get_value(item) for item in value)
+          elif operator == "equals":
+            conditions.append(f"{field} = ?")
+            params.append(get_value(value))
+          else:
+            conditions.append(f"{field} {OPERATORS[operator]} ?")
+            params.append(get_value(value))
+    return " AND ".join(conditions) or "1", params
+
+  def _select(self,
+              where: Optional[Dict[str, Any]] = None,
+              order: Union[None, Dict[str, str], List[Dict[str, str]]] = None,
+              take: Optional[int] = None,
+              skip: Optional[int] = None) -> List[Row]:
+    sql, params = self.get_where(where)
+    names = list(self.model.columns)
+    query = f"SELECT {', '.join(names)} FROM {self.model.table} WHERE {sql}"
+    if order:
+      orders = order if isinstance(order, list) else [order]
+      query += " ORDER BY " + ", ".join(f"{field} {direction.upper()}"
+                                        for item in orders
+                                        for field, direction in item.items())
+    if take is not None or skip is not None:
+      query += " LIMIT ? OFFSET ?"
+      params.extend((-1 if take is None else take, skip or 0))
+    return [
+        self.model.to_row(values, names)
+        for values in self.client.execute(query, params).fetchall()
+    ]
+
+  def _insert(self, data: Dict[str, Any]) -> int:
+    names = list(data)
+    cursor = self.client.execute(
+        f"INSERT INTO {self.model.table} ({', '.join(names)}) "
+        f"VALUES ({', '.join('?' * len(names))})",
+        [get_value(data[name]) for name in names])
+    return cursor.lastrowid
+
+  async def find_many(self, **kwargs: Any) -> List[Row]:
+    """Returns rows matching where in given order"""
+    return self._select(**kwargs)
+
+  async def find_unique(self, where: Dict[str, Any]) -> Optional[Row]:
+    """Returns row matching unique where or None"""
+    rows = self._select(where, take=1)
+    return rows[0] if rows else None
+
+  async def create(self, data: Dict[str, Any]) -> Row:
+    """Inserts row and returns it"""
+    rowid = self._insert(data)
+    names = list(self.model.columns)
+    return self.model.to_row(
+        self.client.execute(
+            f"SELECT {', '.join(names)} FROM {self.model.table} "
+            "WHERE rowid = ?", [rowid]).fetchone(), names)
+
+  async def create_many(self, data: List[Dict[str, Any]]) -> int:
+    """Inserts all rows as one query and returns their count"""
+    if not data:
+      return 0
+    names = list(data[0])
+    self.client.execute_many(
+        f"INSERT INTO {self.model.table} ({', '.join(names)}) "
+        f"VALUES ({', '.join('?' * len(names))})",
+        [[get_value(row.get(name)) for name in names] for row in data])
+    return len(data)
+
+  async def update(self, where: Dict[str, Any],
+                   data: Dict[str, Any]) -> Optional[Row]:
+    """Updates row matching unique where and returns it"""
+    sql, params = self.get_where(where)
+    names = list(data)
+    self.client.execute(
+        f"UPDATE {self.model.table} SET "
+        f"{', '.join(f'{name} = ?' for name in names)} WHERE {sql}",
+        [get_value(data[name]) for name in names] + params)
+    return await self.find_unique(where)
+
+  async def delete_many(self, where: Optional[Dict[str, Any]] = None) -> int:
+    """Deletes rows matching where and returns their count"""
+    sql, params = self.get_where(where)
+    return self.client.execute(f"DELETE FROM {self.model.table} WHERE {sql}",
+                               params).rowcount
+
+
+class BatchActions:
+  """Queries of one model recorded by batch instead of being run"""
+
+  def __init__(self, actions: Actions,
+               queries: List[Query]) -> None:
+    self.actions = actions
+    self.queries = queries
+
+  def create_many(self, **kwargs: Any) -> None:
+    """Records create_many"""
+    self.queries.append(functools.partial(self.actions.create_many, **kwargs))
+
+  def update(self, **kwargs: Any) -> None:
+    """Records update"""
+    self.queries.append(functools.partial(self.actions.update, **kwargs))
+
+  def delete_many(self, **kwargs: Any) -> None:
+    """Records delete_many"""
+    self.queries.append(functools.partial(self.actions.delete_many, **kwargs))
+
+
+class Batch:
+  """Queries collected by batch_ and run in one transaction on exit"""
+
+  def __init__(self, client: "SQLiteClient") -> None:
+    self.client = client
+    self.queries: List[Query] = []
+
+  def __getattr__(self, name: str) -> BatchActions:
+    if name.startswith("_") or name not in self.client.models:
+      raise AttributeError(name)
+    return BatchActions(Actions(self.client, self.client.models[name]),
+                        self.queries)
+
+  def execute_raw(self, sql: str, *params: Any) -> None:
+    """Records raw statement"""
+    self.queries.append(functools.partial(self.client.execute_raw, sql,
+                                          *params))
+
+  async def __aenter__(self) -> "Batch":
+    return self
+
+  async def __aexit__(self, exc_type: Any, *args: Any) -> None:
+    if exc_type is not None:
+      return
+    with self.client.transaction():
+      for query in self.queries:
+        await query()
+
+
+class SQLiteClient:
+  """Prisma client stand-in backed by SQLite database at path
+
+  Default path :memory: keeps database only until disconnect.
+  """
+
+  def __init__(self,
+               path: str = ":memory:",
+               schema_path: str = SCHEMA_PATH) -> None:
+    self.path = path
+    with open(schema_path, "r", encoding="utf-8") as file:
+      self.models = parse_schema(file.read())
+    self.queries = 0
+    self._connection: Optional[sqlite3.Connection] = None
+    self._transaction_depth = 0
+
+  def __getattr__(self, name: str) -> Actions:
+    models = self.__dict__.get("models", {})
+    if name not in models:
+      raise AttributeError(name)
+    return Actions(self, models[name])
+
+  async def connect(self) -> None:
+    """Opens database and creates missing tables"""
+    self._connection = sqlite3.connect(self.path, isolation_level=None)
+    self._connection.execute("PRAGMA foreign_keys = ON")
+    tables = {model.name: model.table for model in self.models.values()}
+    for model in self.models.values():
+      for statement in model.get_statements(tables):
+        self._connection.execute(statement)
+
+  async def disconnect(self) -> None:
+    """Closes database"""
+    if self._connection is not None:
+      self._connection.close()
+      self._connection = None
+
+  def is_connected(self) -> bool:
+    """Returns if database is open"""
+    return self._connection is not None
+
+  def execute(self, sql: str, params: Iterable[Any] = ()) -> sqlite3.Cursor:
+    """Runs one statement and counts it as query"""
+    if self._connection is None:
+      raise RuntimeError("Client is not connected")
+    self.queries += 1
+    return self._connection.execute(sql, list(params))
+
+  def execute_many(self, sql: str, rows: List[List[Any]]) -> None:
+    """Runs statement for every row of parameters as one query"""
+    if self._connection is None:
+      raise RuntimeError("Client is not connected")
+    self.queries += 1
+    with self.transaction():
+      self._connection.executemany(sql, rows)
+
+  @contextlib.contextmanager
+  def transaction(self) -> Iterator[None]:
+    """Runs statements in one transaction, nested transactions join it"""
+    if self._connection is None:
+      raise RuntimeError("Client is not connected")
+    if self._transaction_depth == 0:
+      self._connection.execute("BEGIN")
+    self._transaction_depth += 1
+    try:
+      yield
+    except BaseException:
+      self._transaction_depth -= 1
+      if self._transaction_depth == 0:
+        self._connection.execute("ROLLBACK")
+      raise
+    self._transaction_depth -= 1
+    if self._transaction_depth == 0:
+      self._connection.execute("COMMIT")
+
+  def batch_(self) -> Batch:
+    """Returns batch running collected queries in one transaction"""
+    return Batch(self)
+
+  async def query_raw(self, sql: str, *params: Any) -> List[Dict[str, Any]]:
+    """Returns rows of raw query as dicts"""
+    cursor = self.execute(sql, [get_value(param) for param in params])
+    names = [column[0] for column in cursor.description]
+    return [dict(zip(names, values)) for values in cursor.fetchall()]
+
+  async def execute_raw(self, sql: str, *params: Any) -> int:
+    """Runs raw statement, MySQL upsert is run as SQLite upsert"""
+    sql = LEAST_PATTERN.sub("MIN(", sql)
+    match = UPSERT_PATTERN.search(sql)
+    if match is not None:
+      sql = (sql[:match.start()] + "ON CONFLICT DO UPDATE SET" +
+             VALUES_PATTERN.sub(r"excluded.\1", sql[match.end():]))
+    return self.execute(sql, [get_value(param) for param in params]).rowcount
@@ -0,0 +1,64 @@
+"""
+Script compiling assets folder into binary catalog snapshot
+
+Snapshot is read by db/fill_db.py --snapshot and by API when
+CATALOG_SNAPSHOT points to it, see api/snapshot.py.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+from colorama import Fore, Style
+from dotenv import load_dotenv
+
+current = os.path.dirname(os.path.realpath(__file__))
+parent = os.path.dirname(current)
+sys.path.append(parent)
+
+# pylint: disable=wrong-import-position
+from api.snapshot import write_snapshot
+# pylint: enable=wrong-import-position
+
+RED = Fore.RED
+CYAN = Fore.CYAN
+YELLOW = Fore.YELLOW
+RESET_COLOR = Style.RESET_ALL
+
+DEFAULT_SNAPSHOT_PATH = "assets/catalog.snapshot"
+
+
+def get_arguments() -> argparse.Namespace:
+  """Returns parsed command line arguments"""
+  parser = argparse.ArgumentParser(description="Compiles expansions, cards "
+                                   "and card prints from assets folder into "
+                                   "binary catalog snapshot")
+  parser.add_argument("--output",
+                      default=os.getenv("CATALOG_SNAPSHOT")
+                      or DEFAULT_SNAPSHOT_PATH,
+                      help="Path of written snapshot (default: "
+                      f"CATALOG_SNAPSHOT or {DEFAULT_SNAPSHOT_PATH})")
+  return parser.parse_args()
+
+
+def get_data_from_json(path: str) -> dict:
+  """Returns loaded json from provided path"""
+  try:
+    with open(path, "r", encoding="utf-8") as file:
+      return json.load(file)
+  except FileNotFoundError:
+    sys.exit(f"{RED}⚠ {path} not found{RESET_COLOR}")
+
+
+if __name__ == "__main__":
+  load_dotenv()
+  args = get_arguments()
+  start = time.perf_counter()
+  size = write_snapshot(args.output, get_data_from_json("assets/cards.json"),
+                        get_data_from_json("assets/prints.json"),
+                        get_data_from_json("assets/expansions.json"))
+  print(f"{CYAN}🛈 Wrote {YELLOW}{size}{CYAN} bytes to "
+        f"{YELLOW}{args.output}{CYAN} in "
+        f"{YELLOW}{time.perf_counter() - start:.2f}s{RESET_COLOR}")
@@ -0,0 +1,155 @@
+"""
+Script measuring memory footprint of in-memory catalog
+
+Catalog is built from assets folder the way API builds it from database
+and its cards and card prints are measured once as compact records and
+once as plain dicts with lists, the representation API used before.
+"""
+
+import gc
+import json
+import os
+import sys
+from typing import Any, Callable, Dict, List, Tuple
+
+from colorama import Fore, Style
+
+current = os.path.dirname(os.path.realpath(__file__))
+parent = os.path.dirname(current)
+sys.path.append(parent)
+
+# pylint: disable=wrong-import-position
+from api.catalog import Catalog
+from api.records import ATTACK_TYPES, CATEGORIES, CLASSES, LEGALITIES
+from api.records import MANA_COSTS, RARITIES, TYPES, split_values
+# pylint: enable=wrong-import-position
+
+CARD_VOCABULARIES = (CATEGORIES, MANA_COSTS, ATTACK_TYPES, CLASSES, TYPES,
+                     LEGALITIES)
+
+CYAN = Fore.CYAN
+YELLOW = Fore.YELLOW
+RESET_COLOR = Style.RESET_ALL
+
+
+def get_deep_size(root: Any) -> int:
+  """Returns size of object and of all objects reachable from it
+
+  Types and modules are not counted, every object is counted once, so
+  values shared by records are counted once too.
+  """
+  seen = set()
+  size = 0
+  objects = [root]
+  while objects:
+    reachable = []
+    for obj in objects:
+      if id(obj) in seen or isinstance(obj, type):
+        continue
+      seen.add(id(obj))
+      size += sys.getsizeof(obj)
+      reachable.append(obj)
+    objects = [
+        obj for obj in gc.get_referents(*reachable)
+        if not isinstance(obj, type(sys))
+    ]
+  return size
+
+
+def get_rows(path: str) -> Tuple[List[dict], List[dict], List[dict],
+                                  List[dict], List[dict]]:
+  """Returns catalog table rows with ids from assets folder"""
+  with open(os.path.join(path, "cards.json"), encoding="utf-8") as file:
+    cards_json = json.load(file)
+  with open(os.path.join(path, "prints.json"), encoding="utf-8") as file:
+    prints_json = json.load(file)
+  with open(os.path.join(path, "expansions.json"), encoding="utf-8") as file:
+    expansions_json = json.load(file)
+
+  block_sets, expansion_blocks, expansions = [], [], []
+  for block_set, blocks in expansions_json.items():
+    block_sets.append({"id": len(block_sets) + 1, "name": block_set})
+    for expansion_block, names in blocks.items():
+      expansion_blocks.append({
+          "id": len(expansion_blocks) + 1,
+          "name": expansion_block,
+          "block_set_id": len(block_sets),
+      })
+      for name in names:
+        expansions.append({
+            "id": len(expansions) + 1,
+            "name": name,
+            "expansion_block_id": len(expansion_blocks),
+        })
+
+  cards = []
+  for name, card in cards_json.items():
+    cards.append({
+        "id": len(cards) + 1,
+        "name": name,
+        "category": card["card_category"],
+        "mana_cost": card["card_mana_cost"],
+        "classes": ",".join(card["card_classes"]) or None,
+        "types": ",".join(card["card_types"]) or None,
+        "attack_type": card["card_attack_type"],
+        "legalities": ",".join(card["card_legalities"]) or None,
+    })
+  card_ids = {card["name"]: card["id"] for card in cards}
+  expansion_ids = {
+      expansion["name"]: expansion["id"] for expansion in expansions
+  }
+  card_prints = []
+  for card_print in prints_json:
+    expansion_id = expansion_ids.get(card_print["card_print_expansion_name"])
+    if expansion_id is None or card_print["card_name"] not in card_ids:
+      continue
+    card_prints.append({
+        "id": len(card_prints) + 1,
+        "card_id": card_ids[card_print["card_name"]],
+        "expansion_id": expansion_id,
+        "id_in_expansion": int(card_print["card_print_id_in_exapansion"]),
+        "rarity": card_print["card_print_rarity"],
+        "text_front": card_print["card_print_text_front"],
+        "text_back": card_print["card_print_text_back"],
+    })
+  return block_sets, expansion_blocks, expansions, cards, card_prints
+
+
+def get_dict_card(row: dict) -> dict:
+  """Returns card as dict with lists, as catalog held it before records"""
+  card = dict(row)
+  for column in ("classes", "types", "legalities"):
+    card[column] = list(split_values(row[column]))
+  return card
+
+
+def print_report(name: str, count: int, sizes: Dict[str, int]) -> None:
+  """Prints size of both representations of count records"""
+  print(f"{CYAN}{name} ({YELLOW}{count}{CYAN}):{RESET_COLOR}")
+  for representation, size in sizes.items():
+    print(f"{CYAN}  {representation:<8} {YELLOW}{size / 1024:>9.1f} KiB"
+          f"{CYAN}, {YELLOW}{size / count:>6.1f}{CYAN} B per record"
+          f"{RESET_COLOR}")
+  print(f"{CYAN}  records take {YELLOW}"
+        f"{sizes['records'] / sizes['dicts']:.0%}{CYAN} of dicts"
+        f"{RESET_COLOR}")
+
+
+def copy_rows(rows: List[dict], get_row: Callable[[dict], dict]) -> list:
+  """Returns rows with own copies of strings, like rows read from database"""
+  return [get_row(row) for row in json.loads(json.dumps(rows))]
+
+
+if __name__ == "__main__":
+  rows = get_rows(os.path.join(parent, "assets"))
+  catalog = Catalog(*rows)
+  print_report(
+      "Cards", len(catalog.cards), {
+          "dicts": get_deep_size(copy_rows(rows[3], get_dict_card)),
+          "records": get_deep_size([catalog.cards, CARD_VOCABULARIES]),
+      })
+  print_report(
+      "Card prints", len(catalog.card_prints), {
+          "dicts": get_deep_size(copy_rows(rows[4], dict)),
+          "records": get_deep_size([catalog.card_prints, RARITIES]),
+      })
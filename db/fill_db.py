@@ -1,158 +1,696 @@
-"""
-Database fill script for wowtcg-tracker-api
-
-Script is used to fill database with all cards and extensions details
-"""
-import asyncio
-import json
-import os
-import sys
-
-from typing import Any
-from colorama import Fore, Style
-from dotenv import load_dotenv
-
-from prisma import Prisma
-from progressbar import progressbar
-
-current = os.path.dirname(os.path.realpath(__file__))
-parent = os.path.dirname(current)
-sys.path.append(parent)
-
-from api import database  # pylint: disable=wrong-import-position
-
-RED = Fore.RED
-GREEN = Fore.GREEN
-CYAN = Fore.CYAN
-MAGENTA = Fore.MAGENTA
-YELLOW = Fore.YELLOW
-RESET_COLOR = Style.RESET_ALL
-
-
-def print_section_end() -> None:
-  """Prints a long line to separate sections in terminal"""
-  print(MAGENTA + "=" * 70 + RESET_COLOR)
-
-
-def get_data_from_json(path: str) -> Any:
-  """Returns loaded json from provided path"""
-  try:
-    with open(path, "r", encoding="utf-8") as file:
-      return json.load(file)
-  except FileNotFoundError:
-    sys.exit(f"{RED}⚠ {path} not found{RESET_COLOR}")
-
-
-if __name__ == "__main__":
-  ###
-  # Load environment variables from .env file
-  ###
-
-  load_dotenv()
-
-  ###
-  # Ask user if he wants to delete all data from database
-  ###
-
-  print(f"{MAGENTA}ᓚᕬᗢ Wowtcg-tracker-api "
-        f"db fill script ᗢᕬᓗ{RESET_COLOR}")
-  print(f"{YELLOW}⚠ This script will delete all data in database "
-        f"and import data from assets folder{RESET_COLOR}")
-  to_continue = input(
-      f"{YELLOW}⚠ Do you want to continue? [Y/n]:{RESET_COLOR} ")
-  if to_continue.lower() == "n":
-    sys.exit(0)
-  db = Prisma()
-  print_section_end()
-
-  ###
-  # Import data from assets folder
-  ###
-
-  print(f"{CYAN}🛈 Importing data from assets folder...{RESET_COLOR}")
-  cards = get_data_from_json("assets/cards.json")
-  card_prints = get_data_from_json("assets/prints.json")
-  expansions_dict = get_data_from_json("assets/expansions.json")
-  block_sets_count = len(expansions_dict)
-  expansion_blocks_count = len([
-      expansion_block for block_set in expansions_dict.values()
-      for expansion_block in block_set.values()
-  ])
-  expansions_count = len([
-      expansion for block_set in expansions_dict.values()
-      for expansion_block in block_set.values() for expansion in expansion_block
-  ])
-
-  print(f"{CYAN}Imported {YELLOW}{len(card_prints)}{CYAN}"
-        f" card prints of {YELLOW}{len(cards)}{CYAN}"
-        f" cards{RESET_COLOR}")
-  print(f"{CYAN}Imported {YELLOW}{expansions_count}{CYAN}"
-        f" expansions from {YELLOW}{expansion_blocks_count}{CYAN}"
-        f" blocks of {YELLOW}{block_sets_count}{CYAN}"
-        f" sets{RESET_COLOR}")
-  print_section_end()
-
-  ###
-  # Delete old data
-  ###
-  print(f"{CYAN}🛈 Deleting old sets from database{RESET_COLOR}")
-  deleted_sets_count = asyncio.run(database.delete_all_block_sets(db=db))
-  print(f"{CYAN}🛈 Deleted {YELLOW}{deleted_sets_count}{CYAN}"
-        f" old set{'' if deleted_sets_count == 1 else 's'}{RESET_COLOR}")
-  print(f"{CYAN}🛈 Deleting old cards from database{RESET_COLOR}")
-  deleted_cards_count = asyncio.run(database.delete_all_cards(db=db))
-  print(f"{CYAN}🛈 Deleted {YELLOW}{deleted_cards_count}{CYAN}"
-        f" old card{'' if deleted_cards_count == 1 else 's'}{RESET_COLOR}")
-  print_section_end()
-
-  ###
-  # Insert new data
-  ###
-  for block_set in expansions_dict:
-    print(f"{CYAN}🛈 Inserting new set "
-          f"{YELLOW}{block_set}{RESET_COLOR}")
-    tmp_block_set = asyncio.run(database.add_block_set(db=db, name=block_set))
-    for expansion_block in progressbar(expansions_dict[block_set], block_set,
-                                       "block"):
-      tmp_expansion_block = asyncio.run(
-          database.add_expansion_block(db=db,
-                                       name=expansion_block,
-                                       block_set_id=tmp_block_set.id))
-      for expansion in expansions_dict[block_set][expansion_block]:
-        asyncio.run(
-            database.add_expansion(db=db,
-                                   name=expansion,
-                                   expansion_block_id=tmp_expansion_block.id))
-
-  for card in progressbar(cards, suffix="Card"):
-    asyncio.run(
-        database.add_card(
-            db=db,
-            name=card,
-            category=cards[card]["card_category"],
-            mana_cost=cards[card]["card_mana_cost"],
-            classes=cards[card]["card_classes"],
-            types=cards[card]["card_types"],
-            attack_type=cards[card]["card_attack_type"],
-            legalities=cards[card]["card_legalities"],
-        ))
-  for card_print in progressbar(card_prints, suffix="Card print"):
-    card_id = asyncio.run(db.card.find_unique(where={"name": card_print["card_name"]}))
-    if not card_id:
-      print(f"{RED}⚠ An error occurred while inserting card print")
-      print(f"{RED}⚠ Card {YELLOW}{card_print['card_name']}{RED} not found in database{RESET_COLOR}")
-    expansion_id = asyncio.run(db.expansion.find_unique(where={"name": card_print["card_print_expansion_name"]}))
-    if not expansion_id:
-      print(f"{RED}⚠ An error occurred while inserting card print")
-      print(f"{RED}⚠ Expansion {YELLOW}{card_print['card_print_expansion_name']}{RED} not found in database{RESET_COLOR}")
-    asyncio.run(
-        database.add_card_print(
-            db=db,
-            card_id=card_id,
-            expansion_id=expansion_id,
-            rarity=card_print["card_print_rarity"],
-            text_front=card_print["card_print_text_front"],
-            text_back=card_print["card_print_text_back"]))
-
-  print_section_end()
-  print(f"{GREEN}🛈 Done!{RESET_COLOR}")
+"""
+Database fill script for wowtcg-tracker-api
+
+Script is used to fill database with all cards and extensions details.
+Tables are filled in stages ordered by their dependencies, stages which
+do not depend on each other (like cards and expansions) run concurrently.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+import urllib.error
+import urllib.request
+
+from collections import Counter
+from typing import Any, Awaitable, Callable, Dict, List, NamedTuple
+from typing import Optional, Set, Tuple
+from colorama import Fore, Style
+from dotenv import load_dotenv
+
+from prisma import Prisma
+
+current = os.path.dirname(os.path.realpath(__file__))
+parent = os.path.dirname(current)
+sys.path.append(parent)
+
+# pylint: disable=wrong-import-position
+from api import database
+from api.catalog import get_content_hash
+from api.snapshot import Snapshot
+from progressbar import StageProgress
+# pylint: enable=wrong-import-position
+
+RED = Fore.RED
+GREEN = Fore.GREEN
+CYAN = Fore.CYAN
+MAGENTA = Fore.MAGENTA
+YELLOW = Fore.YELLOW
+RESET_COLOR = Style.RESET_ALL
+
+DEFAULT_BATCH_SIZE = 1000
+
+# Prisma table name: (database table name, natural key columns)
+CATALOG_TABLES = {
+    "blockset": ("block_set", ("name",)),
+    "expansionblock": ("expansion_block", ("name",)),
+    "expansion": ("expansion", ("name",)),
+    "card": ("card", ("name",)),
+    "cardprint": ("card_print", ("card_id", "expansion_id", "id_in_expansion")),
+}
+# Card prints which decks and users reference without cascading deletes
+REFERENCED_CARD_PRINTS = ("SELECT hero_card_print_id FROM deck UNION "
+                          "SELECT card_print_id FROM user_has_card_print")
+# Prisma table name: query of ids of rows whose deletion would delete
+# referenced card prints
+BLOCKED_ID_QUERIES = {
+    "blockset":
+        "SELECT DISTINCT expansion_block.block_set_id AS id "
+        "FROM expansion_block "
+        "JOIN expansion ON expansion.expansion_block_id = expansion_block.id "
+        "JOIN card_print ON card_print.expansion_id = expansion.id "
+        f"WHERE card_print.id IN ({REFERENCED_CARD_PRINTS})",
+    "expansionblock":
+        "SELECT DISTINCT expansion.expansion_block_id AS id FROM expansion "
+        "JOIN card_print ON card_print.expansion_id = expansion.id "
+        f"WHERE card_print.id IN ({REFERENCED_CARD_PRINTS})",
+    "expansion":
+        "SELECT DISTINCT expansion_id AS id FROM card_print "
+        f"WHERE id IN ({REFERENCED_CARD_PRINTS})",
+    "card":
+        "SELECT DISTINCT card_id AS id FROM card_print "
+        f"WHERE id IN ({REFERENCED_CARD_PRINTS})",
+    "cardprint":
+        f"SELECT id FROM card_print WHERE id IN ({REFERENCED_CARD_PRINTS})",
+}
+
+
+def print_section_end() -> None:
+  """Prints a long line to separate sections in terminal"""
+  print(MAGENTA + "=" * 70 + RESET_COLOR)
+
+
+def get_data_from_json(path: str) -> Any:
+  """Returns loaded json from provided path"""
+  try:
+    with open(path, "r", encoding="utf-8") as file:
+      return json.load(file)
+  except FileNotFoundError:
+    sys.exit(f"{RED}⚠ {path} not found{RESET_COLOR}")
+
+
+def get_arguments() -> argparse.Namespace:
+  """Returns parsed command line arguments"""
+  parser = argparse.ArgumentParser(description="Fills database with "
+                                   "expansions, cards and card prints "
+                                   "from assets folder")
+  parser.add_argument("--batch-size",
+                      type=int,
+                      default=DEFAULT_BATCH_SIZE,
+                      help="Number of rows sent in one insert query "
+                      f"(default: {DEFAULT_BATCH_SIZE})")
+  parser.add_argument("--concurrency",
+                      type=int,
+                      default=database.get_pool_size(),
+                      help="Max number of stages running at once "
+                      "(default: DATABASE_POOL_SIZE)")
+  parser.add_argument("--sync",
+                      action="store_true",
+                      help="Only create, update and delete rows which "
+                      "differ from assets instead of replacing all data")
+  parser.add_argument("--snapshot",
+                      metavar="PATH",
+                      help="Read assets from snapshot built by "
+                      "db/build_snapshot.py instead of json files")
+  arguments = parser.parse_args()
+  if arguments.batch_size < 1:
+    parser.error("--batch-size must be a positive number")
+  if arguments.concurrency < 1:
+    parser.error("--concurrency must be a positive number")
+  return arguments
+
+
+def join_values(values: Optional[List[str]]) -> Optional[str]:
+  """Returns list of values joined the way MySQL stores SET columns"""
+  if not values:
+    return None
+  return ",".join(values)
+
+
+class Stage(NamedTuple):
+  """Step of fill which runs once all stages it depends on are done
+
+  run gets results of stages it depends on keyed by their names and
+  returns its own result with summary shown in its progress line.
+  """
+  name: str
+  run: Callable[[Dict[str, Any]], Awaitable[Tuple[Any, str]]]
+  depends_on: Tuple[str, ...] = ()
+
+
+async def run_stages(
+    stages: List[Stage],
+    concurrency: int,
+    progress: Optional[StageProgress] = None) -> Dict[str, Any]:
+  """Runs every stage once its dependencies are done and returns results
+
+  At most concurrency stages run at once. Stages have to be listed after
+  stages they depend on, so dependencies can not form a cycle. If any
+  stage fails, all other stages are cancelled.
+  """
+  listed = set()
+  for stage in stages:
+    unknown = [name for name in stage.depends_on if name not in listed]
+    if unknown:
+      raise ValueError(f"Stage {stage.name} depends on "
+                       f"{', '.join(unknown)} not listed before it")
+    listed.add(stage.name)
+  if progress is None:
+    progress = StageProgress([stage.name for stage in stages])
+  semaphore = asyncio.Semaphore(concurrency)
+  tasks: Dict[str, asyncio.Future] = {}
+
+  async def run_stage(stage: Stage) -> Any:
+    results = {name: await tasks[name] for name in stage.depends_on}
+    async with semaphore:
+      progress.start(stage.name)
+      try:
+        result, summary = await stage.run(results)
+      except BaseException:
+        progress.fail(stage.name)
+        raise
+      progress.finish(stage.name, summary)
+    return result
+
+  for stage in stages:
+    tasks[stage.name] = asyncio.ensure_future(run_stage(stage))
+  try:
+    await asyncio.gather(*tasks.values())
+  except BaseException:
+    for task in tasks.values():
+      task.cancel()
+    await asyncio.gather(*tasks.values(), return_exceptions=True)
+    raise
+  return {name: task.result() for name, task in tasks.items()}
+
+
+def get_insert_summary(count: int, elapsed: float) -> str:
+  """Returns how many rows were inserted and how fast"""
+  rate = count / elapsed if elapsed > 0 else 0
+  return (f"{YELLOW}{count}{CYAN} rows inserted "
+          f"({YELLOW}{rate:.0f}{CYAN} rows/s)")
+
+
+async def insert_rows(db: Prisma, table: str, rows: List[dict],
+                      batch_size: int) -> str:
+  """Inserts rows into table in batches and returns insert speed summary"""
+  start = time.perf_counter()
+  count = await database.add_many(db=db,
+                                  table=table,
+                                  rows=rows,
+                                  batch_size=batch_size)
+  return get_insert_summary(count, time.perf_counter() - start)
+
+
+async def get_ids_by_name(db: Prisma, table: str) -> Dict[str, int]:
+  """Returns dictionary of row ids keyed by row name"""
+  rows = await getattr(db, table).find_many()
+  return {row.name: row.id for row in rows}
+
+
+def add_content_hash(row: dict) -> dict:
+  """Returns row with content_hash computed from all of its values"""
+  row["content_hash"] = get_content_hash(row)
+  return row
+
+
+def get_block_set_rows(expansions_dict: dict) -> List[dict]:
+  """Returns block set rows from expansions json"""
+  return [
+      add_content_hash({"name": block_set}) for block_set in expansions_dict
+  ]
+
+
+def get_expansion_block_rows(expansions_dict: dict,
+                             block_set_ids: Dict[str, int]) -> List[dict]:
+  """Returns expansion block rows from expansions json"""
+  rows = []
+  for block_set, expansion_blocks in expansions_dict.items():
+    for expansion_block in expansion_blocks:
+      rows.append(
+          add_content_hash({
+              "name": expansion_block,
+              "block_set_id": block_set_ids[block_set],
+          }))
+  return rows
+
+
+def get_expansion_rows(expansions_dict: dict,
+                       expansion_block_ids: Dict[str, int]) -> List[dict]:
+  """Returns expansion rows from expansions json"""
+  rows = []
+  for expansion_blocks in expansions_dict.values():
+    for expansion_block, expansions in expansion_blocks.items():
+      for expansion in expansions:
+        rows.append(
+            add_content_hash({
+                "name": expansion,
+                "expansion_block_id": expansion_block_ids[expansion_block],
+            }))
+  return rows
+
+
+def get_card_rows(cards: dict) -> List[dict]:
+  """Returns card rows from cards json"""
+  return [
+      add_content_hash({
+          "name": card,
+          "category": cards[card]["card_category"],
+          "mana_cost": cards[card]["card_mana_cost"],
+          "classes": join_values(cards[card]["card_classes"]),
+          "types": join_values(cards[card]["card_types"]),
+          "attack_type": cards[card]["card_attack_type"],
+          "legalities": join_values(cards[card]["card_legalities"]),
+      }) for card in cards
+  ]
+
+
+def get_card_print_rows(
+    card_prints: list, card_ids: Dict[str, int], expansion_ids: Dict[str, int]
+) -> Tuple[List[dict], Dict[str, Counter], Counter]:
+  """Returns card print rows with resolved ids and names that failed to resolve
+
+  Unresolved names are counted by how many card prints reference them.
+  Only first card print of every natural key is returned, later ones are
+  counted as duplicates by card name, expansion name and id in expansion.
+  """
+  rows = []
+  unresolved = {"card": Counter(), "expansion": Counter()}
+  duplicates: Counter = Counter()
+  keys = set()
+  for card_print in card_prints:
+    card_id = card_ids.get(card_print["card_name"])
+    expansion_id = expansion_ids.get(card_print["card_print_expansion_name"])
+    if card_id is None:
+      unresolved["card"][card_print["card_name"]] += 1
+    if expansion_id is None:
+      unresolved["expansion"][card_print["card_print_expansion_name"]] += 1
+    if card_id is None or expansion_id is None:
+      continue
+    id_in_expansion = int(card_print["card_print_id_in_exapansion"])
+    key = (card_id, expansion_id, id_in_expansion)
+    if key in keys:
+      duplicates[(card_print["card_name"],
+                  card_print["card_print_expansion_name"],
+                  id_in_expansion)] += 1
+      continue
+    keys.add(key)
+    rows.append(
+        add_content_hash({
+            "card_id": card_id,
+            "expansion_id": expansion_id,
+            "id_in_expansion": id_in_expansion,
+            "rarity": card_print["card_print_rarity"],
+            "text_front": card_print["card_print_text_front"],
+            "text_back": card_print["card_print_text_back"],
+        }))
+  return rows, unresolved, duplicates
+
+
+def print_unresolved_report(unresolved: Dict[str, Counter],
+                            skipped_count: int) -> None:
+  """Prints summary of names card prints reference but which do not exist"""
+  if not skipped_count:
+    return
+  print_section_end()
+  print(f"{RED}⚠ Skipped {YELLOW}{skipped_count}{RED} card print"
+        f"{'' if skipped_count == 1 else 's'} with unresolved names"
+        f"{RESET_COLOR}")
+  for table, names in unresolved.items():
+    for name, count in sorted(names.items()):
+      print(f"{RED}⚠ {table.capitalize()} {YELLOW}{name}{RED} not found, "
+            f"referenced by {YELLOW}{count}{RED} card print"
+            f"{'' if count == 1 else 's'}{RESET_COLOR}")
+
+
+def print_duplicate_report(duplicates: Counter) -> None:
+  """Prints card prints skipped since their natural key was already used"""
+  if not duplicates:
+    return
+  print_section_end()
+  for (card, expansion, id_in_expansion), count in sorted(duplicates.items()):
+    print(f"{RED}⚠ Skipped {YELLOW}{count}{RED} duplicate"
+          f"{'' if count == 1 else 's'} of card print {YELLOW}{card}{RED} "
+          f"#{YELLOW}{id_in_expansion}{RED} of {YELLOW}{expansion}"
+          f"{RESET_COLOR}")
+
+
+def get_sync_summary(counts: Dict[str, int]) -> str:
+  """Returns how many rows were created, updated and deleted"""
+  return ", ".join(
+      f"{YELLOW}{count}{CYAN} {action}" for action, count in counts.items())
+
+
+async def get_stored_hashes(
+    db: Prisma, table: str) -> Tuple[Dict[tuple, Tuple[int, str]], int]:
+  """Returns ids and content hashes of stored rows keyed by natural key
+
+  Rows whose natural key is taken by row with lower id, stored before
+  natural keys were unique, are not returned but counted.
+  """
+  sql_table, key_columns = CATALOG_TABLES[table]
+  rows = await db.query_raw(f"SELECT id, {', '.join(key_columns)}, "
+                            f"content_hash FROM {sql_table} ORDER BY id")
+  stored = {}
+  duplicates = 0
+  for row in rows:
+    key = tuple(row[column] for column in key_columns)
+    if key in stored:
+      duplicates += 1
+    else:
+      stored[key] = (row["id"], row["content_hash"])
+  return stored, duplicates
+
+
+async def get_blocked_ids(db: Prisma, table: str) -> Set[int]:
+  """Returns ids of rows which can not be deleted from table
+
+  Deleting them would delete, directly or by cascade, card prints which
+  are deck heroes or owned by users.
+  """
+  rows = await db.query_raw(BLOCKED_ID_QUERIES[table])
+  return {row["id"] for row in rows}
+
+
+async def sync_rows(db: Prisma, table: str, rows: List[dict],
+                    batch_size: int) -> Tuple[Dict[tuple, int], str]:
+  """Makes table match rows and returns row ids keyed by natural key
+
+  Rows are matched with stored rows by natural key, only rows whose
+  content hash differs are written and stored rows without a match
+  are deleted. Summary of created, updated and deleted rows is returned
+  with the ids. Stored rows duplicating natural key of another row and
+  vanished rows still referenced by decks or users are left untouched
+  and counted in summary. Deletes and updates run in one transaction.
+  """
+  key_columns = CATALOG_TABLES[table][1]
+  stored, duplicates = await get_stored_hashes(db, table)
+  unmatched = dict(stored)
+  created_rows = {}
+  changed_rows = {}
+  for row in rows:
+    key = tuple(row[column] for column in key_columns)
+    if key not in unmatched:
+      if key not in stored:
+        created_rows[key] = row
+      continue
+    row_id, content_hash = unmatched.pop(key)
+    if content_hash != row["content_hash"]:
+      changed_rows[row_id] = row
+  vanished_ids = {row_id for row_id, _ in unmatched.values()}
+  blocked_ids = set()
+  if vanished_ids:
+    blocked_ids = vanished_ids & await get_blocked_ids(db, table)
+    vanished_ids -= blocked_ids
+
+  if vanished_ids or changed_rows:
+    async with db.batch_() as batcher:
+      actions = getattr(batcher, table)
+      if vanished_ids:
+        actions.delete_many(where={"id": {"in": list(vanished_ids)}})
+      for row_id, row in changed_rows.items():
+        actions.update(where={"id": row_id}, data=row)
+  counts = {
+      "created": len(created_rows),
+      "updated": len(changed_rows),
+      "deleted": len(vanished_ids),
+      "unchanged": (len(stored) - len(changed_rows) - len(vanished_ids) -
+                    len(blocked_ids)),
+  }
+  if blocked_ids:
+    counts["blocked"] = len(blocked_ids)
+  if duplicates:
+    counts["duplicated"] = duplicates
+  if created_rows:
+    await database.add_many(db=db,
+                            table=table,
+                            rows=list(created_rows.values()),
+                            batch_size=batch_size)
+    stored, _ = await get_stored_hashes(db, table)
+
+  return {
+      key: row_id
+      for key, (row_id, _) in stored.items()
+      if row_id not in vanished_ids
+  }, get_sync_summary(counts)
+
+
+def get_ids_by_key_name(ids_by_key: Dict[tuple, int]) -> Dict[str, int]:
+  """Returns ids keyed by name from ids keyed by (name,) natural key"""
+  return {key[0]: row_id for key, row_id in ids_by_key.items()}
+
+
+def request_catalog_reload() -> None:
+  """Asks running API to reload its catalog if CATALOG_RELOAD_URL is set"""
+  url = os.getenv("CATALOG_RELOAD_URL")
+  if not url:
+    return
+  request = urllib.request.Request(
+      url,
+      method="POST",
+      headers={"X-Reload-Token": os.getenv("CATALOG_RELOAD_TOKEN", "")})
+  try:
+    with urllib.request.urlopen(request, timeout=60):
+      print(f"{CYAN}🛈 API catalog reloaded{RESET_COLOR}")
+  except (urllib.error.URLError, OSError) as error:
+    print(f"{YELLOW}⚠ Could not reload API catalog: {error}{RESET_COLOR}")
+
+
+async def delete_rows(db: Prisma, table: str) -> Tuple[None, str]:
+  """Deletes all rows of table and returns summary of deleted rows"""
+  count = await getattr(db, table).delete_many()
+  return None, f"{YELLOW}{count}{CYAN} rows deleted"
+
+
+def get_fill_stages(db: Prisma, cards: dict, card_prints: list,
+                    expansions_dict: dict, batch_size: int) -> List[Stage]:
+  """Returns stages replacing all catalog data
+
+  Card prints are deleted first, so deleting block sets and cards does
+  not cascade into the same rows concurrently. Expansion hierarchy and
+  cards are then inserted independently of each other and card prints
+  once both are done.
+  """
+
+  async def insert_block_sets(_: Dict[str, Any]) -> Tuple[Any, str]:
+    summary = await insert_rows(db, "blockset",
+                                get_block_set_rows(expansions_dict),
+                                batch_size)
+    return await get_ids_by_name(db, "blockset"), summary
+
+  async def insert_expansion_blocks(results: Dict[str, Any]) -> Tuple[Any, str]:
+    summary = await insert_rows(
+        db, "expansionblock",
+        get_expansion_block_rows(expansions_dict, results["block sets"]),
+        batch_size)
+    return await get_ids_by_name(db, "expansionblock"), summary
+
+  async def insert_expansions(results: Dict[str, Any]) -> Tuple[Any, str]:
+    summary = await insert_rows(
+        db, "expansion",
+        get_expansion_rows(expansions_dict, results["expansion blocks"]),
+        batch_size)
+    return await get_ids_by_name(db, "expansion"), summary
+
+  async def insert_cards(_: Dict[str, Any]) -> Tuple[Any, str]:
+    summary = await insert_rows(db, "card", get_card_rows(cards), batch_size)
+    return await get_ids_by_name(db, "card"), summary
+
+  async def insert_card_prints(results: Dict[str, Any]) -> Tuple[Any, str]:
+    rows, unresolved, duplicates = get_card_print_rows(
+        card_prints, results["cards"], results["expansions"])
+    summary = await insert_rows(db, "cardprint", rows, batch_size)
+    skipped_count = len(card_prints) - len(rows) - sum(duplicates.values())
+    return (unresolved, skipped_count, duplicates), summary
+
+  return [
+      Stage("delete prints", lambda _: delete_rows(db, "cardprint")),
+      Stage("delete sets", lambda _: delete_rows(db, "blockset"),
+            ("delete prints",)),
+      Stage("delete cards", lambda _: delete_rows(db, "card"),
+            ("delete prints",)),
+      Stage("block sets", insert_block_sets, ("delete sets",)),
+      Stage("expansion blocks", insert_expansion_blocks, ("block sets",)),
+      Stage("expansions", insert_expansions, ("expansion blocks",)),
+      Stage("cards", insert_cards, ("delete cards",)),
+      Stage("card prints", insert_card_prints, ("cards", "expansions")),
+  ]
+
+
+def get_sync_stages(db: Prisma, cards: dict, card_prints: list,
+                    expansions_dict: dict, batch_size: int) -> List[Stage]:
+  """Returns stages making catalog data match assets
+
+  Expansion hierarchy and cards are synced independently of each other
+  and card prints once both are done.
+  """
+
+  async def sync_block_sets(_: Dict[str, Any]) -> Tuple[Any, str]:
+    ids, summary = await sync_rows(db, "blockset",
+                                   get_block_set_rows(expansions_dict),
+                                   batch_size)
+    return get_ids_by_key_name(ids), summary
+
+  async def sync_expansion_blocks(results: Dict[str, Any]) -> Tuple[Any, str]:
+    ids, summary = await sync_rows(
+        db, "expansionblock",
+        get_expansion_block_rows(expansions_dict, results["block sets"]),
+        batch_size)
+    return get_ids_by_key_name(ids), summary
+
+  async def sync_expansions(results: Dict[str, Any]) -> Tuple[Any, str]:
+    ids, summary = await sync_rows(
+        db, "expansion",
+        get_expansion_rows(expansions_dict, results["expansion blocks"]),
+        batch_size)
+    return get_ids_by_key_name(ids), summary
+
+  async def sync_cards(_: Dict[str, Any]) -> Tuple[Any, str]:
+    ids, summary = await sync_rows(db, "card", get_card_rows(cards),
+                                   batch_size)
+    return get_ids_by_key_name(ids), summary
+
+  async def sync_card_prints(results: Dict[str, Any]) -> Tuple[Any, str]:
+    rows, unresolved, duplicates = get_card_print_rows(
+        card_prints, results["cards"], results["expansions"])
+    _, summary = await sync_rows(db, "cardprint", rows, batch_size)
+    skipped_count = len(card_prints) - len(rows) - sum(duplicates.values())
+    return (unresolved, skipped_count, duplicates), summary
+
+  return [
+      Stage("block sets", sync_block_sets),
+      Stage("expansion blocks", sync_expansion_blocks, ("block sets",)),
+      Stage("expansions", sync_expansions, ("expansion blocks",)),
+      Stage("cards", sync_cards),
+      Stage("card prints", sync_card_prints, ("cards", "expansions")),
+  ]
+
+
+async def fill_database(db: Prisma,
+                        cards: dict,
+                        card_prints: list,
+                        expansions_dict: dict,
+                        batch_size: int,
+                        concurrency: Optional[int] = None) -> None:
+  """Replaces all catalog data in database
+
+  At most concurrency stages (database pool size by default) run at once.
+  """
+  await db.connect()
+  try:
+    results = await run_stages(
+        get_fill_stages(db, cards, card_prints, expansions_dict, batch_size),
+        concurrency or database.get_pool_size())
+  finally:
+    await db.disconnect()
+  unresolved, skipped_count, duplicates = results["card prints"]
+  print_unresolved_report(unresolved, skipped_count)
+  print_duplicate_report(duplicates)
+
+
+async def sync_database(db: Prisma,
+                        cards: dict,
+                        card_prints: list,
+                        expansions_dict: dict,
+                        batch_size: int,
+                        concurrency: Optional[int] = None) -> None:
+  """Updates catalog data in database to match assets
+
+  Rows which did not change are left untouched, so collections and decks
+  referencing them keep their data. At most concurrency stages (database
+  pool size by default) run at once.
+  """
+  await db.connect()
+  try:
+    results = await run_stages(
+        get_sync_stages(db, cards, card_prints, expansions_dict, batch_size),
+        concurrency or database.get_pool_size())
+  finally:
+    await db.disconnect()
+  unresolved, skipped_count, duplicates = results["card prints"]
+  print_unresolved_report(unresolved, skipped_count)
+  print_duplicate_report(duplicates)
+
+
+if __name__ == "__main__":
+  args = get_arguments()
+
+  ###
+  # Load environment variables from .env file
+  ###
+
+  load_dotenv()
+
+  ###
+  # Ask user if he wants to delete all data from database
+  ###
+
+  print(f"{MAGENTA}ᓚᕬᗢ Wowtcg-tracker-api "
+        f"db fill script ᗢᕬᓗ{RESET_COLOR}")
+  if args.sync:
+    print(f"{YELLOW}⚠ This script will update data in database "
+          f"to match data from assets folder{RESET_COLOR}")
+  else:
+    print(f"{YELLOW}⚠ This script will delete all data in database "
+          f"and import data from assets folder{RESET_COLOR}")
+  to_continue = input(
+      f"{YELLOW}⚠ Do you want to continue? [Y/n]:{RESET_COLOR} ")
+  if to_continue.lower() == "n":
+    sys.exit(0)
+  prisma_client = database.create_client()
+  print_section_end()
+
+  ###
+  # Import data from assets folder
+  ###
+
+  print(f"{CYAN}🛈 Importing data from assets folder...{RESET_COLOR}")
+  if args.snapshot:
+    try:
+      with Snapshot(args.snapshot) as assets_snapshot:
+        imported_cards, imported_card_prints, imported_expansions = (
+            assets_snapshot.get_assets())
+    except (OSError, ValueError) as error:
+      sys.exit(f"{RED}⚠ {error}{RESET_COLOR}")
+  else:
+    imported_cards = get_data_from_json("assets/cards.json")
+    imported_card_prints = get_data_from_json("assets/prints.json")
+    imported_expansions = get_data_from_json("assets/expansions.json")
+  block_sets_count = len(imported_expansions)
+  expansion_blocks_count = len([
+      expansion_block for block_set in imported_expansions.values()
+      for expansion_block in block_set.values()
+  ])
+  expansions_count = len([
+      expansion for block_set in imported_expansions.values()
+      for expansion_block in block_set.values() for expansion in expansion_block
+  ])
+
+  print(f"{CYAN}Imported {YELLOW}{len(imported_card_prints)}{CYAN}"
+        f" card prints of {YELLOW}{len(imported_cards)}{CYAN}"
+        f" cards{RESET_COLOR}")
+  print(f"{CYAN}Imported {YELLOW}{expansions_count}{CYAN}"
+        f" expansions from {YELLOW}{expansion_blocks_count}{CYAN}"
+        f" blocks of {YELLOW}{block_sets_count}{CYAN}"
+        f" sets{RESET_COLOR}")
+  print_section_end()
+
+  ###
+  # Replace or sync data in batches
+  ###
+  total_start = time.perf_counter()
+  fill = sync_database if args.sync else fill_database
+  asyncio.run(
+      fill(db=prisma_client,
+           cards=imported_cards,
+           card_prints=imported_card_prints,
+           expansions_dict=imported_expansions,
+           batch_size=args.batch_size,
+           concurrency=args.concurrency))
+
+  request_catalog_reload()
+  print_section_end()
+  print(f"{GREEN}🛈 Done in {time.perf_counter() - total_start:.2f}s!"
+        f"{RESET_COLOR}")
@@ -1,38 +1,105 @@
-"""
-Progress bar module
-
-Bar was made becuase modules providing progress bars use stout
-which makes prisma a bit clunky.
-"""
-
-import sys
-from colorama import Fore, Style
-from typing import Generator
-
-def progressbar(iterable,
-                prefix="",
-                suffix="",
-                print_size=80,
-                file=sys.stdout) -> Generator:
-  """Call in a loop to create terminal progress bar"""
-
-  count = len(iterable)
-  prefix = prefix.ljust(15)
-  suffix += " " if count == 1 else "s"
-  bar_size = print_size - len(prefix) - len(suffix) - 8
-
-  def show(progress: int) -> None:
-    relative_progress = int(bar_size * progress / count)
-    bar = f"{Fore.CYAN}{prefix} |{Fore.YELLOW}"
-    bar += f"{'█' * relative_progress}{'.' * (bar_size - relative_progress)}"
-    bar += f"{Fore.CYAN}| {Fore.YELLOW}{progress}{Fore.CYAN}/{Fore.YELLOW}"
-    bar += f"{count} {Fore.CYAN}{suffix}{Style.RESET_ALL}\r"
-    file.write(bar)
-    file.flush()
-
-  show(0)
-  for i, item in enumerate(iterable):
-    yield item
-    show(i + 1)
-  file.write("\n")
-  file.flush()
+"""
+Progress bar module
+
+Bar was made becuase modules providing progress bars use stout
+which makes prisma a bit clunky. StageProgress shows one line per stage
+of work running concurrently.
+"""
+
+import sys
+import time
+from colorama import Fore, Style
+from typing import Dict, Generator, List, Optional, TextIO
+
+def progressbar(iterable,
+                prefix="",
+                suffix="",
+                print_size=80,
+                file=sys.stdout) -> Generator:
+  """Call in a loop to create terminal progress bar"""
+
+  count = len(iterable)
+  prefix = prefix.ljust(15)
+  suffix += " " if count == 1 else "s"
+  bar_size = print_size - len(prefix) - len(suffix) - 8
+
+  def show(progress: int) -> None:
+    relative_progress = int(bar_size * progress / count)
+    bar = f"{Fore.CYAN}{prefix} |{Fore.YELLOW}"
+    bar += f"{'█' * relative_progress}{'.' * (bar_size - relative_progress)}"
+    bar += f"{Fore.CYAN}| {Fore.YELLOW}{progress}{Fore.CYAN}/{Fore.YELLOW}"
+    bar += f"{count} {Fore.CYAN}{suffix}{Style.RESET_ALL}\r"
+    file.write(bar)
+    file.flush()
+
+  show(0)
+  for i, item in enumerate(iterable):
+    yield item
+    show(i + 1)
+  file.write("\n")
+  file.flush()
+
+
+class StageProgress:
+  """Terminal progress of concurrently running stages, one line per stage
+
+  Lines are redrawn in place when file is a terminal, otherwise every
+  change is written as a new line.
+  """
+
+  def __init__(self,
+               names: List[str],
+               bar_size: int = 20,
+               file: Optional[TextIO] = None) -> None:
+    self.names = names
+    self.prefix_size = max(len(name) for name in names)
+    self.bar_size = bar_size
+    self.file = file or sys.stdout
+    self.redraw = self.file.isatty()
+    self.drawn = False
+    self.states = {name: "waiting" for name in names}
+    self.summaries = {name: "" for name in names}
+    self.starts: Dict[str, float] = {}
+    self.durations: Dict[str, float] = {}
+
+  def start(self, name: str) -> None:
+    """Shows stage as running"""
+    self.starts[name] = time.perf_counter()
+    self.set_state(name, "running")
+
+  def finish(self, name: str, summary: str = "") -> None:
+    """Shows stage as done with its duration and summary"""
+    self.summaries[name] = summary
+    self.durations[name] = time.perf_counter() - self.starts[name]
+    self.set_state(name, "done")
+
+  def fail(self, name: str) -> None:
+    """Shows stage as failed"""
+    self.durations[name] = time.perf_counter() - self.starts[name]
+    self.set_state(name, "failed")
+
+  def get_line(self, name: str) -> str:
+    """Returns progress line of stage"""
+    state = self.states[name]
+    filled = self.bar_size if state == "done" else 0
+    line = f"{Fore.CYAN}{name.ljust(self.prefix_size)} |{Fore.YELLOW}"
+    line += f"{'█' * filled}{'.' * (self.bar_size - filled)}{Fore.CYAN}| "
+    line += f"{Fore.RED if state == 'failed' else Fore.YELLOW}{state}"
+    if name in self.durations:
+      line += f"{Fore.CYAN} in {Fore.YELLOW}{self.durations[name]:.2f}s"
+    if self.summaries[name]:
+      line += f"{Fore.CYAN}, {self.summaries[name]}"
+    return line + Style.RESET_ALL
+
+  def set_state(self, name: str, state: str) -> None:
+    """Changes state of stage and shows it"""
+    self.states[name] = state
+    if not self.redraw:
+      self.file.write(self.get_line(name) + "\n")
+    else:
+      if self.drawn:
+        self.file.write(f"\x1b[{len(self.names)}F")
+      for line_name in self.names:
+        self.file.write(self.get_line(line_name) + "\x1b[K\n")
+      self.drawn = True
+    self.file.flush()
@@ -0,0 +1,158 @@
+"""
+Unit tests for admission control of database operations
+"""
+
+import asyncio
+import unittest
+from unittest import mock
+
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+from api.admission import AdmissionControl, AdmissionMiddleware, Overloaded
+from api.admission import Priority, RequestAdmission, admission, admitted
+from api.admission import handle_overloaded, request_admission
+from api.dependencies import request_priority
+
+admission_app = FastAPI()
+admission_app.add_middleware(AdmissionMiddleware)
+admission_app.add_exception_handler(Overloaded, handle_overloaded)
+admission_server = TestClient(admission_app)
+
+
+@admitted
+async def get_priority() -> str:
+  """Query returning priority of request it runs in"""
+  return request_admission.get().priority.name
+
+
+@admission_app.get("/interactive")
+async def run_interactive() -> dict:
+  """Route running query with default priority"""
+  return {"priority": await get_priority()}
+
+
+@admission_app.get("/bulk",
+                   dependencies=[Depends(request_priority(Priority.BULK))])
+async def run_bulk() -> dict:
+  """Route running bulk query"""
+  return {"priority": await get_priority()}
+
+
+class TestAdmissionControl(unittest.TestCase):
+
+  def test_priority_order(self):
+    control = AdmissionControl(limit=1)
+    order = []
+
+    async def run_operation(name, priority):
+      await control.acquire(priority, sheddable=False)
+      order.append(name)
+      control.release()
+
+    async def run():
+      await control.acquire(Priority.INTERACTIVE, sheddable=False)
+      tasks = [
+          asyncio.ensure_future(run_operation(name, priority))
+          for name, priority in [("bulk", Priority.BULK),
+                                 ("interactive", Priority.INTERACTIVE),
+                                 ("catalog", Priority.CATALOG)]
+      ]
+      await asyncio.sleep(0)
+      self.assertEqual(control.get_stats()["queued"], {
+          "catalog": 1,
+          "interactive": 1,
+          "bulk": 1
+      })
+      control.release()
+      await asyncio.gather(*tasks)
+
+    asyncio.run(run())
+    self.assertEqual(order, ["catalog", "interactive", "bulk"])
+    self.assertEqual(control.in_use, 0)
+
+  def test_full_queue_sheds(self):
+    control = AdmissionControl(limit=1, queue_size=1)
+
+    async def run():
+      await control.acquire(Priority.INTERACTIVE, sheddable=False)
+      bulk = asyncio.ensure_future(control.acquire(Priority.BULK, True))
+      await asyncio.sleep(0)
+      with self.assertRaises(Overloaded) as context:
+        await control.acquire(Priority.BULK, sheddable=True)
+      self.assertEqual(context.exception.reason, "queue_full")
+      # Catalog operation takes place of waiting bulk one
+      catalog = asyncio.ensure_future(control.acquire(Priority.CATALOG, True))
+      await asyncio.sleep(0)
+      with self.assertRaises(Overloaded) as context:
+        await bulk
+      self.assertEqual(context.exception.reason, "evicted")
+      # Operations of admitted requests wait whatever the queue
+      interactive = asyncio.ensure_future(
+          control.acquire(Priority.INTERACTIVE, sheddable=False))
+      control.release()
+      await catalog
+      control.release()
+      await interactive
+      control.release()
+
+    asyncio.run(run())
+    self.assertEqual(control.get_stats()["rejected"], {
+        "queue_full": 1,
+        "evicted": 1
+    })
+    self.assertEqual(control.in_use, 0)
+
+  def test_deadline(self):
+    control = AdmissionControl(limit=1, timeout=0.01)
+
+    async def run():
+      await control.acquire(Priority.INTERACTIVE, sheddable=False)
+      with self.assertRaises(Overloaded) as context:
+        await control.acquire(Priority.INTERACTIVE, sheddable=True)
+      self.assertEqual(context.exception.reason, "timeout")
+      self.assertEqual(control.get_queued(), 0)
+      control.release()
+
+    asyncio.run(run())
+    self.assertEqual(control.in_use, 0)
+
+  def test_only_first_operation_of_request_is_sheddable(self):
+    control = AdmissionControl(limit=1, queue_size=0)
+    state = RequestAdmission()
+
+    async def run():
+      request_admission.set(state)
+      async with control.slot():
+        self.assertTrue(state.admitted)
+        waiting = asyncio.ensure_future(run_operation())
+        await asyncio.sleep(0)
+        self.assertEqual(control.get_queued(), 1)
+      await waiting
+
+    async def run_operation():
+      async with control.slot():
+        pass
+
+    asyncio.run(run())
+    self.assertEqual(control.get_stats()["rejected"], {})
+
+
+class TestAdmissionRoutes(unittest.TestCase):
+
+  def test_route_priority(self):
+    response = admission_server.get("/interactive")
+    self.assertEqual(response.json(), {"priority": "INTERACTIVE"})
+    response = admission_server.get("/bulk")
+    self.assertEqual(response.json(), {"priority": "BULK"})
+
+  def test_rejected_request(self):
+    with mock.patch.object(admission, "limit", 0), mock.patch.object(
+        admission, "queue_size", 0), mock.patch.object(
+            admission, "retry_after", 3):
+      response = admission_server.get("/interactive")
+    self.assertEqual(response.status_code, 503)
+    self.assertEqual(response.headers["Retry-After"], "3")
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,50 @@
+"""
+Unit tests for deck analytics
+"""
+
+import unittest
+
+from api import analytics
+from api.analytics import DeckAnalytics
+from tests.test_catalog import get_test_catalog
+
+
+class TestDeckAnalytics(unittest.TestCase):
+
+  def setUp(self):
+    self.analytics = DeckAnalytics()
+    self.analytics.update(get_test_catalog())
+
+  def test_mana_buckets(self):
+    self.assertEqual(analytics.get_mana_bucket("3"), 3)
+    self.assertEqual(analytics.get_mana_bucket("25"),
+                     analytics.MANA_BUCKETS.index("10+"))
+    self.assertEqual(analytics.get_mana_bucket("2+X"),
+                     analytics.MANA_BUCKETS.index("X"))
+    self.assertEqual(analytics.get_mana_bucket(None), analytics.NO_CODE)
+
+  def test_deck(self):
+    stats = self.analytics.analyse({1: 2, 2: 3, 3: 1})
+    self.assertEqual(stats["cards"], 6)
+    self.assertEqual(stats["mana_curve"]["0"], 3)
+    self.assertEqual(stats["mana_curve"]["1"], 3)
+    self.assertEqual(stats["categories"], {"Ability": 3, "Ally": 3})
+    self.assertEqual(stats["classes"], {"Death Knight": 3})
+    self.assertEqual(stats["types"], {"Frost": 3, "Mage": 3, "Worgen": 3})
+
+  def test_many_decks(self):
+    stats = self.analytics.analyse_many([{1: 1}, {1: 2, 2: 1}])
+    self.assertEqual(stats["cards"], 4)
+    self.assertEqual(stats["categories"], {"Ability": 3, "Ally": 1})
+
+  def test_cache_by_content(self):
+    self.assertEqual(analytics.get_content_hash({1: 2, 2: 1}),
+                     analytics.get_content_hash({2: 1, 1: 2}))
+    stats = self.analytics.analyse({1: 2, 2: 1})
+    self.assertIs(self.analytics.analyse({2: 1, 1: 2}), stats)
+    self.analytics.update(get_test_catalog())
+    self.assertIsNot(self.analytics.analyse({2: 1, 1: 2}), stats)
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,137 @@
+"""
+Unit tests for benchmark SQLite stand-in and regression checks
+"""
+
+import asyncio
+import unittest
+
+from api import database
+from benchmarks import run
+from benchmarks.sqlite_client import SQLiteClient
+
+
+class TestSQLiteClient(unittest.TestCase):
+
+  def setUp(self):
+    self.db = SQLiteClient()
+    asyncio.run(self.db.connect())
+
+  def tearDown(self):
+    asyncio.run(self.db.disconnect())
+
+  def test_find_many(self):
+
+    async def query():
+      await database.add_many(self.db, "blockset", [{
+          "name": name
+      } for name in ("Basic", "Premium", "Promo")])
+      rows = await self.db.blockset.find_many(where={"id": {"gt": 1}},
+                                              order={"id": "desc"},
+                                              take=1)
+      named = await self.db.blockset.find_many(
+          where={"name": {"in": ["Basic", "Promo"]}})
+      return rows, named
+
+    rows, named = asyncio.run(query())
+    self.assertEqual([row.dict() for row in rows], [{
+        "id": 3,
+        "name": "Promo",
+        "content_hash": None
+    }])
+    self.assertEqual([row.name for row in named], ["Basic", "Promo"])
+
+  def test_relation_filter_and_booleans(self):
+
+    async def query():
+      user = await database.add_user(self.db, "user", "user@example.com")
+      await self.db.blockset.create(data={"name": "Basic"})
+      await self.db.expansionblock.create(data={
+          "name": "Scourgewar",
+          "block_set_id": 1
+      })
+      await self.db.expansion.create(data={
+          "name": "Icecrown",
+          "expansion_block_id": 1
+      })
+      await self.db.card.create(data={"name": "Arthas", "category": "Hero"})
+      await self.db.cardprint.create(
+          data={
+              "card_id": 1,
+              "expansion_id": 1,
+              "id_in_expansion": 1,
+              "rarity": "Epic"
+          })
+      public = await database.add_deck(self.db, user.id, 1, "Public", None,
+                                       True)
+      private = await database.add_deck(self.db, user.id, 1, "Private")
+      await self.db.deckhascardprint.create_many(data=[{
+          "deck_id": deck.id,
+          "card_print_id": 1,
+          "quantity": 2
+      } for deck in (public, private)])
+      return public, await database.get_public_decks_card_prints(self.db)
+
+    public, rows = asyncio.run(query())
+    self.assertIs(public.is_public, True)
+    self.assertEqual([row.deck_id for row in rows], [public.id])
+
+  def test_mysql_upsert(self):
+
+    async def query():
+      await self.db.execute_raw("CREATE TABLE counter "
+                                "(id INTEGER PRIMARY KEY, quantity INTEGER)")
+      for _ in range(2):
+        await self.db.execute_raw(
+            "INSERT INTO counter (id, quantity) VALUES (?, ?), (?, ?) "
+            "ON DUPLICATE KEY UPDATE quantity = quantity + VALUES(quantity)",
+            1, 2, 2, 5)
+      return await self.db.query_raw("SELECT * FROM counter ORDER BY id")
+
+    self.assertEqual(asyncio.run(query()), [{
+        "id": 1,
+        "quantity": 4
+    }, {
+        "id": 2,
+        "quantity": 10
+    }])
+
+  def test_failed_batch_is_rolled_back(self):
+
+    async def query():
+      with self.assertRaises(Exception):
+        await database.add_many(self.db,
+                                "blockset", [{"name": "Basic"}] * 2,
+                                batch_size=1)
+      return await self.db.blockset.find_many()
+
+    self.assertEqual(asyncio.run(query()), [])
+
+
+class TestRegressions(unittest.TestCase):
+
+  def test_percentile(self):
+    values = [float(value) for value in range(1, 101)]
+    self.assertEqual(run.get_percentile(values, 50), 50)
+    self.assertEqual(run.get_percentile(values, 99), 99)
+    self.assertEqual(run.get_percentile([3.0], 99), 3)
+
+  def test_regressions(self):
+    baseline = {"fill_db_seconds": 10, "cards_c1_p99_ms": 2}
+    metrics = {
+        "fill_db_seconds": 12,
+        "cards_c1_p99_ms": 2.4,
+        "search_c1_p99_ms": 5
+    }
+    self.assertEqual(run.get_regressions(metrics, baseline, 0.25, {}), [])
+    self.assertEqual(
+        run.get_regressions(metrics, baseline, 0.25,
+                            {"cards_c1_p99_ms": 0.1}),
+        ["cards_c1_p99_ms: 2.400 > 2.000 +10%"])
+    self.assertEqual(run.get_thresholds(["fill_db_seconds=0.5"]),
+                     {"fill_db_seconds": 0.5})
+    with self.assertRaises(ValueError):
+      run.get_thresholds(["fill_db_seconds"])
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,264 @@
+"""
+Unit tests for catalog routes served from memory
+"""
+
+import unittest
+
+from fastapi.testclient import TestClient
+from api import app
+from api.catalog import Catalog, CatalogCache
+from api.facets import FacetIndex
+from api.pagination import encode_cursor
+from api.responses import ResponseCache
+
+server = TestClient(app)
+
+BLOCK_SETS = [{"id": 1, "name": "Basic"}]
+EXPANSION_BLOCKS = [{"id": 1, "name": "Scourgewar", "block_set_id": 1}]
+EXPANSIONS = [
+    {
+        "id": 1,
+        "name": "Icecrown",
+        "expansion_block_id": 1
+    },
+    {
+        "id": 2,
+        "name": "Wrathgate",
+        "expansion_block_id": 1
+    },
+]
+CARDS = [
+    {
+        "id": 1,
+        "name": "Path of Frost",
+        "category": "Ability",
+        "mana_cost": "0",
+        "classes": "Death Knight",
+        "types": "Frost",
+        "attack_type": None,
+        "legalities": "Contemporary,Classic",
+    },
+    {
+        "id": 2,
+        "name": "Kelsa Wildfire",
+        "category": "Ally",
+        "mana_cost": "1",
+        "classes": None,
+        "types": "Worgen,Mage",
+        "attack_type": "Fire",
+        "legalities": "Block,Core,Contemporary,Classic",
+    },
+]
+CARD_PRINTS = [
+    {
+        "id": 1,
+        "card_id": 1,
+        "expansion_id": 1,
+        "id_in_expansion": 10,
+        "rarity": "Common",
+        "text_front": "Put target ally from your graveyard on top of your deck.",
+        "text_back": None,
+    },
+    {
+        "id": 2,
+        "card_id": 2,
+        "expansion_id": 1,
+        "id_in_expansion": 13,
+        "rarity": "Common",
+        "text_front": "Ferocity",
+        "text_back": None,
+    },
+    {
+        "id": 3,
+        "card_id": 1,
+        "expansion_id": 2,
+        "id_in_expansion": 7,
+        "rarity": "Rare",
+        "text_front": "Put target ally from your graveyard on top of your deck.",
+        "text_back": None,
+    },
+]
+
+
+def get_test_catalog() -> Catalog:
+  """Returns small catalog used by tests"""
+  return Catalog(BLOCK_SETS, EXPANSION_BLOCKS, EXPANSIONS, CARDS, CARD_PRINTS)
+
+
+class TestCatalogRoutes(unittest.TestCase):
+
+  def setUp(self):
+    app.state.catalog_cache = CatalogCache(get_test_catalog())
+    app.state.facet_index = FacetIndex()
+    app.state.catalog_cache.add_listener(app.state.facet_index.update)
+    app.state.response_cache = ResponseCache()
+    app.state.catalog_cache.add_listener(app.state.response_cache.update)
+
+  def test_cards(self):
+    response = server.get("/cards")
+    self.assertEqual(response.status_code, 200)
+    cards = response.json()["items"]
+    self.assertEqual([card["name"] for card in cards],
+                     ["Path of Frost", "Kelsa Wildfire"])
+    self.assertEqual(cards[1]["types"], ["Worgen", "Mage"])
+    self.assertEqual(cards[1]["classes"], [])
+    self.assertIsNone(response.json()["next_cursor"])
+
+  def test_card_filters(self):
+    response = server.get("/cards", params={"type": "Mage,Frost"})
+    self.assertEqual([card["id"] for card in response.json()["items"]],
+                     [1, 2])
+    response = server.get("/cards",
+                          params={
+                              "type": ["Mage", "Frost"],
+                              "legality": "!Block"
+                          })
+    self.assertEqual([card["id"] for card in response.json()["items"]], [1])
+    response = server.get("/cards", params={"class": "Mage"})
+    self.assertEqual(response.json()["items"], [])
+
+  def test_card_facets(self):
+    response = server.get("/cards",
+                          params={
+                              "category": "Ally",
+                              "facets": "true"
+                          })
+    self.assertEqual([card["id"] for card in response.json()["items"]], [2])
+    facets = response.json()["facets"]
+    self.assertEqual(facets["category"], {"Ability": 1, "Ally": 1})
+    self.assertEqual(facets["legality"], {
+        "Block": 1,
+        "Classic": 1,
+        "Contemporary": 1,
+        "Core": 1
+    })
+
+  def test_card_with_prints(self):
+    response = server.get("/cards/1")
+    self.assertEqual(response.status_code, 200)
+    self.assertEqual([card_print["id"] for card_print in
+                      response.json()["card_prints"]], [1, 3])
+    self.assertEqual(server.get("/cards/99").status_code, 404)
+
+  def test_card_fields(self):
+    response = server.get("/cards/1?fields=name,card_prints.rarity")
+    self.assertEqual(
+        response.json(), {
+            "id": 1,
+            "name": "Path of Frost",
+            "card_prints": [{
+                "id": 1,
+                "rarity": "Common"
+            }, {
+                "id": 3,
+                "rarity": "Rare"
+            }]
+        })
+    response = server.get("/cards/1?include=&fields=name")
+    self.assertEqual(response.json(), {"id": 1, "name": "Path of Frost"})
+    response = server.get("/cards?fields=name&include=card_prints&limit=1")
+    self.assertEqual(len(response.json()["items"][0]["card_prints"]), 2)
+    self.assertIsNotNone(response.json()["next_cursor"])
+
+  def test_card_print_includes(self):
+    response = server.get("/card-prints?expansion_id=2&fields=rarity,"
+                          "card.name,expansion.name&include=card,expansion")
+    self.assertEqual(response.json()["items"], [{
+        "id": 3,
+        "rarity": "Rare",
+        "card": {
+            "id": 1,
+            "name": "Path of Frost"
+        },
+        "expansion": {
+            "id": 2,
+            "name": "Wrathgate"
+        }
+    }])
+    response = server.post("/card-prints/batch?include=card&fields=card.name",
+                           json={"ids": [2]})
+    self.assertEqual(response.json()["items"][0]["card"], {
+        "id": 2,
+        "name": "Kelsa Wildfire"
+    })
+    self.assertNotIn("expansion", response.json()["items"][0])
+
+  def test_unknown_fields(self):
+    self.assertEqual(
+        server.get("/card-prints?fields=text").status_code, 400)
+    self.assertEqual(
+        server.get("/card-prints?fields=card.text").status_code, 400)
+    self.assertEqual(
+        server.get("/expansions?include=card").status_code, 400)
+
+  def test_expansions(self):
+    response = server.get("/expansions")
+    expansions = response.json()["items"]
+    self.assertEqual(expansions[0]["expansion_block"], "Scourgewar")
+    self.assertEqual(expansions[0]["block_set"], "Basic")
+
+  def test_card_prints_by_expansion(self):
+    response = server.get("/card-prints", params={"expansion_id": 1})
+    self.assertEqual(
+        [card_print["id"] for card_print in response.json()["items"]], [1, 2])
+    response = server.get("/card-prints",
+                          params={
+                              "card_id": 1,
+                              "expansion_id": 2
+                          })
+    self.assertEqual(
+        [card_print["id"] for card_print in response.json()["items"]], [3])
+
+  def test_card_prints_batch(self):
+    response = server.post("/card-prints/batch", json={"ids": [3, 404, 1]})
+    self.assertEqual(response.status_code, 200)
+    items = response.json()["items"]
+    self.assertEqual([card_print["id"] for card_print in items], [3, 1])
+    self.assertEqual(items[0]["card"]["name"], "Path of Frost")
+    self.assertEqual(items[0]["expansion"]["name"], "Wrathgate")
+    self.assertEqual(response.json()["missing_ids"], [404])
+    response = server.post("/card-prints/batch", json={"ids": [1] * 1001})
+    self.assertEqual(response.status_code, 422)
+
+  def test_card_prints_pages(self):
+    response = server.get("/card-prints", params={"limit": 2})
+    self.assertEqual(
+        [card_print["id"] for card_print in response.json()["items"]], [1, 2])
+    cursor = response.json()["next_cursor"]
+    response = server.get("/card-prints", params={"limit": 2, "cursor": cursor})
+    self.assertEqual(
+        [card_print["id"] for card_print in response.json()["items"]], [3])
+    self.assertIsNone(response.json()["next_cursor"])
+
+  def test_filtered_cards_pages(self):
+    response = server.get("/cards",
+                          params={
+                              "legality": "Classic",
+                              "limit": 1
+                          })
+    self.assertEqual([card["id"] for card in response.json()["items"]], [1])
+    response = server.get("/cards",
+                          params={
+                              "legality": "Classic",
+                              "limit": 1,
+                              "cursor": response.json()["next_cursor"]
+                          })
+    self.assertEqual([card["id"] for card in response.json()["items"]], [2])
+    self.assertIsNone(response.json()["next_cursor"])
+
+  def test_invalid_cursor(self):
+    self.assertEqual(
+        server.get("/cards", params={
+            "cursor": "not a cursor"
+        }).status_code, 400)
+    self.assertEqual(
+        server.get("/cards", params={
+            "cursor": encode_cursor(["1"])
+        }).status_code, 400)
+
+  def test_reload_requires_token(self):
+    self.assertEqual(server.post("/catalog/reload").status_code, 403)
+
+
+if __name__ == "__main__":
+  unittest.main()
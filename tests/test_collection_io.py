@@ -0,0 +1,87 @@
+"""
+Unit tests for streaming collection import and export
+"""
+
+import asyncio
+import unittest
+
+from api import collection_io
+from tests.test_catalog import get_test_catalog
+
+
+async def iter_chunks(chunks):
+  """Yields given chunks like streamed request body"""
+  for chunk in chunks:
+    yield chunk
+
+
+class RecordingClient:
+  """Client recording raw queries instead of sending them"""
+
+  def __init__(self):
+    self.queries = []
+
+  async def execute_raw(self, query, *params):
+    self.queries.append((query, params))
+    return len(params) // 3
+
+
+def import_body(chunks, file_format, chunk_size=1000):
+  """Returns import report and recorded queries of importing chunks"""
+  db = RecordingClient()
+  report = asyncio.run(
+      collection_io.import_card_prints(db,
+                                       7,
+                                       iter_chunks(chunks),
+                                       file_format,
+                                       get_test_catalog(),
+                                       chunk_size=chunk_size))
+  return report, db.queries
+
+
+class TestCollectionImport(unittest.TestCase):
+
+  def test_lines_split_across_chunks(self):
+
+    async def collect():
+      return [
+          line async for line in collection_io.iter_lines(
+              iter_chunks([b"a,b\r\n1,", b"2\n\xc3", b"\xa9"]))
+      ]
+
+    self.assertEqual(asyncio.run(collect()), ["a,b", "1,2", "é"])
+
+  def test_csv_quantities_are_summed(self):
+    report, queries = import_body([
+        b"card_print_id,quantity\n1,2\n",
+        b"1,3\n3,\n",
+    ], collection_io.CSV)
+    self.assertEqual(report["imported"], 3)
+    self.assertEqual(len(queries), 1)
+    self.assertIn("ON DUPLICATE KEY UPDATE", queries[0][0])
+    self.assertEqual(queries[0][1], (7, 1, 5, 7, 3, 1))
+
+  def test_ndjson_by_expansion_number(self):
+    report, queries = import_body([
+        b'{"expansion": "Icecrown", "id_in_expansion": 13}\n',
+        b'{"expansion": "Icecrown", "id_in_expansion": 99}\n',
+        b'not json\n',
+    ], collection_io.NDJSON)
+    self.assertEqual(queries[0][1], (7, 2, 1))
+    self.assertEqual(report["skipped"], 2)
+    self.assertEqual([error["line"] for error in report["errors"]], [2, 3])
+
+  def test_chunks(self):
+    _, queries = import_body([b"card_print_id\n1\n2\n3\n"],
+                             collection_io.CSV,
+                             chunk_size=2)
+    self.assertEqual([len(params) for _, params in queries], [6, 3])
+
+  def test_format(self):
+    self.assertEqual(collection_io.get_format("text/csv; charset=utf-8"),
+                     collection_io.CSV)
+    self.assertIsNone(collection_io.get_format("text/plain"))
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,101 @@
+"""
+Unit tests for collection completion counters
+"""
+
+import asyncio
+import unittest
+
+from api.completion import CompletionIndex
+from tests.test_catalog import get_test_catalog
+
+
+class CollectionClient:
+  """Client answering card prints of collection query from dict"""
+
+  def __init__(self, card_print_ids):
+    self.card_print_ids = card_print_ids
+    self.queries = 0
+
+  async def query_raw(self, query, collection_id):
+    self.queries += 1
+    return [{
+        "card_print_id": card_print_id
+    } for card_print_id in self.card_print_ids.get(collection_id, [])]
+
+
+class TestCompletionIndex(unittest.TestCase):
+
+  def setUp(self):
+    self.db = CollectionClient({1: [1, 3]})
+    self.index = CompletionIndex()
+    self.index.update(get_test_catalog())
+
+  def get_stats(self, collection_id):
+    return self.index.get_stats(
+        asyncio.run(self.index.get_collection(self.db, collection_id)))
+
+  def test_rollups(self):
+    stats = self.get_stats(1)
+    icecrown, wrathgate = stats["expansions"]
+    self.assertEqual((icecrown["owned"], icecrown["total"]), (1, 2))
+    self.assertEqual(wrathgate["rarities"], {"Rare": {"owned": 1, "total": 1}})
+    self.assertEqual(stats["expansion_blocks"][0]["rarities"], {
+        "Common": {
+            "owned": 1,
+            "total": 2
+        },
+        "Rare": {
+            "owned": 1,
+            "total": 1
+        }
+    })
+    self.assertEqual(
+        (stats["block_sets"][0]["owned"], stats["block_sets"][0]["total"]),
+        (2, 3))
+
+  def test_writes_update_loaded_collection(self):
+    self.get_stats(1)
+    self.index.add(1, [2, 2])
+    self.index.discard(1, [3])
+    stats = self.get_stats(1)
+    self.assertEqual([expansion["owned"] for expansion in stats["expansions"]],
+                     [2, 0])
+    self.assertEqual(self.db.queries, 1)
+
+  def test_one_load_at_a_time_after_failed_load(self):
+    loads = []
+
+    async def query_raw(query, collection_id):
+      loads.append(collection_id)
+      await asyncio.sleep(0)
+      if len(loads) == 1:
+        raise ValueError("Lost connection")
+      return [{"card_print_id": 1}]
+
+    self.db.query_raw = query_raw
+
+    async def load_first():
+      try:
+        await self.index.get_collection(self.db, 1)
+      except ValueError:
+        # Starts right after failed load, before waiting call loads
+        return await self.index.get_collection(self.db, 1)
+      return None
+
+    async def run():
+      return await asyncio.gather(load_first(),
+                                  self.index.get_collection(self.db, 1))
+
+    first, second = asyncio.run(run())
+    self.assertIs(first, second)
+    self.assertEqual(len(loads), 2)
+
+  def test_writes_to_not_loaded_collection_are_read_on_load(self):
+    self.index.add(2, [1])
+    self.db.card_print_ids[2] = [2]
+    stats = self.get_stats(2)
+    self.assertEqual(stats["expansions"][0]["owned"], 1)
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,164 @@
+"""
+Unit tests for dependency ordered stages of db/fill_db.py
+"""
+
+import asyncio
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import unittest
+
+from api import database
+from benchmarks.sqlite_client import SQLiteClient
+
+current = os.path.dirname(os.path.realpath(__file__))
+parent = os.path.dirname(current)
+sys.path.append(os.path.join(parent, "db"))
+
+# pylint: disable=wrong-import-position
+import fill_db
+from progressbar import StageProgress
+# pylint: enable=wrong-import-position
+
+EXPANSIONS = {"Basic": {"Scourgewar": ["Icecrown", "Wrathgate"]}}
+CARDS = {
+    "Path of Frost": {
+        "card_category": "Ability",
+        "card_mana_cost": "0",
+        "card_classes": ["Death Knight"],
+        "card_types": ["Frost"],
+        "card_attack_type": None,
+        "card_legalities": ["Contemporary", "Classic"],
+    }
+}
+CARD_PRINTS = [{
+    "card_name": "Path of Frost",
+    "card_print_expansion_name": expansion,
+    "card_print_id_in_exapansion": "10",
+    "card_print_rarity": "Common",
+    "card_print_text_front": "Put target ally from your graveyard on top.",
+    "card_print_text_back": None,
+} for expansion in ("Icecrown", "Wrathgate", "Unknown")]
+
+
+def get_stage(name: str, events: list, depends_on: tuple = ()):
+  """Returns stage recording when it started and finished"""
+
+  async def run(results):
+    events.append(("start", name, sorted(results)))
+    await asyncio.sleep(0)
+    events.append(("end", name))
+    return name.upper(), ""
+
+  return fill_db.Stage(name, run, depends_on)
+
+
+class TestStages(unittest.TestCase):
+
+  def setUp(self):
+    self.output = io.StringIO()
+
+  def run_stages(self, stages, concurrency):
+    progress = StageProgress([stage.name for stage in stages],
+                             file=self.output)
+    return asyncio.run(fill_db.run_stages(stages, concurrency, progress))
+
+  def test_independent_stages_run_concurrently(self):
+    events = []
+    results = self.run_stages([
+        get_stage("a", events),
+        get_stage("b", events),
+        get_stage("c", events, ("a", "b")),
+    ], 2)
+    self.assertEqual(results, {"a": "A", "b": "B", "c": "C"})
+    self.assertEqual(events[:2], [("start", "a", []), ("start", "b", [])])
+    self.assertEqual(events[-2:], [("start", "c", ["a", "b"]), ("end", "c")])
+
+  def test_concurrency_limit(self):
+    events = []
+    self.run_stages([get_stage("a", events), get_stage("b", events)], 1)
+    self.assertEqual(events, [("start", "a", []), ("end", "a"),
+                              ("start", "b", []), ("end", "b")])
+
+  def test_unlisted_dependency(self):
+    with self.assertRaises(ValueError):
+      self.run_stages([get_stage("a", [], ("b",)), get_stage("b", [])], 1)
+
+  def test_failed_stage(self):
+
+    async def fail(_):
+      raise RuntimeError("broken stage")
+
+    events = []
+    with self.assertRaises(RuntimeError):
+      self.run_stages([
+          fill_db.Stage("a", fail),
+          get_stage("b", events, ("a",)),
+      ], 2)
+    self.assertEqual(events, [])
+    self.assertIn("failed", self.output.getvalue())
+
+
+class TestFillDatabase(unittest.TestCase):
+
+  def test_fill_and_sync(self):
+    directory = tempfile.TemporaryDirectory()
+    self.addCleanup(directory.cleanup)
+    db = SQLiteClient(os.path.join(directory.name, "catalog.db"))
+
+    # Assets hold the same card print twice
+    card_prints = CARD_PRINTS + CARD_PRINTS[:1]
+
+    async def fill():
+      await fill_db.fill_database(db, CARDS, card_prints, EXPANSIONS, 1000, 4)
+      await fill_db.sync_database(db, CARDS, card_prints, EXPANSIONS, 1000, 4)
+      await db.connect()
+      try:
+        return await db.cardprint.find_many()
+      finally:
+        await db.disconnect()
+
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+      card_prints = asyncio.run(fill())
+    self.assertEqual([card_print.expansion_id for card_print in card_prints],
+                     [1, 2])
+    self.assertIn("Expansion \x1b[33mUnknown", output.getvalue())
+    self.assertIn("\x1b[33m2\x1b[36m unchanged", output.getvalue())
+    self.assertEqual(output.getvalue().count("Skipped \x1b[33m1\x1b[31m dup"),
+                     2)
+
+  def test_sync_keeps_referenced_card_print(self):
+    directory = tempfile.TemporaryDirectory()
+    self.addCleanup(directory.cleanup)
+    db = SQLiteClient(os.path.join(directory.name, "catalog.db"))
+
+    async def sync():
+      await fill_db.fill_database(db, CARDS, CARD_PRINTS, EXPANSIONS, 1000, 4)
+      await db.connect()
+      try:
+        user = await database.add_user(db, "first", "first@example.com")
+        await database.add_deck(db, user.id, 2, "Frost")
+      finally:
+        await db.disconnect()
+      # Wrathgate print, hero of the deck, vanished from assets
+      await fill_db.sync_database(db, CARDS, CARD_PRINTS[:1], EXPANSIONS, 1000,
+                                  4)
+      await db.connect()
+      try:
+        return await db.cardprint.find_many()
+      finally:
+        await db.disconnect()
+
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+      card_prints = asyncio.run(sync())
+    self.assertEqual([card_print.id for card_print in card_prints], [1, 2])
+    self.assertIn("\x1b[33m1\x1b[36m unchanged, \x1b[33m1\x1b[36m blocked",
+                  output.getvalue())
+
+
+if __name__ == "__main__":
+  unittest.main()
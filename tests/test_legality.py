@@ -0,0 +1,120 @@
+"""
+Unit tests for deck validation
+"""
+
+import unittest
+from unittest import mock
+
+from fastapi.testclient import TestClient
+from api import app, legality
+from api.catalog import Catalog
+from api.legality import LegalityIndex
+from api.write_buffer import QuantityBuffer
+from tests import test_catalog
+
+server = TestClient(app)
+
+HERO = {
+    "id": 3,
+    "name": "Rumi of Gnomeregan",
+    "category": "Hero",
+    "mana_cost": None,
+    "classes": None,
+    "types": "Gnome,Mage",
+    "attack_type": None,
+    "legalities": "Contemporary,Classic",
+}
+HERO_PRINT = {
+    "id": 4,
+    "card_id": 3,
+    "expansion_id": 1,
+    "id_in_expansion": 1,
+    "rarity": "Common",
+    "text_front": None,
+    "text_back": None,
+}
+
+
+def get_legality_index() -> LegalityIndex:
+  """Returns legality index of test catalog with a mage hero"""
+  index = LegalityIndex()
+  index.update(
+      Catalog(test_catalog.BLOCK_SETS, test_catalog.EXPANSION_BLOCKS,
+              test_catalog.EXPANSIONS, test_catalog.CARDS + [HERO],
+              test_catalog.CARD_PRINTS + [HERO_PRINT]))
+  return index
+
+
+def get_rules(violations):
+  """Returns violated rules"""
+  return sorted(violation["rule"] for violation in violations)
+
+
+class TestLegalityIndex(unittest.TestCase):
+
+  def setUp(self):
+    self.index = get_legality_index()
+
+  def test_valid_deck(self):
+    with mock.patch.object(legality, "MIN_DECK_SIZE", 4):
+      self.assertEqual(self.index.validate("Classic", 4, {2: 4}), [])
+
+  def test_violations(self):
+    violations = self.index.validate("Classic", 4, {1: 3, 3: 2, 2: 1, 99: 1})
+    self.assertEqual(get_rules(violations), [
+        legality.CLASS, legality.CLASS, legality.COPY_LIMIT,
+        legality.DECK_SIZE, legality.UNKNOWN_CARD_PRINT
+    ])
+    copy_limit = [
+        violation for violation in violations
+        if violation["rule"] == legality.COPY_LIMIT
+    ]
+    self.assertEqual(copy_limit[0]["card_print_id"], 1)
+
+  def test_format_legality(self):
+    violations = self.index.validate("Block", 4, {2: 1})
+    self.assertEqual(get_rules(violations),
+                     [legality.DECK_SIZE, legality.LEGALITY])
+    self.assertEqual(get_rules(self.index.validate("Modern", 4, {})),
+                     [legality.UNKNOWN_FORMAT])
+
+  def test_hero(self):
+    violations = self.index.validate("Classic", 2, {4: 1})
+    self.assertEqual(get_rules(violations),
+                     [legality.DECK_SIZE, legality.HERO, legality.HERO])
+
+
+class TestValidateRoute(unittest.TestCase):
+
+  def setUp(self):
+    app.state.db = None
+    app.state.legality_index = get_legality_index()
+    app.state.collection_quantities = QuantityBuffer(
+        None, "collection_has_card_print")
+    app.state.deck_quantities = QuantityBuffer(None, "deck_has_card_print")
+
+  def test_validate_decks(self):
+    response = server.post("/decks/validate",
+                           json={
+                               "format": "Classic",
+                               "decks": [{
+                                   "hero_card_print_id":
+                                       4,
+                                   "card_prints": [{
+                                       "card_print_id": 2,
+                                       "quantity": 2
+                                   }, {
+                                       "card_print_id": 2,
+                                       "quantity": 3
+                                   }]
+                               }]
+                           })
+    self.assertEqual(response.status_code, 200)
+    result = response.json()[0]
+    self.assertFalse(result["valid"])
+    self.assertEqual(get_rules(result["violations"]),
+                     [legality.COPY_LIMIT, legality.DECK_SIZE])
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,71 @@
+"""
+Unit tests for request scoped batching loaders
+"""
+
+import asyncio
+import unittest
+from typing import Dict, List
+
+from api.loaders import DataLoader
+
+
+class TestDataLoader(unittest.TestCase):
+
+  def setUp(self):
+    self.batches: List[List[int]] = []
+
+  async def load_squares(self, keys: List[int]) -> Dict[int, int]:
+    self.batches.append(keys)
+    return {key: key * key for key in keys if key >= 0}
+
+  def test_batches_concurrent_loads(self):
+
+    async def load():
+      loader = DataLoader(self.load_squares)
+      return await asyncio.gather(loader.load(2), loader.load(3),
+                                  loader.load_many([4, 2, -1]))
+
+    self.assertEqual(asyncio.run(load()), [4, 9, [16, 4, None]])
+    self.assertEqual(self.batches, [[2, 3, 4, -1]])
+
+  def test_memoizes_loaded_keys(self):
+
+    async def load():
+      loader = DataLoader(self.load_squares)
+      first = await loader.load_many([1, 2])
+      second = await loader.load_many([2, 3])
+      return first, second, loader.batches
+
+    self.assertEqual(asyncio.run(load()), ([1, 4], [4, 9], 2))
+    self.assertEqual(self.batches, [[1, 2], [3]])
+
+  def test_max_batch_size(self):
+
+    async def load():
+      loader = DataLoader(self.load_squares, max_batch_size=2)
+      return await loader.load_many([1, 2, 3])
+
+    self.assertEqual(asyncio.run(load()), [1, 4, 9])
+    self.assertEqual(self.batches, [[1, 2], [3]])
+
+  def test_failed_batch_not_memoized(self):
+    calls = []
+
+    async def load_once_failing(keys: List[int]) -> Dict[int, int]:
+      calls.append(keys)
+      if len(calls) == 1:
+        raise ConnectionError("Lost connection")
+      return {key: key for key in keys}
+
+    async def load():
+      loader = DataLoader(load_once_failing)
+      with self.assertRaises(ConnectionError):
+        await loader.load_many([1, 2])
+      return await loader.load(1)
+
+    self.assertEqual(asyncio.run(load()), 1)
+    self.assertEqual(calls, [[1, 2], [1]])
+
+
+if __name__ == "__main__":
+  unittest.main()
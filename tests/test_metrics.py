@@ -0,0 +1,116 @@
+"""
+Unit tests for request and database query metrics
+"""
+
+import asyncio
+import os
+import unittest
+from unittest import mock
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from api import app
+from api import metrics as metrics_module
+from api.catalog import CatalogCache
+from api.metrics import Metrics, MetricsMiddleware, metrics, timed_query
+from api.responses import ResponseCache
+from tests.test_catalog import get_test_catalog
+
+server = TestClient(app)
+queries_app = FastAPI()
+queries_app.add_middleware(MetricsMiddleware)
+queries_server = TestClient(queries_app)
+
+
+@timed_query
+async def get_nothing() -> None:
+  """Query which returns nothing"""
+
+
+@timed_query
+async def get_error() -> None:
+  """Query which always fails"""
+  raise ValueError("broken query")
+
+
+@queries_app.get("/queries")
+async def run_queries() -> dict:
+  """Route running both test queries"""
+  await get_nothing()
+  try:
+    await get_error()
+  except ValueError:
+    pass
+  return {}
+
+
+class TestMetrics(unittest.TestCase):
+
+  def setUp(self):
+    app.state.catalog_cache = CatalogCache(get_test_catalog())
+    app.state.response_cache = ResponseCache()
+    metrics.reset()
+
+  def test_histogram_render(self):
+    test_metrics = Metrics()
+    test_metrics.describe("test_seconds", "histogram", "Test times")
+    test_metrics.observe("test_seconds", (("name", 'a"b'),), 0.02)
+    test_metrics.observe("test_seconds", (("name", 'a"b'),), 20.0)
+    lines = test_metrics.render().splitlines()
+    self.assertEqual(lines[:2], [
+        "# HELP test_seconds Test times", "# TYPE test_seconds histogram"
+    ])
+    self.assertIn('test_seconds_bucket{name="a\\"b",le="0.01"} 0', lines)
+    self.assertIn('test_seconds_bucket{name="a\\"b",le="0.025"} 1', lines)
+    self.assertIn('test_seconds_bucket{name="a\\"b",le="+Inf"} 2', lines)
+    self.assertIn('test_seconds_sum{name="a\\"b"} 20.02', lines)
+    self.assertIn('test_seconds_count{name="a\\"b"} 2', lines)
+
+  def test_route_labels(self):
+    server.get("/cards/1")
+    server.get("/cards/99")
+    server.get("/cards/1/unknown")
+    text = server.get("/metrics").text
+    self.assertIn(
+        'http_request_duration_seconds_count{method="GET",'
+        'route="/cards/{card_id}",status="200"} 1', text)
+    self.assertIn(
+        'http_request_duration_seconds_count{method="GET",'
+        'route="/cards/{card_id}",status="404"} 1', text)
+    self.assertIn(
+        'http_request_duration_seconds_count{method="GET",'
+        'route="unmatched",status="404"} 1', text)
+    self.assertIn(
+        'http_requests_in_flight{method="GET",route="/metrics"} 1', text)
+    self.assertIn(
+        'http_requests_in_flight{method="GET",route="/cards/{card_id}"} 0',
+        text)
+
+  def test_timed_query(self):
+    asyncio.run(get_nothing())
+    with self.assertRaises(ValueError):
+      asyncio.run(get_error())
+    histograms = metrics.histograms["db_query_duration_seconds"]
+    self.assertEqual(histograms[(("operation", "get_nothing"),)].count, 1)
+    self.assertEqual(metrics.values["db_query_errors_total"], {
+        (("operation", "get_error"),): 1
+    })
+
+  def test_slow_request_log(self):
+    with mock.patch.dict(os.environ, {"SLOW_REQUEST_SECONDS": "0"}):
+      with self.assertLogs("api.metrics", "WARNING") as logs:
+        queries_server.get("/queries?q=1")
+    self.assertEqual(len(logs.records), 1)
+    message = logs.records[0].getMessage()
+    self.assertIn("GET /queries?q=1 200", message)
+    self.assertIn("2 queries", message)
+    self.assertIn("\n  get_nothing ", message)
+    self.assertRegex(message, r"\n  get_error [\d.]+ ms failed")
+    with mock.patch.dict(os.environ, {"SLOW_REQUEST_SECONDS": ""}):
+      with mock.patch.object(metrics_module.logger, "warning") as warning:
+        queries_server.get("/queries")
+    warning.assert_not_called()
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,46 @@
+"""
+Unit tests for compact catalog records
+"""
+
+import unittest
+
+from api.records import CardPrintRecord, CardRecord
+from tests.test_catalog import CARD_PRINTS, CARDS
+
+
+class TestRecords(unittest.TestCase):
+
+  def test_card_reads_like_dict(self):
+    card = CardRecord(CARDS[1])
+    self.assertEqual(
+        dict(card), {
+            "id": 2,
+            "name": "Kelsa Wildfire",
+            "category": "Ally",
+            "mana_cost": "1",
+            "attack_type": "Fire",
+            "classes": [],
+            "types": ["Worgen", "Mage"],
+            "legalities": ["Block", "Core", "Contemporary", "Classic"],
+        })
+    self.assertEqual(card.get("missing"), None)
+    with self.assertRaises(KeyError):
+      card["missing"]  # pylint: disable=pointless-statement
+
+  def test_values_are_shared(self):
+    first, second = CardRecord(CARDS[0]), CardRecord(dict(CARDS[0], id=3))
+    self.assertEqual(first.legalities, second.legalities)
+    self.assertIs(first["legalities"][0], second["legalities"][0])
+    self.assertFalse(hasattr(first, "__dict__"))
+
+  def test_card_print_texts_are_shared(self):
+    texts = {}
+    first = CardPrintRecord(CARD_PRINTS[0], texts)
+    second = CardPrintRecord(dict(CARD_PRINTS[2], text_front="".join(
+        CARD_PRINTS[2]["text_front"])), texts)
+    self.assertIs(first["text_front"], second["text_front"])
+    self.assertEqual(second["rarity"], "Rare")
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,113 @@
+"""
+Unit tests for routing of read-only queries to read replicas
+"""
+
+import asyncio
+import time
+import unittest
+
+from fastapi.testclient import TestClient
+from api import app, database
+from api.catalog import CatalogCache
+from api.replicas import STICKY_COOKIE, ReplicaRouter, RequestRouting
+from api.replicas import replica_router, request_routing
+from api.views import KINDS, view_cache
+from api.write_buffer import QuantityBuffer
+from benchmarks.sqlite_client import SQLiteClient
+from tests.test_catalog import get_test_catalog
+from tests.test_trades import seed
+from tests.test_write_buffer import CollectionClient
+
+
+def get_items(response):
+  """Returns card print ids of page"""
+  return [item["card_print_id"] for item in response.json()["items"]]
+
+
+class TestReplicaRouter(unittest.TestCase):
+
+  def test_least_busy_replica_taking_turns(self):
+    router = ReplicaRouter()
+    router.set_replicas(["first", "second"])
+    self.assertEqual({router.choose().db, router.choose().db},
+                     {"first", "second"})
+    router.replicas[0].in_flight = 1
+    self.assertEqual([router.choose().db for _ in range(2)],
+                     ["second", "second"])
+    router.fail(router.replicas[1])
+    self.assertEqual(router.choose().db, "first")
+    router.fail(router.replicas[0])
+    self.assertIsNone(router.choose())
+
+  def test_request_which_wrote_reads_primary(self):
+    router = ReplicaRouter()
+    router.set_replicas(["replica"])
+
+    async def choose(state):
+      request_routing.set(state)
+      return router.choose()
+
+    self.assertIsNotNone(asyncio.run(choose(RequestRouting())))
+    state = RequestRouting()
+    state.wrote = True
+    self.assertIsNone(asyncio.run(choose(state)))
+    self.assertIsNone(
+        asyncio.run(choose(RequestRouting(primary_until=time.time() + 60))))
+
+  def test_failed_replica_falls_back_to_primary(self):
+    primary = SQLiteClient()
+    # Replica never connected fails every query
+    replica = SQLiteClient()
+
+    async def read():
+      await primary.connect()
+      try:
+        await seed(primary)
+        return await database.get_collections(primary, [1, 2])
+      finally:
+        await primary.disconnect()
+
+    replica_router.set_replicas([replica])
+    try:
+      with self.assertLogs("api.replicas", "WARNING"):
+        collections = asyncio.run(read())
+      self.assertIsNone(replica_router.choose())
+    finally:
+      replica_router.set_replicas([])
+    self.assertEqual([collection.id for collection in collections], [1, 2])
+
+
+class TestReplicaRoutes(unittest.TestCase):
+
+  def setUp(self):
+    app.state.catalog_cache = CatalogCache(get_test_catalog())
+    app.state.db = CollectionClient({1: 1, 3: 1})
+    app.state.collection_quantities = QuantityBuffer(
+        app.state.db, "collection_has_card_print")
+    # Replica has not received card print 3 yet
+    replica_router.set_replicas([CollectionClient({1: 1})])
+    view_cache.invalidate_kinds(*KINDS)
+
+  def tearDown(self):
+    replica_router.set_replicas([])
+
+  def test_read_your_writes(self):
+    server = TestClient(app)
+    other_server = TestClient(app)
+    response = server.get("/collections/1/card-prints")
+    self.assertEqual(get_items(response), [1])
+    self.assertNotIn(STICKY_COOKIE, response.cookies)
+    response = server.post("/collections/1/card-prints/2", json={"delta": 1})
+    self.assertIn(STICKY_COOKIE, response.cookies)
+    response = server.get("/collections/1/card-prints")
+    self.assertEqual(get_items(response), [1, 2, 3])
+    # Other clients read replica, view read there after the write is not
+    # cached, so it cannot be served to the client which wrote
+    response = other_server.get("/collections/1/card-prints?limit=10")
+    self.assertEqual(get_items(response), [1, 2])
+    response = server.get("/collections/1/card-prints?limit=10")
+    self.assertEqual(get_items(response), [1, 2, 3])
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,136 @@
+"""
+Unit tests for pre-serialized catalog responses
+"""
+
+import gzip
+import json
+import unittest
+from unittest import mock
+
+from fastapi.testclient import TestClient
+from api import app
+from api import responses
+from api.catalog import CatalogCache
+from api.facets import FacetIndex
+from api.responses import ResponseCache, get_accepted_encodings
+from api.responses import matches_etag
+from tests.test_catalog import get_test_catalog
+
+server = TestClient(app)
+
+
+class TestHeaders(unittest.TestCase):
+
+  def test_accepted_encodings(self):
+    self.assertEqual(get_accepted_encodings("gzip, deflate, br"),
+                     ["gzip", "deflate", "br"])
+    self.assertEqual(get_accepted_encodings("br;q=0, GZIP;q=0.5"), ["gzip"])
+    self.assertEqual(get_accepted_encodings(None), [])
+
+  def test_matches_etag(self):
+    self.assertTrue(matches_etag('"a", "b"', '"b"'))
+    self.assertTrue(matches_etag('W/"b"', '"b"'))
+    self.assertTrue(matches_etag("*", '"b"'))
+    self.assertFalse(matches_etag('"a"', '"b"'))
+    self.assertFalse(matches_etag(None, '"b"'))
+    self.assertTrue(matches_etag('"b-gzip"', '"b"'))
+    self.assertTrue(matches_etag('W/"b-br"', '"b-gzip"'))
+    self.assertFalse(matches_etag('"a-br"', '"b-br"'))
+
+
+class TestCatalogResponses(unittest.TestCase):
+
+  def setUp(self):
+    app.state.catalog_cache = CatalogCache(get_test_catalog())
+    app.state.facet_index = FacetIndex()
+    app.state.catalog_cache.add_listener(app.state.facet_index.update)
+    app.state.response_cache = ResponseCache(max_age=60)
+    app.state.catalog_cache.add_listener(app.state.response_cache.update)
+
+  def test_cached_body(self):
+    first = server.get("/cards?type=Mage&facets=true")
+    second = server.get("/cards?facets=true&type=Mage")
+    self.assertEqual(first.status_code, 200)
+    self.assertEqual(first.content, second.content)
+    self.assertEqual(first.headers["etag"], second.headers["etag"])
+    self.assertEqual(first.headers["cache-control"], "public, max-age=60")
+    self.assertEqual(first.json()["items"][0]["name"], "Kelsa Wildfire")
+    self.assertEqual(app.state.response_cache.hits, 1)
+    self.assertEqual(app.state.response_cache.misses, 1)
+
+  def test_encoded_query_has_own_key(self):
+    # Both queries decode to type=Mage&type=Priest
+    first = server.get("/cards?type=Mage&type=Priest")
+    second = server.get("/cards?type=Mage%26type%3DPriest")
+    self.assertNotEqual(first.json()["items"], [])
+    self.assertEqual(second.json()["items"], [])
+    self.assertNotEqual(first.headers["etag"], second.headers["etag"])
+    self.assertEqual(app.state.response_cache.misses, 2)
+
+  def test_not_modified(self):
+    etag = server.get("/cards/2").headers["etag"]
+    response = server.get("/cards/2", headers={"If-None-Match": etag})
+    self.assertEqual(response.status_code, 304)
+    self.assertEqual(response.headers["etag"], etag)
+    self.assertEqual(response.content, b"")
+    response = server.get("/cards/2", headers={"If-None-Match": '"other"'})
+    self.assertEqual(response.status_code, 200)
+
+  @mock.patch.object(responses, "MIN_COMPRESSED_SIZE", 0)
+  def test_gzip(self):
+    body = server.get("/card-prints", headers={
+        "Accept-Encoding": "identity"
+    }).content
+    response = server.get("/card-prints", headers={"Accept-Encoding": "gzip"})
+    self.assertEqual(response.headers["content-encoding"], "gzip")
+    self.assertEqual(response.headers["vary"], "Accept-Encoding")
+    self.assertEqual(response.content, body)
+    # pylint: disable-next=protected-access
+    cached = next(iter(app.state.response_cache._bodies.values()))
+    self.assertEqual(gzip.decompress(cached.encoded["gzip"]), body)
+    self.assertEqual(response.headers["etag"], f'{cached.etag[:-1]}-gzip"')
+    response = server.get("/card-prints",
+                          headers={
+                              "Accept-Encoding": "identity",
+                              "If-None-Match": response.headers["etag"]
+                          })
+    self.assertEqual(response.status_code, 304)
+    self.assertEqual(response.headers["etag"], cached.etag)
+
+  def test_small_body_not_compressed(self):
+    response = server.get("/cards/2", headers={"Accept-Encoding": "gzip"})
+    self.assertNotIn("content-encoding", response.headers)
+
+  def test_not_found_not_cached(self):
+    response = server.get("/cards/404")
+    self.assertEqual(response.status_code, 404)
+    self.assertEqual(app.state.response_cache.size, 0)
+
+  def test_emptied_on_reload(self):
+    server.get("/expansions")
+    self.assertGreater(app.state.response_cache.size, 0)
+    app.state.response_cache.update(get_test_catalog())
+    self.assertEqual(app.state.response_cache.size, 0)
+    response = server.get("/expansions")
+    self.assertEqual(json.loads(response.content)["items"][0]["name"],
+                     "Icecrown")
+    self.assertEqual(app.state.response_cache.misses, 2)
+
+  def test_memory_budget(self):
+    app.state.response_cache.max_bytes = 1
+    server.get("/cards/1")
+    server.get("/cards/2")
+    self.assertEqual(server.get("/cards/1").status_code, 200)
+    self.assertEqual(app.state.response_cache.misses, 3)
+
+  def test_memory_budget_not_modified(self):
+    app.state.response_cache.max_bytes = 1
+    for card_id in (1, 2, 1):
+      response = server.get(f"/cards/{card_id}", headers={"If-None-Match": "*"})
+      self.assertEqual(response.status_code, 304)
+    # pylint: disable-next=protected-access
+    self.assertEqual(len(app.state.response_cache._bodies), 1)
+
+
+if __name__ == "__main__":
+  unittest.main()
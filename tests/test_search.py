@@ -0,0 +1,124 @@
+"""
+Unit tests for full-text search index and route
+"""
+
+import unittest
+
+from fastapi.testclient import TestClient
+from api import app
+from api.catalog import Catalog, CatalogCache
+from api.search import SearchIndex, is_one_edit_away, tokenize
+
+server = TestClient(app)
+
+
+def get_card(card_id: int, name: str) -> dict:
+  """Returns card table row with empty attributes"""
+  return {
+      "id": card_id,
+      "name": name,
+      "category": "Ally",
+      "mana_cost": "1",
+      "classes": None,
+      "types": None,
+      "attack_type": None,
+      "legalities": None,
+  }
+
+
+def get_card_print(card_print_id: int, card_id: int, text_front: str) -> dict:
+  """Returns card_print table row with given front text"""
+  return {
+      "id": card_print_id,
+      "card_id": card_id,
+      "expansion_id": 1,
+      "id_in_expansion": card_print_id,
+      "rarity": "Common",
+      "text_front": text_front,
+      "text_back": None,
+  }
+
+
+def get_test_catalog(davron_name: str = "Davron of Stormwind") -> Catalog:
+  """Returns small catalog used by tests"""
+  return Catalog(
+      [{
+          "id": 1,
+          "name": "Basic"
+      }], [{
+          "id": 1,
+          "name": "Scourgewar",
+          "block_set_id": 1
+      }], [{
+          "id": 1,
+          "name": "Icecrown",
+          "expansion_block_id": 1
+      }], [
+          get_card(1, davron_name),
+          get_card(2, "Path of Frost"),
+          get_card(3, "Frostbolt"),
+      ], [
+          get_card_print(
+              1, 1, "On your turn: 1, Flip Davron → Target hero or ally "
+              "can't protect this turn."),
+          get_card_print(2, 2, "Put target ally from your graveyard on top "
+                         "of your deck."),
+          get_card_print(3, 3, "Frostbolt deals 3 frost damage."),
+      ])
+
+
+class TestSearchIndex(unittest.TestCase):
+
+  def setUp(self):
+    self.index = SearchIndex()
+    self.index.update(get_test_catalog())
+
+  def search(self, query: str) -> list:
+    return [card_id for card_id, _ in self.index.search(query)]
+
+  def test_tokenize(self):
+    self.assertEqual(tokenize("Can't protect, Éclair"),
+                     ["cant", "protect", "eclair"])
+
+  def test_one_edit(self):
+    self.assertTrue(is_one_edit_away("flip", "flpi"))
+    self.assertTrue(is_one_edit_away("frost", "forst"))
+    self.assertTrue(is_one_edit_away("frost", "frosts"))
+    self.assertFalse(is_one_edit_away("frost", "fist"))
+
+  def test_text_and_name(self):
+    self.assertEqual(self.search("can't protect"), [1])
+    self.assertEqual(self.search("davron"), [1])
+
+  def test_prefix_of_last_token(self):
+    self.assertEqual(self.search("path of fr"), [2])
+    self.assertEqual(self.search("fr"), [3, 2])
+    self.assertEqual(self.search("fr path"), [])
+
+  def test_typo(self):
+    self.assertEqual(self.search("forstbolt"), [3])
+
+  def test_exact_before_prefix(self):
+    self.assertEqual(self.search("frost")[0], 2)
+
+  def test_incremental_update(self):
+    self.index.update(get_test_catalog("Davron the Renamed"))
+    self.assertEqual(self.search("renamed"), [1])
+    self.assertEqual(self.search("stormwind"), [])
+    self.assertEqual(self.search("protect"), [1])
+
+
+class TestSearchRoute(unittest.TestCase):
+
+  def test_search(self):
+    app.state.catalog_cache = CatalogCache(get_test_catalog())
+    app.state.search_index = SearchIndex()
+    app.state.catalog_cache.add_listener(app.state.search_index.update)
+    response = server.get("/search", params={"q": "flip"})
+    self.assertEqual(response.status_code, 200)
+    self.assertEqual(response.json()[0]["name"], "Davron of Stormwind")
+    self.assertEqual(server.get("/search").status_code, 422)
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,193 @@
+"""
+Unit tests for binary catalog snapshot
+"""
+
+import asyncio
+import os
+import tempfile
+import unittest
+
+from api.catalog import Catalog, get_content_hash
+from api.snapshot import Snapshot, write_snapshot
+
+CARDS = {
+    "Path of Frost": {
+        "card_category": "Ability",
+        "card_mana_cost": "0",
+        "card_classes": ["Death Knight"],
+        "card_types": ["Frost"],
+        "card_attack_type": None,
+        "card_legalities": ["Contemporary", "Classic"],
+    },
+    "Kelsa Wildfire": {
+        "card_category": "Ally",
+        "card_mana_cost": "1",
+        "card_classes": [],
+        "card_types": ["Worgen", "Mage"],
+        "card_attack_type": "Fire",
+        "card_legalities": ["Block", "Core", "Contemporary", "Classic"],
+    },
+}
+CARD_PRINTS = [
+    {
+        "card_name": "Path of Frost",
+        "card_print_expansion_name": "Wrathgate",
+        "card_print_id_in_exapansion": "7",
+        "card_print_rarity": "Rare",
+        "card_print_text_front": "Put target ally on top of your deck.",
+        "card_print_text_back": None,
+    },
+    {
+        "card_name": "Kelsa Wildfire",
+        "card_print_expansion_name": "Icecrown",
+        "card_print_id_in_exapansion": "13",
+        "card_print_rarity": "Common",
+        "card_print_text_front": "Ferocity",
+        "card_print_text_back": None,
+    },
+    {
+        "card_name": "Path of Frost",
+        "card_print_expansion_name": "Icecrown",
+        "card_print_id_in_exapansion": "10",
+        "card_print_rarity": "Common",
+        "card_print_text_front": "Put target ally on top of your deck.",
+        "card_print_text_back": None,
+    },
+    {
+        "card_name": "Missing Card",
+        "card_print_expansion_name": "Icecrown",
+        "card_print_id_in_exapansion": "1",
+        "card_print_rarity": "Common",
+        "card_print_text_front": None,
+        "card_print_text_back": None,
+    },
+]
+EXPANSIONS = {"Basic": {"Scourgewar": ["Icecrown", "Wrathgate"]}}
+
+
+class TableClient:
+  """Client answering raw queries with rows of queried table"""
+
+  def __init__(self, tables):
+    self.tables = tables
+
+  async def query_raw(self, query):
+    return self.tables[query.split(" FROM ")[1]]
+
+
+def get_stored_tables():
+  """Returns catalog tables as fill script would store the assets"""
+  cards = [{
+      "id": 1,
+      "name": "Path of Frost",
+      "category": "Ability",
+      "mana_cost": "0",
+      "classes": "Death Knight",
+      "types": "Frost",
+      "attack_type": None,
+      "legalities": "Contemporary,Classic",
+  }, {
+      "id": 2,
+      "name": "Kelsa Wildfire",
+      "category": "Ally",
+      "mana_cost": "1",
+      "classes": None,
+      "types": "Worgen,Mage",
+      "attack_type": "Fire",
+      "legalities": "Block,Core,Contemporary,Classic",
+  }]
+  card_prints = [{
+      "id": 5,
+      "card_id": 1,
+      "expansion_id": 2,
+      "id_in_expansion": 7,
+      "rarity": "Rare",
+      "text_front": "Put target ally on top of your deck.",
+      "text_back": None,
+  }]
+  for row in cards + card_prints:
+    values = {key: value for key, value in row.items() if key != "id"}
+    row["content_hash"] = get_content_hash(values)
+  return {
+      "block_set": [{
+          "id": 1,
+          "name": "Basic"
+      }],
+      "expansion_block": [{
+          "id": 1,
+          "name": "Scourgewar",
+          "block_set_id": 1
+      }],
+      "expansion": [{
+          "id": 1,
+          "name": "Icecrown",
+          "expansion_block_id": 1
+      }, {
+          "id": 2,
+          "name": "Wrathgate",
+          "expansion_block_id": 1
+      }],
+      "card": [{
+          key: row[key] for key in ("id", "name", "content_hash")
+      } for row in cards],
+      "card_print": [{
+          key: row[key] for key in ("id", "card_id", "expansion_id",
+                                    "id_in_expansion", "content_hash")
+      } for row in card_prints],
+  }
+
+
+class TestSnapshot(unittest.TestCase):
+
+  def setUp(self):
+    directory = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+    self.addCleanup(directory.cleanup)
+    self.path = os.path.join(directory.name, "catalog.snapshot")
+    write_snapshot(self.path, CARDS, CARD_PRINTS, EXPANSIONS)
+    self.snapshot = Snapshot(self.path)
+    self.addCleanup(self.snapshot.close)
+
+  def test_assets_round_trip(self):
+    cards, card_prints, expansions = self.snapshot.get_assets()
+    self.assertEqual(cards, CARDS)
+    self.assertEqual(expansions, EXPANSIONS)
+    self.assertEqual(sorted(card_prints, key=str),
+                     sorted(CARD_PRINTS, key=str))
+
+  def test_lookups(self):
+    position = self.snapshot.find_card("Path of Frost")
+    self.assertEqual(self.snapshot.get_card(position)["card_types"], ["Frost"])
+    self.assertIsNone(self.snapshot.find_card("Missing Card"))
+    self.assertEqual(self.snapshot.find_expansion("Wrathgate"), 1)
+    card_prints = [
+        self.snapshot.get_card_print(card_print_position)
+        for card_print_position in self.snapshot.get_card_print_positions(
+            position)
+    ]
+    self.assertEqual([
+        card_print["card_print_expansion_name"] for card_print in card_prints
+    ], ["Icecrown", "Wrathgate"])
+    self.assertIsNotNone(
+        self.snapshot.find_card_print(position, "Wrathgate", 7))
+    self.assertIsNone(self.snapshot.find_card_print(position, "Wrathgate", 8))
+
+  def test_invalid_file(self):
+    with open(self.path, "wb") as file:
+      file.write(b"not a snapshot" * 10)
+    with self.assertRaises(ValueError):
+      Snapshot(self.path)
+
+  def test_catalog_with_snapshot(self):
+    tables = get_stored_tables()
+    catalog = asyncio.run(
+        Catalog.load_with_snapshot(TableClient(tables), self.snapshot))
+    self.assertEqual(catalog.card_by_id[2]["types"], ["Worgen", "Mage"])
+    self.assertEqual(catalog.card_print_by_id[5]["rarity"], "Rare")
+    tables["card_print"][0]["content_hash"] = "0" * 40
+    self.assertIsNone(
+        asyncio.run(
+            Catalog.load_with_snapshot(TableClient(tables), self.snapshot)))
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,38 @@
+"""
+Unit tests for sparse fieldsets and relation includes
+"""
+
+import unittest
+
+from api.sparse import SparseParams, split_names
+
+
+class TestSparseParams(unittest.TestCase):
+
+  def test_split_names(self):
+    self.assertEqual(split_names(["id, name", "card.name", ""]),
+                     ["id", "name", "card.name"])
+    self.assertEqual(split_names(None), [])
+
+  def test_select(self):
+    params = SparseParams({"": {"name"}, "card": {"types"}}, {"card"})
+    row = {"id": 1, "name": "Path of Frost", "types": ["Frost"]}
+    self.assertEqual(params.select(row), {"id": 1, "name": "Path of Frost"})
+    self.assertEqual(params.select(row, "card"), {"id": 1, "types": ["Frost"]})
+    self.assertEqual(params.select(row, "expansion"), row)
+    self.assertTrue(params.includes("card"))
+    self.assertFalse(params.includes("expansion"))
+
+  def test_get_columns(self):
+    params = SparseParams({"": {"name"}}, set())
+    columns = ("id", "name", "description", "hero_card_print_id")
+    self.assertEqual(params.get_columns(columns), ["id", "name"])
+    self.assertEqual(
+        params.get_columns(columns, keys=["id", "hero_card_print_id"]),
+        ["id", "name", "hero_card_print_id"])
+    self.assertEqual(SparseParams({}, set()).get_columns(columns),
+                     list(columns))
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,187 @@
+"""
+Unit tests for trade matching of users
+"""
+
+import asyncio
+import unittest
+
+from fastapi.testclient import TestClient
+from api import app, database
+from api.trades import TradeIndex, get_bits
+from benchmarks.sqlite_client import SQLiteClient
+from tests.test_catalog import get_test_catalog
+
+server = TestClient(app)
+
+
+async def seed(db):
+  """Adds catalog of test_catalog and three users with collections"""
+  await database.add_many(db, "blockset", [{"name": "Basic"}])
+  await database.add_many(db, "expansionblock", [{
+      "name": "Scourgewar",
+      "block_set_id": 1
+  }])
+  await database.add_many(db, "expansion", [{
+      "name": name,
+      "expansion_block_id": 1
+  } for name in ("Icecrown", "Wrathgate")])
+  await database.add_many(db, "card", [{
+      "name": name,
+      "category": "Ally"
+  } for name in ("Path of Frost", "Kelsa Wildfire")])
+  await database.add_many(db, "cardprint", [{
+      "card_id": card_id,
+      "expansion_id": expansion_id,
+      "id_in_expansion": id_in_expansion,
+      "rarity": "Common"
+  } for card_id, expansion_id, id_in_expansion in ((1, 1, 10), (2, 1, 13),
+                                                   (1, 2, 7))])
+  for name in ("first", "second", "third"):
+    user = await database.add_user(db, name, f"{name}@example.com")
+    await database.add_collcetion(db, user.id, f"{name} collection")
+  # First has spare 1 and misses 3, second has spare 3 and misses 1,
+  # third owns 1 through user_has_card_print and has spare 3
+  await database.add_collection_card_print_quantities(db, 1, {1: 3, 2: 1})
+  await database.add_collection_card_print_quantities(db, 2, {2: 1, 3: 2})
+  await database.add_collection_card_print_quantities(db, 3, {3: 4})
+  await db.userhascardprint.create(data={"user_id": 3, "card_print_id": 1})
+
+
+class TradesClient:
+  """Client answering trade index queries with fixed rows"""
+
+  async def query_raw(self, query):
+    if query.startswith("SELECT id, user_id"):
+      return [{"id": 1, "user_id": 1}, {"id": 2, "user_id": 2}]
+    if "SUM" in query:
+      return [{
+          "user_id": 1,
+          "card_print_id": 1,
+          "quantity": 2
+      }, {
+          "user_id": 2,
+          "card_print_id": 2,
+          "quantity": 2
+      }]
+    return []
+
+
+class TestTradeIndex(unittest.TestCase):
+
+  def setUp(self):
+    self.db = SQLiteClient()
+    self.index = TradeIndex()
+    self.index.update(get_test_catalog())
+
+    async def load():
+      await self.db.connect()
+      try:
+        await seed(self.db)
+        await self.index.load(self.db)
+      finally:
+        await self.db.disconnect()
+
+    asyncio.run(load())
+
+  def test_bits(self):
+    self.assertEqual(get_bits([]), 0)
+    self.assertEqual(get_bits([0, 3, 9]), 0b1000001001)
+
+  def test_load(self):
+    self.assertEqual(self.index.users[1].quantities, {1: 3, 2: 1})
+    self.assertEqual(self.index.users[1].owned, 0b110)
+    self.assertEqual(self.index.users[1].spares, 0b10)
+    self.assertEqual(self.index.users[3].owned, 0b1010)
+    self.assertEqual(self.index.collection_users, {1: 1, 2: 2, 3: 3})
+
+  def test_matches(self):
+    self.assertEqual(self.index.get_matches(1, 10), [{
+        "user_id": 2,
+        "score": 1,
+        "offered_card_print_ids": [3],
+        "wanted_card_print_ids": [1],
+    }])
+    self.assertEqual(self.index.get_matches(3, 10), [])
+    self.assertEqual(self.index.get_matches(404, 10), [])
+
+  def test_imports_update_matches(self):
+    self.index.add_quantities(2, {1: 1})
+    self.assertEqual(self.index.get_matches(1, 10), [])
+    self.index.add_quantities(1, {2: 1})
+    self.assertEqual(
+        [match["user_id"] for match in self.index.get_matches(1, 10)], [3])
+    self.index.add_quantities(4, {1: 1})
+    self.assertTrue(self.index.loaded)
+    self.assertEqual(self.index.unresolved_collections, {4})
+
+  def test_new_collection_owner_read_again(self):
+
+    async def add():
+      await self.db.connect()
+      try:
+        await seed(self.db)
+        await self.index.load(self.db)
+        await database.add_collcetion(self.db, 2, "Binder")
+        await database.add_collection_card_print_quantities(self.db, 4, {1: 2})
+        self.index.add_quantities(4, {1: 2})
+        await self.index.load(self.db)
+      finally:
+        await self.db.disconnect()
+
+    self.index.clear()
+    asyncio.run(add())
+    self.assertEqual(self.index.unresolved_collections, set())
+    self.assertEqual(self.index.collection_users[4], 2)
+    self.assertEqual(self.index.users[2].quantities, {1: 2, 2: 1, 3: 2})
+    self.assertEqual(self.index.users[1].quantities, {1: 3, 2: 1})
+
+  def test_lowered_quantities_read_again(self):
+
+    async def lower():
+      await self.db.connect()
+      try:
+        await seed(self.db)
+        await database.add_collcetion(self.db, 1, "Binder")
+        await database.add_collection_card_print_quantities(self.db, 4, {1: 1})
+        await self.index.load(self.db)
+        self.assertEqual(self.index.users[1].quantities[1], 4)
+        # Binder holds one copy, so only one of three is removed
+        await database.add_card_print_quantity_deltas(
+            self.db, "collection_has_card_print", {4: {1: -3}})
+        self.index.add_quantities(4, {1: -3})
+        self.assertNotIn(1, self.index.users)
+        self.index.add_quantities(1, {3: 1})
+        self.assertNotIn(1, self.index.users)
+        await self.index.load(self.db)
+      finally:
+        await self.db.disconnect()
+
+    self.index.clear()
+    asyncio.run(lower())
+    self.assertEqual(self.index.stale_users, set())
+    self.assertEqual(self.index.users[1].quantities, {1: 3, 2: 1})
+    self.assertEqual(self.index.users[1].spares, 0b10)
+
+
+class TestTradeRoutes(unittest.TestCase):
+
+  def setUp(self):
+    app.state.trade_index = TradeIndex()
+    app.state.trade_index.update(get_test_catalog())
+    app.state.db = TradesClient()
+
+  def test_trade_matches(self):
+    response = server.get("/users/1/trade-matches")
+    self.assertEqual(response.status_code, 200)
+    self.assertEqual(response.json(), [{
+        "user_id": 2,
+        "score": 1,
+        "offered_card_print_ids": [2],
+        "wanted_card_print_ids": [1],
+    }])
+    self.assertEqual(
+        server.get("/users/1/trade-matches?limit=0").status_code, 422)
+
+
+if __name__ == "__main__":
+  unittest.main()
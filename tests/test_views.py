@@ -0,0 +1,161 @@
+"""
+Unit tests for cache of collection and deck views
+"""
+
+import asyncio
+import time
+import unittest
+
+from fastapi import Depends, FastAPI, Request, Response
+from fastapi.testclient import TestClient
+from api import database
+from api.dependencies import get_view_cache
+from api.views import COLLECTION, KINDS, ViewCache, view_cache
+from api.write_buffer import QuantityBuffer
+from benchmarks.sqlite_client import SQLiteClient
+from tests.test_trades import seed
+
+views_app = FastAPI()
+views_server = TestClient(views_app)
+# Number of times view of every path was read
+reads = {}
+
+
+@views_app.get("/views/{kind}/{row_id}")
+async def get_view(kind: str,
+                   row_id: int,
+                   request: Request,
+                   cache: ViewCache = Depends(get_view_cache)) -> Response:
+  """Route returning number of reads of view tagged with kind and row id"""
+
+  async def read_view():
+    reads[request.url.path] = reads.get(request.url.path, 0) + 1
+    if request.query_params.get("invalidate"):
+      cache.invalidate((kind, row_id))
+    return {"reads": reads[request.url.path]}, [(kind, row_id)]
+
+  return await cache.respond(request, read_view)
+
+
+def get_reads(path):
+  """Returns number of reads of view at path after viewing it"""
+  return views_server.get(path).json()["reads"]
+
+
+class TestViewCache(unittest.TestCase):
+
+  def setUp(self):
+    reads.clear()
+    view_cache.invalidate_kinds(*KINDS)
+    view_cache.configure(max_bytes=1024 * 1024, ttl=60)
+
+  def tearDown(self):
+    view_cache.configure()
+
+  def test_repeat_views_are_cached(self):
+    self.assertEqual(get_reads("/views/collection/1"), 1)
+    response = views_server.get("/views/collection/1")
+    self.assertEqual(response.json(), {"reads": 1})
+    self.assertEqual(response.headers["Cache-Control"], "private, no-cache")
+    response = views_server.get(
+        "/views/collection/1",
+        headers={"If-None-Match": response.headers["ETag"]})
+    self.assertEqual(response.status_code, 304)
+
+  def test_encoded_query_has_own_view(self):
+    # Both queries decode to name=a&name=b
+    self.assertEqual(get_reads("/views/collection/1?name=a&name=b"), 1)
+    self.assertEqual(get_reads("/views/collection/1?name=a%26name%3Db"), 2)
+
+  def test_invalidation_drops_tagged_views_only(self):
+    get_reads("/views/collection/1")
+    get_reads("/views/collection/2")
+    get_reads("/views/deck/1")
+    view_cache.invalidate((COLLECTION, 1))
+    self.assertEqual(get_reads("/views/collection/1"), 2)
+    self.assertEqual(get_reads("/views/collection/2"), 1)
+    view_cache.invalidate_kinds(COLLECTION)
+    self.assertEqual(get_reads("/views/collection/2"), 2)
+    self.assertEqual(get_reads("/views/deck/1"), 1)
+
+  def test_view_invalidated_while_read_is_not_stored(self):
+    self.assertEqual(get_reads("/views/deck/1?invalidate=1"), 1)
+    self.assertEqual(get_reads("/views/deck/1"), 2)
+    self.assertEqual(get_reads("/views/deck/1"), 2)
+
+  def test_least_recently_used_dropped_over_budget(self):
+    get_reads("/views/deck/1")
+    size = view_cache.size
+    view_cache.configure(max_bytes=size * 2, ttl=60)
+    get_reads("/views/deck/2")
+    get_reads("/views/deck/1")
+    get_reads("/views/deck/3")
+    self.assertEqual(get_reads("/views/deck/1"), 1)
+    self.assertEqual(get_reads("/views/deck/2"), 2)
+
+  def test_views_expire(self):
+    view_cache.configure(max_bytes=1024 * 1024, ttl=0.01)
+    get_reads("/views/deck/1")
+    time.sleep(0.02)
+    self.assertEqual(get_reads("/views/deck/1"), 2)
+
+
+class TestViewInvalidation(unittest.TestCase):
+
+  def setUp(self):
+    reads.clear()
+    view_cache.invalidate_kinds(*KINDS)
+    self.db = SQLiteClient()
+
+  def run_with_db(self, function):
+    """Runs function with connected and seeded database"""
+
+    async def run():
+      await self.db.connect()
+      try:
+        await seed(self.db)
+        for path in ("/views/user_collections/1", "/views/user_collections/2",
+                     "/views/collection/1", "/views/deck/1"):
+          get_reads(path)
+        await function()
+      finally:
+        await self.db.disconnect()
+
+    asyncio.run(run())
+
+  def test_writes_drop_their_views(self):
+
+    async def write():
+      await database.add_collcetion(self.db, 1, "Binder")
+      await database.add_collection_card_print_quantities(self.db, 1, {1: 1})
+
+    self.run_with_db(write)
+    self.assertEqual(get_reads("/views/user_collections/1"), 2)
+    self.assertEqual(get_reads("/views/user_collections/2"), 1)
+    self.assertEqual(get_reads("/views/collection/1"), 2)
+    self.assertEqual(get_reads("/views/deck/1"), 1)
+
+  def test_quantity_changes_drop_their_views(self):
+
+    async def change():
+      buffer = QuantityBuffer(self.db, "deck_has_card_print")
+      buffer.add(1, 1, 1)
+      self.assertEqual(get_reads("/views/deck/1"), 2)
+      self.assertEqual(get_reads("/views/deck/1"), 2)
+
+    self.run_with_db(change)
+    self.assertEqual(get_reads("/views/collection/1"), 1)
+
+  def test_delete_all_drops_views_of_kind(self):
+
+    async def delete():
+      await database.delete_all_decks(self.db)
+
+    self.run_with_db(delete)
+    self.assertEqual(get_reads("/views/deck/1"), 2)
+    self.assertEqual(get_reads("/views/collection/1"), 1)
+    self.assertEqual(get_reads("/views/user_collections/1"), 1)
+
+
+if __name__ == "__main__":
+  unittest.main()
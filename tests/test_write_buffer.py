@@ -0,0 +1,236 @@
+"""
+Unit tests for write-behind buffer of card print quantities
+"""
+
+import asyncio
+import unittest
+
+from fastapi.testclient import TestClient
+from api import app, database
+from api.catalog import CatalogCache
+from api.pagination import decode_cursor
+from api.write_buffer import QuantityBuffer, merge_page
+from benchmarks.sqlite_client import SQLiteClient
+from tests.test_catalog import get_test_catalog
+from tests.test_trades import seed
+
+server = TestClient(app)
+
+
+def get_rows(quantities):
+  """Returns card print rows from quantities keyed by card print id"""
+  return [{
+      "card_print_id": card_print_id,
+      "quantity": quantity
+  } for card_print_id, quantity in quantities.items()]
+
+
+class Row:
+  """Stored collection card print"""
+
+  def __init__(self, **values):
+    self.__dict__.update(values)
+
+
+class CollectionActions:
+  """Collection queries answered from dict of card print quantities"""
+
+  def __init__(self, quantities):
+    self.quantities = quantities
+
+  async def find_unique(self, where):
+    return Row(id=where["id"]) if where["id"] == 1 else None
+
+  async def find_many(self, where, order, take):
+    after_id = where.get("card_print_id", {}).get("gt", 0)
+    return [
+        Row(card_print_id=card_print_id, quantity=quantity)
+        for card_print_id, quantity in sorted(self.quantities.items())
+        if card_print_id > after_id
+    ][:take]
+
+
+class CollectionClient:
+  """Client with one collection holding given quantities"""
+
+  def __init__(self, quantities):
+    self.collection = CollectionActions(quantities)
+    self.collectionhascardprint = self.collection
+
+  async def query_raw(self, query, card_print_id, collection_id):
+    """Answers query of stored quantity of card print"""
+    if collection_id != 1:
+      return []
+    return [{
+        "id": 1,
+        "quantity": self.collection.quantities.get(card_print_id)
+    }]
+
+
+class TestMergePage(unittest.TestCase):
+
+  def test_deltas_in_page_range(self):
+    rows = get_rows({2: 1, 4: 1, 6: 1})
+    page = merge_page(rows, {1: 1, 4: -1, 5: 2, 9: 1}, None, 2)
+    self.assertEqual(page["items"], get_rows({1: 1, 2: 1}))
+    self.assertEqual(decode_cursor(page["next_cursor"]), (2,))
+    page = merge_page(get_rows({4: 1, 6: 1, 8: 1}), {4: -1, 6: -1, 9: 1}, 2,
+                      2)
+    self.assertEqual(page["items"], get_rows({8: 1}))
+    self.assertEqual(decode_cursor(page["next_cursor"]), (8,))
+
+  def test_last_page_takes_all_deltas(self):
+    page = merge_page(get_rows({6: 1}), {4: -1, 9: 1}, 2, 2)
+    self.assertEqual(page["items"], get_rows({6: 1, 9: 1}))
+    self.assertIsNone(page["next_cursor"])
+
+
+class TestQuantityBuffer(unittest.TestCase):
+
+  def setUp(self):
+    self.db = SQLiteClient()
+    self.flushed = []
+    self.buffer = QuantityBuffer(
+        self.db,
+        "collection_has_card_print",
+        flush_seconds=60,
+        flush_size=100,
+        listeners=[lambda *args: self.flushed.append(args)])
+
+  def run_with_db(self, function):
+    """Runs function with connected and seeded database"""
+
+    async def run():
+      await self.db.connect()
+      try:
+        await seed(self.db)
+        return await function()
+      finally:
+        await self.db.disconnect()
+
+    return asyncio.run(run())
+
+  async def get_quantities(self, collection_id):
+    rows = await database.get_collection_card_prints(self.db, collection_id)
+    return {row.card_print_id: row.quantity for row in rows}
+
+  def test_deltas_are_merged_and_flushed(self):
+
+    async def change():
+      for delta in (1, 1, -1, 1):
+        self.buffer.add(1, 3, delta)
+      self.assertEqual(self.buffer.add(1, 1, -5), -5)
+      self.buffer.add(2, 3, -1)
+      self.assertEqual(self.buffer.size, 3)
+      queries = self.db.queries
+      await self.buffer.flush()
+      self.assertEqual(self.db.queries - queries, 3)
+      return await self.get_quantities(1), await self.get_quantities(2)
+
+    self.assertEqual(self.run_with_db(change), ({2: 1, 3: 2}, {2: 1, 3: 1}))
+    self.assertEqual(self.flushed, [(1, {3: 2, 1: -5}), (2, {3: -1})])
+    self.assertEqual(self.buffer.deltas, {})
+
+  def test_changes_keep_quantity_at_zero_or_more(self):
+
+    async def change():
+      pending = [await self.buffer.change(1, 2, delta) for delta in (-1, -1, 1)]
+      self.assertIsNone(await self.buffer.change(404, 2, 1))
+      await self.buffer.flush()
+      return pending, await self.get_quantities(1)
+
+    self.assertEqual(self.run_with_db(change), ([-1, -1, 0], {1: 3, 2: 1}))
+    self.assertEqual(self.buffer.deltas, {})
+
+  def test_read_includes_pending_deltas(self):
+
+    async def read():
+      self.buffer.add(1, 3, 2)
+      self.buffer.add(1, 2, -1)
+      return await self.buffer.read(
+          [1, 2], lambda: database.get_collection_card_prints(self.db, 1))
+
+    rows, deltas = self.run_with_db(read)
+    self.assertEqual(len(rows), 2)
+    self.assertEqual(deltas, {1: {3: 2, 2: -1}})
+
+  def test_read_repeated_after_flush(self):
+    reads = []
+
+    async def read_rows():
+      reads.append(await self.get_quantities(1))
+      if len(reads) == 1:
+        await self.buffer.flush()
+      return reads[-1]
+
+    async def read():
+      self.buffer.add(1, 3, 1)
+      return await self.buffer.read([1], read_rows)
+
+    self.assertEqual(self.run_with_db(read), ({1: 3, 2: 1, 3: 1}, {}))
+    self.assertEqual(len(reads), 2)
+
+  def test_missing_owner_dropped(self):
+
+    async def change():
+      self.buffer.add(1, 3, 1)
+      self.buffer.add(404, 3, 1)
+      with self.assertLogs("api.write_buffer", "ERROR"):
+        await self.buffer.flush()
+      return await self.get_quantities(1)
+
+    self.assertEqual(self.run_with_db(change), {1: 3, 2: 1, 3: 1})
+    self.assertEqual(self.buffer.deltas, {})
+    self.assertEqual(self.flushed, [(1, {3: 1})])
+
+  def test_close_flushes(self):
+
+    async def close():
+      self.buffer.start()
+      self.buffer.add(1, 2, 1)
+      await self.buffer.close()
+      return await self.get_quantities(1)
+
+    self.assertEqual(self.run_with_db(close), {1: 3, 2: 2})
+
+
+class TestQuantityRoutes(unittest.TestCase):
+
+  def setUp(self):
+    app.state.catalog_cache = CatalogCache(get_test_catalog())
+    app.state.db = CollectionClient({1: 1, 3: 1})
+    app.state.collection_quantities = QuantityBuffer(
+        app.state.db, "collection_has_card_print")
+
+  def test_read_own_writes(self):
+    for _ in range(3):
+      response = server.post("/collections/1/card-prints/2",
+                             json={"delta": 1})
+    self.assertEqual(response.status_code, 202)
+    self.assertEqual(response.json()["pending_delta"], 3)
+    for delta in (-1, -1, 1):
+      server.post("/collections/1/card-prints/1", json={"delta": delta})
+    response = server.get("/collections/1/card-prints?limit=1")
+    self.assertEqual(response.json()["items"], [{
+        "card_print_id": 1,
+        "quantity": 1
+    }])
+    self.assertIsNotNone(response.json()["next_cursor"])
+
+  def test_invalid_changes(self):
+    self.assertEqual(
+        server.post("/collections/1/card-prints/99", json={
+            "delta": 1
+        }).status_code, 404)
+    self.assertEqual(
+        server.post("/collections/2/card-prints/1", json={
+            "delta": 1
+        }).status_code, 404)
+    self.assertEqual(
+        server.post("/collections/1/card-prints/1", json={
+            "delta": 1001
+        }).status_code, 422)
+
+
+if __name__ == "__main__":
+  unittest.main()